@@ -59,9 +59,78 @@ class Conf(_config.ConfigNamespace):
                                      'Set to 0 for autoselect. Note, PSF calculations are likely RAM ' +
                                      'limited more than CPU limited for higher N on modern machines.')
 
+    parallel_backend = _config.ConfigItem(['processes', 'threads'], 'When running PSF calculations in '
+                                          'parallel (use_multiprocessing=True), should the wavelengths be computed '
+                                          'in separate worker processes (processes) or in threads within the '
+                                          'current process (threads)? Threads avoid copying the optical system '
+                                          'between processes and are compatible with FFTW, but only the FFTs and '
+                                          'other array math run concurrently.')
+
+    use_persistent_pool = _config.ConfigItem(False, 'When using multiprocessing, should the worker '
+                                             'processes be kept running and reused between PSF calculations '
+                                             '(if True; avoids process startup costs, and the workers cache the '
+                                             'optical system so only changed optics need to be sent to them) '
+                                             'or started anew for each calculation (if False)? '
+                                             'See poppy.shutdown_worker_pool().')
+
+    use_shared_memory_accumulation = _config.ConfigItem(False, 'When using multiprocessing, should worker '
+                                                        'processes add their weighted PSFs directly into a '
+                                                        'shared memory array (if True; reduces memory use and '
+                                                        'data transfer for large output arrays, requires '
+                                                        'Python >= 3.8) or return each PSF to the main process '
+                                                        'to be summed (if False)?')
+
+    use_batched_propagation = _config.ConfigItem(False, 'Should multiwavelength PSF calculations '
+                                                 'that run in a single process propagate all wavelengths together '
+                                                 'as a stack of wavefronts (if True; batched FFTs may be faster, '
+                                                 'but memory usage scales with the number of wavelengths) or '
+                                                 'propagate one wavelength at a time (if False)?')
+
+    coordinate_cache_size = _config.ConfigItem(64, 'Maximum memory, in megabytes, to use for caching '
+                                               'wavefront coordinate arrays for reuse by later calculations '
+                                               'with the same array shape and sampling.')
+
+    phasor_cache_size = _config.ConfigItem(128, 'Maximum memory, in megabytes, to use for caching the '
+                                           'phasors of static analytic optics such as apertures and '
+                                           'obscurations, for reuse in later calculations with the same '
+                                           'sampling and wavelength. Set to 0 to disable.')
+
+    basis_cache_size = _config.ConfigItem(256, 'Maximum memory, in megabytes, to use for caching '
+                                          'orthonormalized basis sets and the least squares factorizations '
+                                          'used to fit OPD maps, for reuse with the same basis and aperture.')
+
+    zernike_cache_size = _config.ConfigItem(128, 'Maximum memory, in megabytes, to use for caching '
+                                            'Zernike polynomials computed by cached_zernike1 and '
+                                            'zernike_basis_faster, for reuse with the same sampling.')
+
+    dm_cache_size = _config.ConfigItem(64, 'Maximum memory, in megabytes, to use for caching the '
+                                       'actuator pixel indices and rescaled influence functions of '
+                                       'deformable mirrors, for reuse with the same sampling.')
+
+    matrix_dft_cache_size = _config.ConfigItem(128, 'Maximum memory, in megabytes, to use for keeping '
+                                               'the factor matrices of matrix DFTs for reuse by later '
+                                               'transforms with the same array sizes and sampling.')
+
+    total_cache_size = _config.ConfigItem(1024, 'Maximum memory, in megabytes, to use for all of the '
+                                          'above caches combined. When exceeded, the least recently '
+                                          'used arrays across all caches are discarded first.')
+
+    dm_crop_to_footprint = _config.ConfigItem(True, 'Compute the convolved surfaces of deformable '
+                                              'mirrors only over the region of the wavefront array covered '
+                                              'by the actuators and their influence functions, rather than '
+                                              'the full array.')
+
     use_fftw = _config.ConfigItem(True, 'Use FFTW for FFTs (assuming it' +
                                   'is available)?  Set to False to force numpy.fft always, True to' +
                                   'try importing and using FFTW via PyFFTW.')
+    use_scipy_fft = _config.ConfigItem(True, 'Use scipy.fft for FFTs if FFTW is not used (assuming it '
+                                       'is available)? It can use multiple threads and computes single '
+                                       'precision FFTs in single precision. Set to False to use numpy.fft.')
+    fftw_plan_cache_size = _config.ConfigItem(4, 'Maximum number of array shapes and FFT directions '
+                                              'for which to keep FFTW plans in memory for reuse. One plan is '
+                                              'kept for each thread which used them concurrently, and each '
+                                              'holds an aligned buffer the size of its array, so reduce this '
+                                              'if memory is tight.')
     autosave_fftw_wisdom = _config.ConfigItem(True, 'Should POPPY ' +
                                               'automatically save and reload FFTW ' +
                                               '"wisdom" for improved speed?')
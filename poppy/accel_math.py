@@ -4,6 +4,8 @@
 #
 import numpy as np
 import multiprocessing
+import threading
+import collections
 from . import conf
 
 import time
@@ -17,11 +19,21 @@ try:
     # Setup infrastructure for FFTW
     _FFTW_INIT = {}  # dict of array sizes for which we have already performed the required FFTW planning step
     _FFTW_FLAGS = ['measure']
+    _FFTW_PLANS = collections.OrderedDict()  # idle FFTW plans for reuse, in least- to most-recently used order
+    _FFTW_PLANS_LOCK = threading.Lock()
     _FFTW_AVAILABLE = True
 except ImportError:
     pyfftw = None
     _FFTW_AVAILABLE = False
 
+try:
+    # try to import scipy.fft (scipy >= 1.4) to see if it is available
+    import scipy.fft as scipy_fft
+    _SCIPY_FFT_AVAILABLE = True
+except ImportError:
+    scipy_fft = None
+    _SCIPY_FFT_AVAILABLE = False
+
 try:
     # try to import numexpr package to see if it is available
     import numexpr as ne
@@ -55,16 +67,34 @@ _USE_CUDA = (conf.use_cuda and _CUDA_AVAILABLE)
 _USE_OPENCL = (conf.use_opencl and _OPENCL_AVAILABLE)
 _USE_NUMEXPR = (conf.use_numexpr and _NUMEXPR_AVAILABLE)
 _USE_FFTW = (conf.use_fftw and _FFTW_AVAILABLE)
+_USE_SCIPY_FFT = (conf.use_scipy_fft and _SCIPY_FFT_AVAILABLE)
+
+
+# Number of threads each FFT may use, which can be set per calling thread. Threads
+# computing wavelengths in parallel each use only their share of the CPUs, to avoid
+# oversubscribing them; see poppy_core._get_thread_pool.
+_fft_thread_settings = threading.local()
+
+
+def _set_fft_threads(nthreads):
+    """ Set the number of threads for FFTs computed by the calling thread to use """
+    _fft_thread_settings.nthreads = nthreads
+
+
+def _fft_threads():
+    """ Return the number of threads for FFTs computed by the calling thread to use """
+    return getattr(_fft_thread_settings, 'nthreads', multiprocessing.cpu_count())
 
 
 def update_math_settings():
     """ Update the module-level math flags, based on user settings
     """
-    global _USE_CUDA, _USE_OPENCL, _USE_NUMEXPR, _USE_FFTW
+    global _USE_CUDA, _USE_OPENCL, _USE_NUMEXPR, _USE_FFTW, _USE_SCIPY_FFT
     _USE_CUDA = (conf.use_cuda and _CUDA_AVAILABLE)
     _USE_OPENCL = (conf.use_opencl and _OPENCL_AVAILABLE)
     _USE_NUMEXPR = (conf.use_numexpr and _NUMEXPR_AVAILABLE)
     _USE_FFTW = (conf.use_fftw and _FFTW_AVAILABLE)
+    _USE_SCIPY_FFT = (conf.use_scipy_fft and _SCIPY_FFT_AVAILABLE)
 
 
 def _float():
@@ -105,6 +135,8 @@ def _fftshift(x):
 
     Note - TODO write an OpenCL version
 
+    For a stack of arrays (ndim > 2), only the last two axes are shifted.
+
     See also ifftshift
     """
 
@@ -112,13 +144,13 @@ def _fftshift(x):
     # the CUDA fftshift is set up to work on blocks of 32, so
     # N must be a multiple of 32. We check this rapidly using a bit mask:
     #    (x & 31)==0  is a ~20x faster equivalent of (np.mod(x,32)==0)
-    if (_USE_CUDA) & (N==x.shape[1]) & ((N & 31)==0):
+    if (_USE_CUDA) & (x.ndim == 2) & (N==x.shape[1]) & ((N & 31)==0):
         blockdim = (32, 32) # threads per block
         numBlocks = (int(N/blockdim[0]),int(N/blockdim[1]))
         cufftShift_2D_kernel[numBlocks, blockdim](x.ravel(),N)
         return x
     else:
-        return np.fft.fftshift(x)
+        return np.fft.fftshift(x, axes=(-2, -1))
 
 def _ifftshift(x):
     """ Inverse FFT shifts of array contents, using CUDA if available.
@@ -130,6 +162,8 @@ def _ifftshift(x):
 
     Note - TODO write an OpenCL version
 
+    For a stack of arrays (ndim > 2), only the last two axes are shifted.
+
     See also fftshift
     """
 
@@ -137,13 +171,13 @@ def _ifftshift(x):
     # the CUDA fftshift is set up to work on blocks of 32, so
     # N must be a multiple of 32. We check this rapidly using a bit mask:
     #   not (x & 31)  is a ~20x faster equivalent of (np.mod(x,32)==0)
-    if (_USE_CUDA) & (N==x.shape[1]) & ((N & 31)==0):
+    if (_USE_CUDA) & (x.ndim == 2) & (N==x.shape[1]) & ((N & 31)==0):
         blockdim = (32, 32) # threads per block
         numBlocks = (int(N/blockdim[0]),int(N/blockdim[1]))
         cufftShift_2D_kernel[numBlocks, blockdim](x.ravel(),N)
         return x
     else:
-        return np.fft.ifftshift(x)
+        return np.fft.ifftshift(x, axes=(-2, -1))
 
 
 
@@ -154,33 +188,53 @@ def fft_2d(wavefront, forward=True, normalization=None, fftshift=True):
         - CUDA on NVidia GPU
         - OpenCL on AMD GPU
         - FFTW on CPU
+        - scipy.fft on CPU, multithreaded
         - numpy on CPU
 
     This function handles ONLY the core numerics itself, as fast as possible,
     (and some minor related logging) .
     All the interaction with object state for Wavefront arrays should happen elsewhere.
 
-    TODO: this should execute an IN PLACE FFT, so we don't have to pass around arrays to return
-    anything.
+    With FFTW, the transform is computed in place in the input array where possible, using
+    cached FFTW plans. The scipy.fft backend is likewise allowed to overwrite its input, and
+    for even array sizes the FFT shift is applied in place in the input array (see below),
+    with any backend. A complex input array may therefore be overwritten by this function;
+    always use the returned array, and pass a copy if the input is needed afterwards.
+    Real input arrays are first converted to a new complex array, and are not modified.
+
+    The input may also be a stack of wavefronts with shape (nwave, ny, nx), in which case
+    each 2D plane of the stack is transformed independently in a single batched call.
+    This is used for propagating several wavelengths together.
 
     Parameters
     -----------
+    wavefront : ndarray
+        2D complex array to transform, or 3D stack of such arrays
     forward : bool
         set to True for forward FFT, False for inverse fft
     normalization : float, optional
-        Normalization factor. Defaults to 1./wavefront.shape[0] for forward,
-        and wavefront.shape[0] for inverse. Use this only if you need a non-default
+        Normalization factor. Defaults to 1./wavefront.shape[-2] for forward,
+        and wavefront.shape[-2] for inverse. Use this only if you need a non-default
         behavior.
     fftshift : bool
         apply FFT shift after forwards FFT or before inverse FFT?
+        For arrays with even dimensions, the shifts are not applied as separate array
+        copies, but instead as an in-place checkerboard sign flip before forwards FFTs
+        or after inverse FFTs.
 
     """
     ## To use a fast FFT, it must both be enabled and the library itself has to be present
     global _USE_OPENCL, _USE_CUDA # need to declare global in case we need to change it, below
     t0 = time.time()
 
+    if _USE_CUDA and wavefront.ndim > 2:
+        # The CUDA plans and fftshift kernel are 2D only, so transform each plane of a stack in turn
+        for i in range(wavefront.shape[0]):
+            wavefront[i] = fft_2d(wavefront[i], forward=forward, normalization=normalization, fftshift=fftshift)
+        return wavefront
+
     # OpenCL cfFFT only can FFT certain array sizes.
-    if _USE_OPENCL and not isproductofsmallprimes(wavefront.shape[0]):
+    if _USE_OPENCL and not isproductofsmallprimes(wavefront.shape[-2]):
         _log.debug(("Wavefront size {} not supported by OpenCL, therefore disabling "+
             "USE_OPENCL for this calculation.").format(wavefront.shape))
         _USE_OPENCL = False
@@ -192,12 +246,28 @@ def fft_2d(wavefront, forward=True, normalization=None, fftshift=True):
         method = 'pyopencl (OpenCL GPU)'
     elif _USE_FFTW:
         method = 'pyfftw'
+    elif _USE_SCIPY_FFT:
+        method = 'scipy.fft'
     else:
         method = 'numpy'
     _log.debug("using {2} FFT of {0} array, FFT_direction={1}".format(
         str(wavefront.shape), 'forward' if forward else 'backward', method))
 
-    if (not forward) and fftshift: #inverse shift before backwards FFTs
+    # For even array sizes, shifting the output of a forward FFT by half the array is equivalent
+    # to multiplying its input by (-1)**(y+x), and likewise for shifting the input of an inverse FFT.
+    # That can be done in place rather than as an array copy. (Not on CUDA, which has
+    # its own in-place fftshift kernel.)
+    use_checkerboard = (fftshift and not _USE_CUDA and
+                        wavefront.shape[-2] % 2 == 0 and wavefront.shape[-1] % 2 == 0)
+
+    if not np.iscomplexobj(wavefront):
+        # Transform a complex copy of real input, which may then be modified in place.
+        # FFTW plans are for the configured precision; scipy.fft keeps single precision.
+        wavefront = wavefront.astype(_complex() if _USE_FFTW else np.result_type(wavefront.dtype, np.complex64))
+
+    if use_checkerboard and forward:
+        _checkerboard_flip(wavefront)
+    elif (not forward) and fftshift and not use_checkerboard: #inverse shift before backwards FFTs
         wavefront = _ifftshift(wavefront)
 
     t1 = time.time()
@@ -223,49 +293,44 @@ def fft_2d(wavefront, forward=True, normalization=None, fftshift=True):
 
     elif _USE_OPENCL:
         if normalization is None:
-            normalization = 1./wavefront.shape[0] if forward else wavefront.shape[0]
+            normalization = 1./wavefront.shape[-2] if forward else wavefront.shape[-2]
 
         context, queue = get_opencl_context()
         wf_on_gpu = pyopencl.array.to_device(queue, wavefront)
-        transform = gpyfft.fft.FFT(context, queue, wf_on_gpu, axes=(0,1))
+        transform = gpyfft.fft.FFT(context, queue, wf_on_gpu, axes=(wavefront.ndim-2, wavefront.ndim-1))
         event, = transform.enqueue(forward=forward)
         event.wait()
         wavefront[:] = wf_on_gpu.get()
         del wf_on_gpu
 
     elif _USE_FFTW:
-        FFT_direction = 'forward' if forward else 'backward' # back compatible for use in _FFTW_INIT
-        do_fft = pyfftw.interfaces.numpy_fft.fft2 if forward else pyfftw.interfaces.numpy_fft.ifft2
         if normalization is None:
-            normalization = 1./wavefront.shape[0] if forward else wavefront.shape[0]
-
-
-        if (wavefront.shape, FFT_direction) not in _FFTW_INIT:
-            # The first time you run FFTW to transform a given size, it does a speed test to
-            # determine optimal algorithm that is destructive to your chosen array.
-            # So only do that test on a copy, not the real array:
-            _log.info("Measuring pyfftw optimal plan for %s, direction=%s" % (
-                str(wavefront.shape), FFT_direction))
-
-            pyfftw.interfaces.cache.enable()
-            pyfftw.interfaces.cache.set_keepalive_time(30)
-
-            test_array = np.zeros(wavefront.shape)
-            test_array = do_fft(test_array, overwrite_input=True, planner_effort='FFTW_MEASURE',
-                                threads=multiprocessing.cpu_count())
+            normalization = 1./wavefront.shape[-2] if forward else wavefront.shape[-2]
+        if not forward:
+            # FFTW plans compute unnormalized inverse transforms, unlike numpy.fft.ifft2
+            normalization /= wavefront.shape[-2] * wavefront.shape[-1]
 
-            _FFTW_INIT[(wavefront.shape, FFT_direction)] = True
-
-        wavefront = do_fft(wavefront, overwrite_input=True, planner_effort='FFTW_MEASURE',
-                                threads=multiprocessing.cpu_count())
+        plan = _get_fftw_plan(wavefront.shape, wavefront.dtype, forward, threads=_fft_threads())
+        try:
+            wavefront = plan.execute(wavefront)
+        finally:
+            _release_fftw_plan(plan)
+    elif _USE_SCIPY_FFT:
+        # scipy.fft can use multiple threads, and keeps single precision arrays as complex64
+        do_fft = scipy_fft.fft2 if forward else scipy_fft.ifft2
+        if normalization is None:
+            normalization = 1./wavefront.shape[-2] if forward else wavefront.shape[-2]
+        wavefront = do_fft(wavefront, overwrite_x=True, workers=_fft_threads())
     else: # Basic numpy FFT
         do_fft =  np.fft.fft2 if forward else np.fft.ifft2
         if normalization is None:
-            normalization = 1./wavefront.shape[0] if forward else wavefront.shape[0]
+            normalization = 1./wavefront.shape[-2] if forward else wavefront.shape[-2]
         wavefront = do_fft(wavefront)
     t2 = time.time()
 
-    if forward and fftshift:
+    if use_checkerboard and not forward:
+        _checkerboard_flip(wavefront)
+    elif forward and fftshift and not use_checkerboard:
         wavefront = _fftshift(wavefront)
 
     wavefront *= normalization
@@ -275,6 +340,132 @@ def fft_2d(wavefront, forward=True, normalization=None, fftshift=True):
     return wavefront
 
 
+def rfft_2d(array, shape):
+    """ Real-input 2D FFT of an array, zero padded to the given shape.
+
+    This uses scipy.fft with multiple threads if enabled and available, and numpy otherwise.
+    The result is unnormalized, as for numpy.fft.rfft2. See also irfft_2d.
+    """
+    if _USE_SCIPY_FFT:
+        return scipy_fft.rfft2(array, shape, workers=_fft_threads())
+    else:
+        return np.fft.rfft2(array, shape)
+
+
+def irfft_2d(array, shape):
+    """ Inverse of rfft_2d, returning a real array of the given shape. """
+    if _USE_SCIPY_FFT:
+        return scipy_fft.irfft2(array, shape, workers=_fft_threads())
+    else:
+        return np.fft.irfft2(array, shape)
+
+
+def _checkerboard_flip(x):
+    """ Multiply an array in place by (-1)**(y+x) over its last two axes, by negating
+    every other pixel.
+
+    For even array sizes, doing this before a forward FFT or after an inverse FFT is equivalent
+    to fftshifting the output or ifftshifting the input respectively, without copying the array.
+    """
+    np.negative(x[..., ::2, 1::2], out=x[..., ::2, 1::2])
+    np.negative(x[..., 1::2, ::2], out=x[..., 1::2, ::2])
+    return x
+
+
+class _FFTWPlan(object):
+    """ An FFTW plan for in-place 2D transforms over the last two axes of arrays of one
+    shape and dtype, along with an aligned buffer of that shape.
+
+    Parameters
+    ----------
+    shape : tuple of ints
+        Shape of arrays to transform
+    dtype : numpy dtype
+        Complex data type of arrays to transform
+    forward : bool
+        Forward or inverse transform
+    threads : int
+        Number of threads for FFTW to use
+    """
+
+    def __init__(self, shape, dtype, forward, threads):
+        self.buffer = pyfftw.empty_aligned(shape, dtype=dtype)
+        # Planning with FFTW_MEASURE overwrites the array contents, so is done on the buffer.
+        self.fftw = pyfftw.FFTW(self.buffer, self.buffer, axes=(-2, -1),
+                                direction='FFTW_FORWARD' if forward else 'FFTW_BACKWARD',
+                                flags=('FFTW_MEASURE',), threads=threads)
+
+    def execute(self, wavefront):
+        """ Transform an array, in place if possible.
+
+        If the array meets the alignment and memory layout requirements of the plan, the
+        transform is computed in place in that array. Otherwise the array is copied into the
+        plan's aligned buffer and transformed there; that buffer is then returned, and the plan
+        allocates a fresh buffer for later use.
+
+        Returns the array containing the transformed data.
+        """
+        in_place = (wavefront.flags.c_contiguous and wavefront.flags.writeable and
+                    wavefront.ctypes.data % self.fftw.input_alignment == 0)
+        if in_place:
+            self.fftw.update_arrays(wavefront, wavefront)
+            self.fftw.execute()
+            self.fftw.update_arrays(self.buffer, self.buffer)  # don't keep a reference to the caller's array
+            return wavefront
+        else:
+            result = self.buffer
+            result[...] = wavefront
+            self.fftw.execute()
+            self.buffer = pyfftw.empty_aligned(result.shape, dtype=result.dtype)
+            self.fftw.update_arrays(self.buffer, self.buffer)
+            return result
+
+
+def _get_fftw_plan(shape, dtype, forward, threads):
+    """ Return an FFTW plan for 2D transforms of arrays of a given shape and dtype,
+    creating it if necessary. Return the plan with _release_fftw_plan once done with it.
+
+    Plans are cached for reuse, keyed by (shape, dtype, direction, threads). Since a plan
+    may only execute one transform at a time, each key has a pool of idle plans, from
+    which each caller takes one for its exclusive use; concurrent callers, such as the
+    threads of a parallel calculation, thus get one plan each, and these are reused by
+    any later callers regardless of which thread they run in. Idle plans are retained
+    for at most `poppy.conf.fftw_plan_cache_size` keys, discarding the least recently used.
+    """
+    shape = tuple(shape)
+    key = (shape, np.dtype(dtype), forward, threads)
+    with _FFTW_PLANS_LOCK:
+        if _FFTW_PLANS.get(key):
+            _FFTW_PLANS.move_to_end(key)
+            return _FFTW_PLANS[key].pop()
+
+    FFT_direction = 'forward' if forward else 'backward' # back compatible for use in _FFTW_INIT
+    if (shape, FFT_direction) not in _FFTW_INIT:
+        # The first time you run FFTW to transform a given size, it does a speed test to
+        # determine optimal algorithm. Subsequent plans for the same size reuse the saved wisdom.
+        _log.info("Measuring pyfftw optimal plan for %s, direction=%s" % (
+            str(shape), FFT_direction))
+    plan = _FFTWPlan(shape, dtype, forward, threads)
+    plan.key = key
+    _FFTW_INIT[(shape, FFT_direction)] = True
+    return plan
+
+
+def _release_fftw_plan(plan):
+    """ Return a plan obtained from _get_fftw_plan to the pool of idle plans for reuse """
+    with _FFTW_PLANS_LOCK:
+        _FFTW_PLANS.setdefault(plan.key, []).append(plan)
+        _FFTW_PLANS.move_to_end(plan.key)
+        while len(_FFTW_PLANS) > max(conf.fftw_plan_cache_size, 1):
+            _FFTW_PLANS.popitem(last=False)
+
+
+def clear_fftw_plan_cache():
+    """ Discard all cached FFTW plans, freeing their memory buffers """
+    if _FFTW_AVAILABLE:
+        with _FFTW_PLANS_LOCK:
+            _FFTW_PLANS.clear()
+
 
 def ispowerof2(num):
     """ Is this number a power of 2?"""
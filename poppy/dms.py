@@ -1,14 +1,18 @@
 # Code for modeling deformable mirrors
 # By Neil Zimmerman based on Marshall's dms.py in the gpipsfs repo
 
+import hashlib
+
 import numpy as np
 import matplotlib.pyplot as plt
 import scipy.ndimage.interpolation
-import scipy.signal
+import scipy.fft
+import scipy.sparse
 import astropy.io.fits as fits
 import astropy.units as u
 
 from . import utils, accel_math, poppy_core, optics
+from . import conf
 
 import logging
 
@@ -19,6 +23,57 @@ if accel_math._USE_NUMEXPR:
 
 __all__ = ['ContinuousDeformableMirror', 'HexSegmentedDeformableMirror']
 
+# Actuator pixel indices and rescaled influence functions for reuse
+_INFLUENCE_CACHE = utils.ArrayCache('DM influence', 'dm_cache_size')
+
+
+def _array_digest(array):
+    """ Hashable digest of an array's contents, for influence cache keys """
+    array = np.ascontiguousarray(array)
+    return array.shape, array.dtype.str, hashlib.sha1(array).hexdigest()
+
+
+def _convolve_actuator_trace(trace, kernel, kernel_key, footprint=None):
+    """ Convolve an actuator surface trace with an influence function kernel.
+
+    This gives the same result as scipy.signal.fftconvolve(trace, kernel, mode='same'), but
+    uses real FFTs and caches the transform of the kernel for reuse with the same array sizes.
+
+    Parameters
+    ----------
+    trace : ndarray
+        2D array of actuator values, zero except at the actuator locations
+    kernel : ndarray
+        2D influence function kernel
+    kernel_key : tuple
+        Hashable key identifying the kernel, for caching its transform
+    footprint : tuple of slices, optional
+        Region of the trace array containing all its nonzero values. If given, only
+        that region is transformed, and the result pasted into the full size output
+        array, which is zero outside of the footprint plus the extent of the kernel.
+    """
+    if footprint is None:
+        footprint = (slice(0, trace.shape[0]), slice(0, trace.shape[1]))
+    region = trace[footprint]
+    full_shape = [n + k - 1 for n, k in zip(region.shape, kernel.shape)]
+    fft_shape = tuple(scipy.fft.next_fast_len(n, real=True) for n in full_shape)
+
+    kernel_ft = _INFLUENCE_CACHE.get_or_compute(kernel_key + ('rfft', fft_shape),
+                                                lambda: accel_math.rfft_2d(kernel, fft_shape))
+    convolved = accel_math.irfft_2d(accel_math.rfft_2d(region, fft_shape) * kernel_ft, fft_shape)
+
+    # Paste the part of the full convolution which falls within the output array,
+    # centered as for mode='same'
+    result = np.zeros(trace.shape)
+    out_slices, in_slices = [], []
+    for axis in range(2):
+        start = footprint[axis].start - (kernel.shape[axis] - 1) // 2
+        out_slice = slice(max(start, 0), min(start + full_shape[axis], trace.shape[axis]))
+        out_slices.append(out_slice)
+        in_slices.append(slice(out_slice.start - start, out_slice.stop - start))
+    result[tuple(out_slices)] = convolved[tuple(in_slices)]
+    return result
+
 
 # noinspection PyUnresolvedReferences
 class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
@@ -155,9 +210,10 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
 
         hdulist.close()
 
-    def _get_rescaled_influence_func(self, pixelscale):
+    def _get_rescaled_influence_func(self, pixelscale, return_key=False):
         """ Return the influence function, rescaled onto the appropriate pixel scale for
-        the wavefront array."""
+        the wavefront array. The result is cached, and read-only.
+        Optionally also return the key identifying it in the cache."""
         # self.influence_func contains the 2D influence function array.
         # self.influence_func_sampling records how many pixels, in the provided array, represents 1 actuator spacing.
         # How many pixels in the output array between actuators?
@@ -165,25 +221,37 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
         act_space_pix = act_space_m / pixelscale.to(u.meter / u.pixel).value
         scale = act_space_pix / self.influence_func_sampling
 
-        # suppress irrelevant scipy warning here
-        import warnings
-        with warnings.catch_warnings():
-            warnings.simplefilter('ignore')
-            return scipy.ndimage.zoom(self.influence_func, scale)
+        def compute():
+            # suppress irrelevant scipy warning here
+            import warnings
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                return scipy.ndimage.zoom(self.influence_func, scale)
 
-    def _get_rescaled_actuator_surface(self, pixelscale):
+        key = ('influence function', _array_digest(self.influence_func), scale)
+        kernel = _INFLUENCE_CACHE.get_or_compute(key, compute)
+        return (kernel, key) if return_key else kernel
+
+    def _get_rescaled_actuator_surface(self, pixelscale, return_key=False):
         """ Return the actuator surface print-through, rescaled onto the
-        appropriate pixel scale for the wavefront array."""
+        appropriate pixel scale for the wavefront array. The result is cached, and read-only.
+        Optionally also return the key identifying it in the cache."""
         # self.actuator_surface contains the 2D influence function array,
         # for one single pixel.
         # How many pixels in the output array between actuators?
         act_space_pix = (self.actuator_spacing / pixelscale).to(u.pixel).value
         scale = act_space_pix / self.actuator_surface.shape[0]
-        # suppress irrelevant scipy warning here
-        import warnings
-        with warnings.catch_warnings():
-            warnings.simplefilter('ignore')
-            return scipy.ndimage.zoom(self.actuator_surface, scale)
+
+        def compute():
+            # suppress irrelevant scipy warning here
+            import warnings
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                return scipy.ndimage.zoom(self.actuator_surface, scale)
+
+        key = ('actuator surface', _array_digest(self.actuator_surface), scale)
+        kernel = _INFLUENCE_CACHE.get_or_compute(key, compute)
+        return (kernel, key) if return_key else kernel
 
     def _load_actuator_surface_file(self, filename=None):
         """ Load an array representing the actuator surface print-through
@@ -323,18 +391,148 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
             with warnings.catch_warnings():
                 warnings.simplefilter('ignore')
 
-                if (hasattr(self, 'shift_x') and self.shift_x !=0):
-                    pixscale_m = wave.pixelscale.to(u.m/u.pixel).value
-                    shift_x_pix = int(np.round(self.shift_x /pixscale_m))
+                shift_y_pix, shift_x_pix = self._get_shift_pixels(wave)
+                if shift_x_pix != 0:
                     interpolated_surface = np.roll(interpolated_surface, shift_x_pix, axis=1)
-
-                if (hasattr(self, 'shift_y') and self.shift_y !=0):
-                    pixscale_m = wave.pixelscale.to(u.m/u.pixel).value
-                    shift_y_pix = int(np.round(self.shift_y /pixscale_m))
+                if shift_y_pix != 0:
                     interpolated_surface = np.roll(interpolated_surface, shift_y_pix, axis=0)
 
         return interpolated_surface
 
+    def _get_shift_pixels(self, wave):
+        """ Shifts of the DM surface in Y and X, rounded to integer pixels in the wavefront """
+        pixscale_m = wave.pixelscale.to(u.m/u.pixel).value
+        return (int(np.round(getattr(self, 'shift_y', 0) / pixscale_m)),
+                int(np.round(getattr(self, 'shift_x', 0) / pixscale_m)))
+
+    def get_influence_matrix(self, wave, threshold=1e-6):
+        """ Return the linear map from actuator commands to OPD, for a given wavefront sampling.
+
+        This is computed directly from the influence functions, rather than by poking
+        each actuator in turn. The OPD for any DM surface is then given by a sparse
+        matrix-vector product::
+
+            matrix = dm.get_influence_matrix(wave)
+            opd = (matrix @ dm.surface.ravel()).reshape(wave.shape)
+
+        which matches dm.get_opd(wave) to within the threshold below, apart from any
+        actuator print through, which does not depend on the actuator commands.
+
+        Parameters
+        ----------
+        wave : Wavefront
+            Wavefront defining the sampling of the OPD
+        threshold : float
+            Influence function values smaller than this fraction of their peak value
+            are omitted, to keep the matrix sparse.
+
+        Returns
+        -------
+        matrix : scipy.sparse.csr_matrix
+            Matrix with one row per wavefront pixel, and one column per actuator, in the
+            same order as self.surface.ravel(). Columns for masked actuators are empty.
+        """
+        # Command vector index of each actuator, in the orientation used by get_opd
+        act_index = np.arange(self._surface.size).reshape(self._surface.shape)
+        if self.flip_x:
+            act_index = np.fliplr(act_index)
+        if self.flip_y:
+            act_index = np.flipud(act_index)
+        if self.include_actuator_mask:
+            act_mask = self._get_surface_arrays_with_orientation()[1]
+            act_index = np.where(act_mask == 0, -1, act_index)
+
+        if self.influence_type == 'from file':
+            rows_y, rows_x, cols, values = self._get_influence_entries_via_convolution(wave, act_index, threshold)
+        else:
+            rows_y, rows_x, cols, values = self._get_influence_entries_via_gaussian(wave, act_index, threshold)
+
+        # Apply shifts, as np.roll does in get_opd
+        shift_y_pix, shift_x_pix = self._get_shift_pixels(wave)
+        rows = ((rows_y + shift_y_pix) % wave.shape[0]) * wave.shape[1] + (rows_x + shift_x_pix) % wave.shape[1]
+
+        return scipy.sparse.csr_matrix((values, (rows, cols)),
+                                       shape=(wave.shape[0] * wave.shape[1], self._surface.size))
+
+    def _get_influence_entries_via_gaussian(self, wave, act_index, threshold):
+        """ Nonzero influence matrix entries for the Gaussian influence function model;
+        see get_influence_matrix and _get_surface_via_gaussian_influence_functions.
+
+        Returns the Y and X pixel indices, actuator indices and values of the entries.
+        """
+        y, x = self.get_coordinates(wave)
+        y_act, x_act = self.get_act_coordinates(one_d=True, include_transformations=False)
+
+        crosstalk = 0.15  # amount of crosstalk on advancent actuator
+        sigma = self.actuator_spacing.to(u.meter).value / np.sqrt((-np.log(crosstalk)))
+
+        separable = np.all(y == y[:, :1]) and np.all(x == x[:1])
+        if separable:
+            gy = np.exp(-((y[:, 0][np.newaxis, :] - y_act[:, np.newaxis]) / sigma) ** 2)
+            gx = np.exp(-((x[0][np.newaxis, :] - x_act[:, np.newaxis]) / sigma) ** 2)
+
+        rows_y, rows_x, cols, values = [], [], [], []
+        for yi, xi in zip(*np.nonzero(act_index >= 0)):
+            if separable:
+                # Only the pixels where both 1D Gaussians exceed the threshold can contribute
+                sy = np.flatnonzero(gy[yi] > threshold)
+                sx = np.flatnonzero(gx[xi] > threshold)
+                influence = np.outer(gy[yi, sy], gx[xi, sx])
+                iy, ix = np.nonzero(influence > threshold)
+                values.append(influence[iy, ix])
+                iy, ix = sy[iy], sx[ix]
+            else:
+                influence = np.exp(-((x - x_act[xi]) ** 2 + (y - y_act[yi]) ** 2) / sigma ** 2)
+                iy, ix = np.nonzero(influence > threshold)
+                values.append(influence[iy, ix])
+            rows_y.append(iy)
+            rows_x.append(ix)
+            cols.append(np.full(iy.size, act_index[yi, xi]))
+
+        return (np.concatenate(rows_y), np.concatenate(rows_x),
+                np.concatenate(cols), np.concatenate(values))
+
+    def _get_influence_entries_via_convolution(self, wave, act_index, threshold, chunk_size=256):
+        """ Nonzero influence matrix entries for an influence function from a file;
+        see get_influence_matrix and _get_surface_via_convolution.
+
+        Each actuator's influence is the rescaled influence function, spread over the
+        2x2 square of pixels nearest the actuator according to its subpixel position.
+        Actuators are processed in chunks of chunk_size to limit memory use.
+
+        Returns the Y and X pixel indices, actuator indices and values of the entries.
+        """
+        act_ind_flat, trace_indices, trace_weights, footprint = self._get_actuator_indices(wave)
+        kernel = self._get_rescaled_influence_func(wave.pixelscale)
+        ky, kx = kernel.shape
+        min_value = threshold * np.abs(kernel).max()
+
+        # pixel offsets of each row of the trace indices from the actuator pixels
+        offsets_y, offsets_x = np.divmod(trace_indices[:, 0] - act_ind_flat[0], wave.shape[1])
+
+        active = np.flatnonzero(act_index.ravel() >= 0)
+        rows_y, rows_x, cols, values = [], [], [], []
+        for chunk in np.array_split(active, max(1, int(np.ceil(active.size / chunk_size)))):
+            influence = np.zeros((chunk.size, ky + 1, kx + 1))
+            for dy, dx, weights in zip(offsets_y, offsets_x, trace_weights):
+                influence[:, dy:dy + ky, dx:dx + kx] += weights[chunk, np.newaxis, np.newaxis] * kernel
+
+            # Pixel coordinates of the influence functions, centered as for the convolution in get_opd
+            base_y, base_x = np.unravel_index(act_ind_flat[chunk], wave.shape)
+            iy = base_y[:, np.newaxis, np.newaxis] - (ky - 1) // 2 + np.arange(ky + 1)[:, np.newaxis]
+            ix = base_x[:, np.newaxis, np.newaxis] - (kx - 1) // 2 + np.arange(kx + 1)
+            iy, ix = np.broadcast_arrays(iy, ix)
+            keep = ((np.abs(influence) > min_value) & (iy >= 0) & (iy < wave.shape[0]) &
+                    (ix >= 0) & (ix < wave.shape[1]))
+
+            rows_y.append(iy[keep])
+            rows_x.append(ix[keep])
+            cols.append(np.broadcast_to(act_index.ravel()[chunk, np.newaxis, np.newaxis], keep.shape)[keep])
+            values.append(influence[keep])
+
+        return (np.concatenate(rows_y), np.concatenate(rows_x),
+                np.concatenate(cols), np.concatenate(values))
+
     def _get_surface_arrays_with_orientation(self):
         """ Return representations of the DM actuators and masks
         possibly with flips horizontally or vertically
@@ -365,6 +563,10 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
 
         Work in progress, oversimplified, not a high fidelity representation of the true influence function
 
+        Since the actuators lie on a regular grid, the Gaussian model is separable when the
+        DM is not rotated: the surface is then computed as Gy.T @ surface @ Gx, where Gy and Gx
+        are the 1D influence functions of each actuator row and column along each axis.
+
         See also self._get_surface_via_convolution
         """
         y, x = self.get_coordinates(wave)
@@ -373,19 +575,25 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
         # them as Gaussian functions relative to the y and x arrays that already include any
         # coordinate transforms present for this optic.
 
-        interpolated_surface = np.zeros(wave.shape)
-
         crosstalk = 0.15  # amount of crosstalk on advancent actuator
         sigma = self.actuator_spacing.to(u.meter).value / np.sqrt((-np.log(crosstalk)))
 
-        pixelscale = x[0, 1] - x[0, 0]  # scale of x,y
-
         # check for flips
         surface, act_mask = self._get_surface_arrays_with_orientation()
+        if self.include_actuator_mask:
+            surface = np.where(act_mask == 0, 0, surface)
+
+        if np.all(y == y[:, :1]) and np.all(x == x[:1]):
+            # The coordinates are aligned with the array axes, so the 2D Gaussians are separable
+            gy = accel_math._exp(-((y[:, 0][np.newaxis, :] - y_act[:, np.newaxis]) / sigma) ** 2)
+            gx = accel_math._exp(-((x[0][np.newaxis, :] - x_act[:, np.newaxis]) / sigma) ** 2)
+            return gy.T.dot(surface).dot(gx)
+
+        interpolated_surface = np.zeros(wave.shape)
 
         for yi, yc in enumerate(y_act):
             for xi, xc in enumerate(x_act):
-                if surface[yi, xi] == 0 or (self.include_actuator_mask and act_mask[yi,xi]==0):
+                if surface[yi, xi] == 0:
                     continue
 
                 # 2d Gaussian
@@ -404,10 +612,8 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
 
             This version uses an influence function read from a file on disk
         """
-        # Determine the center indices of the actuators in wavefront space,
-        # if not already established.
-        if not hasattr(self, '_act_ind_flat') or True:
-            self._setup_actuator_indices(wave)
+        # Determine the indices and subpixel weights of the actuators in wavefront space
+        act_ind_flat, trace_indices, trace_weights, footprint = self._get_actuator_indices(wave)
 
         # check for flips
         surface, act_mask = self._get_surface_arrays_with_orientation()
@@ -418,46 +624,47 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
             target_val = surface.ravel()
 
         # Compute the 'surface trace', i.e the values for each actuator, projected
-        # into the appropriate locations on the detector. For each actuator, we
-        # weight the surface value across a 2x2 square of pixels to account for subpixel
-        # positions of the actuators.
+        # into the appropriate locations on the detector, weighted across a 2x2
+        # square of pixels to account for subpixel positions of the actuators.
+        surface_trace_flat = np.zeros(wave.shape[0] * wave.shape[1])
+        for indices, weights in zip(trace_indices, trace_weights):
+            surface_trace_flat[indices] = weights * target_val
 
-        # First, determine DM actuator coordinates in fractional pixels:
-        # Since we are working in units of square pixels here, we need to include
-        # any coordinate transformations onto the DM actuator coordinates before that.
-        dm_act_m = np.stack(self.get_act_coordinates(include_transformations=True))
-        center = (np.asarray(wave.shape)-1)/2  # need to be careful here re exact wave center
-        center.shape=(2,1,1)
-        dm_act_pix = dm_act_m / wave.pixelscale.to(u.m/u.pixel).value + center
+        # Now we can convolve with the influence function to get the full continuous surface.
+        influence_rescaled, influence_key = self._get_rescaled_influence_func(wave.pixelscale,
+                                                                              return_key=True)
+        dm_surface = _convolve_actuator_trace(surface_trace_flat.reshape(wave.shape),
+                                              influence_rescaled, influence_key,
+                                              footprint=self._get_footprint_slices(footprint))
 
-        # Then iterate over a 2x2 square of pixels, weighting linearly between adjacent pixels
-        # based on the subpixel offset for each actuator
-        fracpart, intpart = np.modf(dm_act_pix)
-        for ix in (0,1):
-            for iy in (0,1):
-                xweight = fracpart[1] if ix==1 else (1-fracpart[1])
-                yweight = fracpart[0] if iy==1 else (1-fracpart[0])
-                try:
-                    self._surface_trace_flat[self._act_ind_flat[0] + ix + iy*wave.shape[0]] = (xweight*yweight).flat*target_val
-                except:
-                    pass # Ignore any actuators outside the FoV
+        return dm_surface
 
+    def _get_actuator_indices(self, wave):
+        """ Return the pixel indices of the actuators in the wavefront array,
+        and the indices and weights for spreading each actuator over a
+        2x2 square of pixels according to its subpixel position.
 
-        # Now we can convolve with the influence function to get the full continuous surface.
-        influence_rescaled = self._get_rescaled_influence_func(wave.pixelscale)
-        dm_surface = scipy.signal.fftconvolve(self._surface_trace_flat.reshape(wave.shape),
-                                              influence_rescaled, mode='same')
+        These depend only on the wavefront sampling and the DM geometry, so they
+        are cached for reuse, and are read-only.
 
-        return dm_surface
+        Returns
+        -------
+        act_ind_flat : ndarray
+            1-d indices of the pixel to the left & down of each actuator center
+        trace_indices, trace_weights : ndarrays
+            1-d indices and weights of the pixels over which to spread each actuator,
+            with one row for each of the (up to) 4 pixel offsets which are within the array.
+        footprint : ndarray
+            Bounding box [y0, y1, x0, x1) of all the pixels in trace_indices
+        """
+        key = ('actuator indices', wave.shape, wave.pixelscale.to(u.m / u.pixel).value,
+               tuple(self.dm_shape), self.actuator_spacing.to(u.m).value, self.pupil_center,
+               getattr(self, 'rotation', 0), getattr(self, 'inclination_x', 0),
+               getattr(self, 'inclination_y', 0))
+        return _INFLUENCE_CACHE.get_or_compute(key, lambda: self._setup_actuator_indices(wave))
 
     def _setup_actuator_indices(self, wave):
-        # This attribute will hold the 1D, flattened indices of each of the
-        # actuators, in the larger wave array.
-        # FIXME this will need to become smarter about when to regenerate these.
-        # for cases with different wave samplings.
-        # For now will just regenerate this every time. Slower but strict.
-        y_wave, x_wave = self.get_coordinates(wave)
-
+        """ Compute the actuator indices and weights; see _get_actuator_indices """
         N_act = self.numacross
         center = (np.asarray(wave.shape)-1)/2  # need to be careful here re exact wave center
 
@@ -494,19 +701,50 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
 
 
         act_trace_flat = act_trace_2d.ravel()
-        self._act_ind_flat = np.nonzero(act_trace_flat)  # 1-d indices of actuator centers in wavefront space
-        if self._act_ind_flat[0].shape[0] < N_act**2:
+        act_ind_flat = np.flatnonzero(act_trace_flat)  # 1-d indices of actuator centers in wavefront space
+        if act_ind_flat.shape[0] < N_act**2:
             raise RuntimeError("The specified sampling is too small a region to include all the DM actuators")
-        self._surface_trace_flat = np.zeros(act_trace_flat.shape)  # flattened representation of DM surface trace
+
+        # Determine DM actuator coordinates in fractional pixels:
+        # Since we are working in units of square pixels here, we need to include
+        # any coordinate transformations onto the DM actuator coordinates before that.
+        dm_act_m = np.stack(self.get_act_coordinates(include_transformations=True))
+        center.shape = (2, 1, 1)
+        dm_act_pix = dm_act_m / wave.pixelscale.to(u.m/u.pixel).value + center
+
+        # Then iterate over a 2x2 square of pixels, weighting linearly between adjacent pixels
+        # based on the subpixel offset for each actuator
+        fracpart, intpart = np.modf(dm_act_pix)
+        trace_indices, trace_weights = [], []
+        for ix in (0,1):
+            for iy in (0,1):
+                xweight = fracpart[1] if ix==1 else (1-fracpart[1])
+                yweight = fracpart[0] if iy==1 else (1-fracpart[0])
+                indices = act_ind_flat + ix + iy*wave.shape[1]
+                if indices.max() >= act_trace_flat.size:
+                    continue  # Ignore any actuators outside the FoV
+                trace_indices.append(indices)
+                trace_weights.append((xweight*yweight).ravel())
+
+        trace_indices = np.asarray(trace_indices)
+        trace_y, trace_x = np.unravel_index(trace_indices, wave.shape)
+        footprint = np.array([trace_y.min(), trace_y.max() + 1, trace_x.min(), trace_x.max() + 1])
+
+        return act_ind_flat, trace_indices, np.asarray(trace_weights), footprint
+
+    def _get_footprint_slices(self, footprint):
+        """ Region of the wavefront array over which to convolve the actuator trace,
+        or None for the whole array; see conf.dm_crop_to_footprint """
+        if not conf.dm_crop_to_footprint:
+            return None
+        return slice(footprint[0], footprint[1]), slice(footprint[2], footprint[3])
 
     def _get_actuator_print_through(self, wave):
         """ DM surface print through. This function currently hardcoded for Boston MEMS.
         TODO - write something more generalized. """
 
-        # Determine the center indices of the actuators in wavefront space,
-        # if not already established.
-        if not hasattr(self, '_act_ind_flat') or True:
-            self._setup_actuator_indices(wave)
+        # Determine the center indices of the actuators in wavefront space
+        act_ind_flat, trace_indices, trace_weights, footprint = self._get_actuator_indices(wave)
 
         # Set physical DM surface trace -
         # this is constant for the surface print through, for all actuators that are present.
@@ -515,11 +753,14 @@ class ContinuousDeformableMirror(optics.AnalyticOpticalElement):
         else:
             target_val = 1
 
-        self._surface_trace_flat[self._act_ind_flat] = target_val
+        surface_trace_flat = np.zeros(wave.shape[0] * wave.shape[1])
+        surface_trace_flat[act_ind_flat] = target_val
 
-        actuator_rescaled = self._get_rescaled_actuator_surface(wave.pixelscale)
-        dm_surface = scipy.signal.fftconvolve(self._surface_trace_flat.reshape(wave.shape),
-                                              actuator_rescaled, mode='same')
+        actuator_rescaled, actuator_key = self._get_rescaled_actuator_surface(wave.pixelscale,
+                                                                              return_key=True)
+        dm_surface = _convolve_actuator_trace(surface_trace_flat.reshape(wave.shape),
+                                              actuator_rescaled, actuator_key,
+                                              footprint=self._get_footprint_slices(footprint))
 
         return dm_surface
 
@@ -662,6 +903,9 @@ class HexSegmentedDeformableMirror(optics.MultiHexagonAperture):
 
     """
 
+    # the segment transmission is computed here without gray pixels
+    _gray_pixel_supported = False
+
     def __init__(self, rings=3, flattoflat=1.0 * u.m, gap=0.01 * u.m,
                  name='HexDM', center=True, **kwargs):
         optics.MultiHexagonAperture.__init__(self, name=name, rings=rings, flattoflat=flattoflat,
@@ -720,38 +964,93 @@ class HexSegmentedDeformableMirror(optics.MultiHexagonAperture):
             self._last_npix = npix
             self._last_pixelscale = pixelscale
 
-        self._seg_mask = np.zeros((npix, npix))
         self._seg_x = np.zeros((npix, npix))
         self._seg_y = np.zeros((npix, npix))
         self._seg_indices = dict()
 
-        self.transmission = np.zeros((npix, npix))
-        for i in self.segmentlist:
-            self._one_hexagon(wave, i, value=i+1)
-        self._seg_mask = self.transmission
+        self._seg_mask = self._segment_ids(wave)
         self._transmission = np.asarray(self._seg_mask != 0, dtype=float)
 
         y, x = poppy_core.Wavefront.pupil_coordinates((npix, npix), pixelscale)
 
-        for i in self.segmentlist:
-            wseg = np.where(self._seg_mask == i+1)
+        # group the pixels by segment with a single sort of the segment ID map,
+        # rather than searching the whole array once per segment
+        order = np.argsort(self._seg_mask, axis=None, kind='stable')
+        sorted_ids = self._seg_mask.ravel()[order]
+        segment_ids = np.asarray(self.segmentlist) + 1
+        starts = np.searchsorted(sorted_ids, segment_ids, side='left')
+        ends = np.searchsorted(sorted_ids, segment_ids, side='right')
+
+        for i, start, end in zip(self.segmentlist, starts, ends):
+            wseg = np.unravel_index(order[start:end], (npix, npix))
             self._seg_indices[i] = wseg
             ceny, cenx = self._hex_center(i)
             self._seg_x[wseg] = x[wseg] - cenx
             self._seg_y[wseg] = y[wseg] - ceny
 
+        # output and work arrays for get_opd, reused by each call with this sampling
+        self.opd = np.zeros((npix, npix))
+        self._opd_work = np.zeros((npix, npix))
+
     def get_opd(self, wave):
-        """ Return OPD  - Faster version with caching"""
+        """ Return OPD  - Faster version with caching
+
+        The piston, tip, and tilt of each pixel's segment are looked up from the
+        segment ID map, so that all segments are computed together. The result is
+        written into an array which is reused by later calls with the same sampling;
+        copy it if it needs to be kept after the DM surface is changed.
+        """
         self._setup_arrays(wave.shape[0], wave.pixelscale, wave=wave)
 
-        self.opd = np.zeros(wave.shape)
-        for i in self.segmentlist:
-            wseg = self._seg_indices[i]
-            self.opd[wseg] = (self._surface[i, 0] +
-                              self._surface[i, 1] * self._seg_x[wseg] +
-                              self._surface[i, 2] * self._seg_y[wseg])
+        # segment ID 0 denotes pixels outside all segments, which have zero OPD
+        coefficients = np.zeros((self._surface.shape[0] + 1, 3))
+        coefficients[1:] = self._surface
+
+        # opd = piston[id] + tip[id] * seg_x + tilt[id] * seg_y
+        # (the IDs are always in range; mode='clip' just avoids np.take buffering its output)
+        np.take(coefficients[:, 1], self._seg_mask, out=self.opd, mode='clip')
+        self.opd *= self._seg_x
+        np.take(coefficients[:, 2], self._seg_mask, out=self._opd_work, mode='clip')
+        self._opd_work *= self._seg_y
+        self.opd += self._opd_work
+        np.take(coefficients[:, 0], self._seg_mask, out=self._opd_work, mode='clip')
+        self.opd += self._opd_work
         return self.opd
 
+    def get_influence_matrix(self, wave):
+        """ Return the linear map from segment piston, tip and tilt commands to OPD,
+        for a given wavefront sampling.
+
+        The OPD for any DM surface is then given by a sparse matrix-vector product::
+
+            matrix = dm.get_influence_matrix(wave)
+            opd = (matrix @ dm.surface.ravel()).reshape(wave.shape)
+
+        Parameters
+        ----------
+        wave : Wavefront
+            Wavefront defining the sampling of the OPD
+
+        Returns
+        -------
+        matrix : scipy.sparse.csr_matrix
+            Matrix with one row per wavefront pixel, and one column per actuator, in the
+            same order as self.surface.ravel(); i.e. the piston, tip and tilt of each
+            segment in turn.
+        """
+        self._setup_arrays(wave.shape[0], wave.pixelscale, wave=wave)
+
+        rows, cols, values = [], [], []
+        for i in self.segmentlist:
+            wseg = np.ravel_multi_index(self._seg_indices[i], wave.shape)
+            rows.append(np.tile(wseg, 3))
+            cols.append(np.repeat(3 * i + np.arange(3), wseg.size))
+            values.append(np.concatenate([np.ones(wseg.size), self._seg_x.ravel()[wseg],
+                                          self._seg_y.ravel()[wseg]]))
+
+        return scipy.sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                                       shape=(wave.shape[0] * wave.shape[1], self._surface.size))
+
     def get_transmission(self, wave):
         """ Return transmission - Faster version with caching"""
         # return optics.MultiHexagonAperture.get_transmission(self,wave)
@@ -5,7 +5,8 @@ import logging
 import time
 
 import poppy
-from poppy.poppy_core import PlaneType, Wavefront, BaseWavefront, BaseOpticalSystem
+from poppy.poppy_core import (PlaneType, Wavefront, BaseWavefront, BaseOpticalSystem,
+                              _cached_coordinates, _pixelscale_key)
 from . import utils
 from . import accel_math
 if accel_math._USE_NUMEXPR:
@@ -136,6 +137,8 @@ class QuadraticLens(QuadPhase):
 
 
 class ConicLens(poppy.optics.CircularAperture):
+    _cache_phasor = True
+
     @u.quantity_input(f_lens=u.m, radius=u.m)
     def __init__(self,
                  f_lens=1.0 * u.m,
@@ -449,14 +452,14 @@ class FresnelWavefront(BaseWavefront):
 
         For Fresnel wavefronts, this depends on the focal length to get the image scale right.
 
+        The returned arrays are cached for reuse, and so are read-only.
+
         Returns
         -------
         Y, X :  array_like
             Wavefront coordinates in either meters or arcseconds for pupil and image, respectively
         """
 
-        y, x = type(self).pupil_coordinates(self._x, self._y, self._pixelscale_m)
-
         # If the wavefront been explicitly set to use angular units,
         # for instance at an image plane,then
         # then convert to angular coordinates using the focal length
@@ -465,10 +468,29 @@ class FresnelWavefront(BaseWavefront):
                 raise ValueError("Cannot convert to angular units for a beam with infinite focal length")
             platescale = (1 * u.radian / self.focal_length).to(u.arcsec / u.m)
             _log.debug("Converting to angular coords using plate scale = {}".format(platescale))
-            y *= platescale.value
-            x *= platescale.value
-
-        return y, x
+        else:
+            platescale = None
+
+        def compute():
+            y, x = type(self).pupil_coordinates(self._x, self._y, self._pixelscale_m)
+            if platescale is not None:
+                y *= platescale.value
+                x *= platescale.value
+            return y, x
+
+        key = self._coordinates_key()
+        if key is None:
+            return compute()
+        return _cached_coordinates(key, compute)
+
+    def _coordinates_key(self):
+        if type(self).coordinates is not FresnelWavefront.coordinates:
+            return None  # coordinates customized by a subclass
+        platescale = None
+        if self.angular_coordinates and np.isfinite(self.focal_length.value):
+            platescale = (1 * u.radian / self.focal_length).to(u.arcsec / u.m).value
+        return (type(self), self._x.shape, _pixelscale_key(self._pixelscale_m.to(u.m / u.pixel).value),
+                platescale)
 
     @property
     def pixelscale(self):
@@ -62,8 +62,8 @@ def _oneside(x, y0, y1, r):
     if np.isscalar(y0): y0 = np.asarray(y0)
     if np.isscalar(y1): y1 = np.asarray(y1)
     sx = x.shape
-    ans = np.zeros(sx, dtype=np.float)
-    yh = np.zeros(sx, dtype=np.float)
+    ans = np.zeros(sx, dtype=float)
+    yh = np.zeros(sx, dtype=float)
     to = (abs(x) >= r)
     ti = (abs(x) < r)
     if np.any(to):
@@ -218,3 +218,122 @@ def filled_circle_aa(shape, xcenter, ycenter, radius, xarray=None, yarray=None,
         return np.asarray(array).clip(*cliprange)
     else:
         return array
+
+
+def _regular_axes(shape, xarray, yarray):
+    """ Return the 1D pixel center coordinates along each axis for a regular grid
+    given by 2D coordinate arrays (or pixel indices if those are None), and check
+    that the grid is regular, with increasing coordinates. """
+    if xarray is None or yarray is None:
+        return np.arange(shape[1], dtype=float), np.arange(shape[0], dtype=float)
+    xaxis = np.asarray(xarray[0, :], dtype=float)
+    yaxis = np.asarray(yarray[:, 0], dtype=float)
+    for axis in (xaxis, yaxis):
+        if axis.size > 1:
+            step = np.diff(axis)
+            if not (np.all(step > 0) and np.allclose(step, step[0], rtol=1e-6, atol=0)):
+                raise ValueError("Coordinate arrays must be a regular grid with increasing coordinates")
+    return xaxis, yaxis
+
+
+def filled_polygon_aa(shape, vertices_x, vertices_y, xarray=None, yarray=None, fillvalue=1):
+    """Draw filled polygons with exact subpixel antialiasing into an array.
+
+    The value of each pixel is the fraction of its area that lies within the
+    polygon, computed exactly from the polygon edges, rather than by supersampling.
+
+    Parameters
+    -------------
+    shape : 2d ndarray
+        shape of array to return
+    vertices_x, vertices_y : array_like
+        (X, Y) coordinates of the polygon vertices, in order around the polygon
+        (either direction), in the coordinate system specified by the xarray and
+        yarray parameters, if those are given. The polygon must not self-intersect.
+        To draw several polygons at once, give a sequence of such vertex arrays;
+        the polygons should not overlap.
+    xarray, yarray : 2d ndarrays
+        X and Y coordinates corresponding to the center of each pixel
+        in the main array. If not present, integer pixel indices are assumed.
+        These must form a regular, increasing grid, such as from np.indices or
+        Wavefront.coordinates(); pixels may be rectangular.
+    fillvalue : float
+        Value for pixels that are entirely within the polygon. Default is 1
+    """
+    xaxis, yaxis = _regular_axes(shape, xarray, yarray)
+    ny, nx = shape
+    if np.ndim(vertices_x[0]) == 0:
+        vertices_x, vertices_y = [vertices_x], [vertices_y]
+
+    # Work in units of pixels, with pixel (i, j) covering [j-0.5, j+0.5] x [i-0.5, i+0.5]
+    dx = xaxis[1] - xaxis[0] if nx > 1 else 1.0
+    dy = yaxis[1] - yaxis[0] if ny > 1 else 1.0
+
+    # The area of a polygon within each pixel is the contour integral, around the
+    # polygon clockwise, of the height of its boundary above the pixel's lower edge,
+    # clamped to the pixel. Rows entirely below an edge get the full width of the
+    # edge within that column, which is accumulated as a cumulative sum; only the
+    # rows which an edge actually crosses need the clamped integral.
+    coverage = np.zeros(shape)
+    full = np.zeros((ny + 1, nx))
+    for poly_x, poly_y in zip(vertices_x, vertices_y):
+        vx = (np.asarray(poly_x, dtype=float) - xaxis[0]) / dx
+        vy = (np.asarray(poly_y, dtype=float) - yaxis[0]) / dy
+        if np.sum(vx * np.roll(vy, -1) - np.roll(vx, -1) * vy) > 0:
+            vx, vy = vx[::-1], vy[::-1]  # counterclockwise, so reverse
+
+        for xa, ya, xb, yb in zip(vx, vy, np.roll(vx, -1), np.roll(vy, -1)):
+            _add_edge_coverage(coverage, full, xa, ya, xb, yb)
+
+    coverage += np.cumsum(full, axis=0)[:ny]
+    return np.clip(coverage, 0, 1) * fillvalue
+
+
+def _add_edge_coverage(coverage, full, xa, ya, xb, yb):
+    """ Add the contribution of one edge of a clockwise polygon, from (xa, ya)
+    to (xb, yb) in pixel units, to the arrays used by filled_polygon_aa """
+    if xa == xb:
+        return  # vertical edges contribute nothing
+    ny, nx = coverage.shape
+    sign = 1.0
+    if xb < xa:
+        xa, ya, xb, yb = xb, yb, xa, ya
+        sign = -1.0
+    slope = (yb - ya) / (xb - xa)
+
+    cols = np.arange(max(int(np.floor(xa + 0.5)), 0), min(int(np.floor(xb + 0.5)), nx - 1) + 1)
+    u0 = np.maximum(xa, cols - 0.5)
+    u1 = np.minimum(xb, cols + 0.5)
+    keep = u1 > u0
+    cols, u0, u1 = cols[keep], u0[keep], u1[keep]
+    if cols.size == 0:
+        return
+    width = sign * (u1 - u0)
+    p = ya + slope * (u0 - xa)
+    q = ya + slope * (u1 - xa)
+
+    # all rows below those which the edge crosses are fully covered in this column
+    first = np.clip(np.floor(np.minimum(p, q) + 0.5).astype(int), 0, ny)
+    last = np.clip(np.floor(np.maximum(p, q) + 0.5).astype(int), -1, ny - 1)
+    full[0, cols] += width
+    full[first, cols] -= width
+
+    counts = np.maximum(last - first + 1, 0)
+    if counts.sum() == 0:
+        return
+    idx = np.repeat(np.arange(cols.size), counts)
+    rows = first[idx] + np.arange(idx.size) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # mean over the edge of its height above the row's lower edge, clamped to [0, 1],
+    # from the antiderivative of that clamped height
+    hp, hq = p[idx] - (rows - 0.5), q[idx] - (rows - 0.5)
+
+    def antiderivative(h):
+        t = np.clip(h, 0, 1)
+        return 0.5 * t ** 2 + np.maximum(h - 1, 0)
+
+    dh = hq - hp
+    level = np.abs(dh) < 1e-12
+    mean_height = np.where(level, np.clip(0.5 * (hp + hq), 0, 1),
+                           (antiderivative(hq) - antiderivative(hp)) / np.where(level, 1, dh))
+    coverage[rows, cols[idx]] += width[idx] * mean_height
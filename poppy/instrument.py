@@ -1,3 +1,4 @@
+import copy
 import getpass
 import os
 import platform
@@ -303,6 +304,9 @@ class Instrument(object):
     def calc_datacube(self, wavelengths, *args, **kwargs):
         """Calculate a spectral datacube of PSFs
 
+        If `poppy.conf.use_multiprocessing` is set and `poppy.conf.parallel_backend` is 'threads',
+        the PSFs for each wavelength are computed in parallel threads.
+
         Parameters
         -----------
         wavelengths : iterable of floats
@@ -323,9 +327,23 @@ class Instrument(object):
             cube[ext].header['WAVELN00'] = wavelengths[0]
 
         # iterate rest of wavelengths
-        for i in range(1, nwavelengths):
+        if conf.use_multiprocessing and conf.parallel_backend == 'threads' and nwavelengths > 2:
+            def calc_psf_for_thread(wl):
+                # calc_psf stores per-calculation state on the instrument, in self.options and
+                # self.optsys, so give each calculation its own copy of those
+                inst = copy.copy(self)
+                inst.options = dict(self.options)
+                return inst.calc_psf(*args, monochromatic=wl, **kwargs)
+
+            nthreads = conf.n_processes if conf.n_processes > 1 \
+                else utils.estimate_optimal_nprocesses(self.optsys, nwavelengths=nwavelengths - 1)
+            poppy_core._log.info("Calculating {} wavelengths using {} threads".format(nwavelengths - 1, nthreads))
+            psfs = poppy_core._get_thread_pool(int(nthreads)).map(calc_psf_for_thread, wavelengths[1:])
+        else:
+            psfs = (self.calc_psf(*args, monochromatic=wl, **kwargs) for wl in wavelengths[1:])
+
+        for i, psf in enumerate(psfs, start=1):
             wl = wavelengths[i]
-            psf = self.calc_psf(*args, monochromatic=wl, **kwargs)
             for ext in range(len(psf)):
                 cube[ext].data[i] = psf[ext].data
                 cube[ext].header['WAVELN{:02d}'.format(i)] = wl
@@ -46,6 +46,7 @@ __all__ = ['MatrixFourierTransform']
 import numpy as np
 from . import conf
 from . import accel_math
+from . import utils
 if accel_math._USE_NUMEXPR:
     import numexpr as ne
 
@@ -58,64 +59,29 @@ SYMMETRIC = 'SYMMETRIC'
 ADJUSTABLE = 'ADJUSTABLE'
 CENTERING_CHOICES = (FFTSTYLE, SYMMETRIC, ADJUSTABLE, FFTRECT)
 
-def matrix_dft(plane, nlamD, npix,
-               offset=None, inverse=False, centering=FFTSTYLE):
-    """Perform a matrix discrete Fourier transform with selectable
-    output sampling and centering.
+# Cache of DFT factor matrices (expYV, expXU) for reuse, within conf.matrix_dft_cache_size.
+# The matrices are read-only, since they are shared between calls.
+_DFT_MATRICES = utils.ArrayCache('matrix DFT', 'matrix_dft_cache_size')
 
-    Where parameters can be supplied as either scalars or 2-tuples, the first
-    element of the 2-tuple is used for the Y dimension and the second for the
-    X dimension. This ordering matches that of numpy.ndarray.shape attributes
-    and that of Python indexing.
 
-    To achieve exact correspondence to the FFT set nlamD and npix to the size
-    of the input array in pixels and use 'FFTSTYLE' centering. (n.b. When
-    using `numpy.fft.fft2` you must `numpy.fft.fftshift` the input pupil both
-    before and after applying fft2 or else it will introduce a checkerboard
-    pattern in the signs of alternating pixels!)
+def clear_dft_matrix_cache():
+    """ Discard all cached DFT factor matrices, to free their memory """
+    _DFT_MATRICES.clear()
 
-    Parameters
-    ----------
-    plane : 2D ndarray
-        2D array (either real or complex) representing the input image plane or
-        pupil plane to transform.
-    nlamD : float or 2-tuple of floats (nlamDY, nlamDX)
-        Size of desired output region in lambda / D units, assuming that the
-        pupil fills the input array (corresponds to 'm' in
-        Soummer et al. 2007 4.2). This is in units of the spatial frequency that
-        is just Nyquist sampled by the input array.) If given as a tuple,
-        interpreted as (nlamDY, nlamDX).
-    npix : int or 2-tuple of ints (npixY, npixX)
-        Number of pixels per side side of destination plane array (corresponds
-        to 'N_B' in Soummer et al. 2007 4.2). This will be the # of pixels in
-        the image plane for a forward transformation, in the pupil plane for an
-        inverse. If given as a tuple, interpreted as (npixY, npixX).
-    inverse : bool, optional
-        Is this a forward or inverse transformation? (Default is False,
-        implying a forward transformation.)
-    centering : {'FFTSTYLE', 'SYMMETRIC', 'ADJUSTABLE'}, optional
-        What type of centering convention should be used for this FFT?
 
-        * ADJUSTABLE (the default) For an output array with ODD size n,
-          the PSF center will be at the center of pixel (n-1)/2. For an output
-          array with EVEN size n, the PSF center will be in the corner between
-          pixel (n/2-1, n/2-1) and (n/2, n/2)
-        * FFTSTYLE puts the zero-order term in a single pixel.
-        * SYMMETRIC spreads the zero-order term evenly between the center
-          four pixels
+def _dft_factors(plane, nlamD, npix, offset, inverse, centering, compute_matrices, per_plane=False):
+    """ Check the arguments to a matrix DFT, and return the factor matrices
+    (expYV, expXU) and normalization coefficient needed to compute it.
 
-    offset : 2-tuple of floats (offsetY, offsetX)
-        For ADJUSTABLE-style transforms, an offset in pixels by which the PSF
-        will be displaced from the central pixel (or cross). Given as
-        (offsetY, offsetX).
+    The factor matrices are taken from the cache if available, otherwise computed
+    using the supplied compute_matrices function and cached. If per_plane is set,
+    nlamD gives a different value for each plane in a stack of planes, and the
+    matrices and normalization are stacked in turn, with one per plane along the
+    first axis.
     """
+    float = accel_math._float() # shadow builtin float with either np.float32 or np.float64, depending
 
-    if accel_math._USE_NUMEXPR:
-        return matrix_dft_numexpr(plane, nlamD, npix,
-               offset=offset, inverse=inverse, centering=centering)
-    float = accel_math._float()
-
-    npupY, npupX = plane.shape
+    npupY, npupX = plane.shape[-2:]
 
     try:
         if np.isscalar(npix):
@@ -132,11 +98,21 @@ def matrix_dft(plane, nlamD, npix,
     if npixX != int(npixX) or npixY != int(npixY):
         raise TypeError("'npix' must be supplied as integer value(s)")
 
+    if per_plane:
+        if plane.ndim != 3 or np.shape(nlamD) not in ((plane.shape[0],), (plane.shape[0], 2)):
+            raise ValueError(
+                "With per_plane=True, 'plane' must be a 3D stack of nplanes planes and"
+                " 'nlamD' an array of shape (nplanes,) or (nplanes, 2)"
+            )
     try:
-        if np.isscalar(nlamD):
-            nlamDY, nlamDX = float(nlamD), float(nlamD)
+        if per_plane:
+            nlamD = np.asarray(nlamD, dtype=float)
+            nlamDYs, nlamDXs = (nlamD, nlamD) if nlamD.ndim == 1 else (nlamD[:, 0], nlamD[:, 1])
+        elif np.isscalar(nlamD):
+            nlamDYs, nlamDXs = [float(nlamD)], [float(nlamD)]
         else:
             nlamDY, nlamDX = tuple(np.asarray(nlamD, dtype=float))
+            nlamDYs, nlamDXs = [nlamDY], [nlamDX]
     except ValueError:
         raise ValueError(
             "'nlamD' must be supplied as a scalar (for square arrays) or as"
@@ -144,8 +120,43 @@ def matrix_dft(plane, nlamD, npix,
         )
 
     centering = centering.upper()
+    if centering == ADJUSTABLE and offset is not None:
+        try:
+            offsetY, offsetX = tuple(np.asarray(offset, dtype=float))
+        except ValueError:
+            raise ValueError(
+                "'offset' must be supplied as a 2-tuple with "
+                "(y_offset, x_offset) as floating point values"
+            )
+    else:
+        offsetY, offsetX = 0.0, 0.0
+
+    # The factor matrices depend only on the transform geometry, so are cached for reuse
+    all_matrices = []
+    for nlamDY, nlamDX in zip(nlamDYs, nlamDXs):
+        key = (compute_matrices.__name__, npupY, npupX, npixY, npixX, float(nlamDY), float(nlamDX),
+               offsetY, offsetX, centering, inverse, np.dtype(float))
+        matrices = _DFT_MATRICES.get_or_compute(
+            key, lambda: tuple(compute_matrices(npupY, npupX, npixY, npixX, nlamDY, nlamDX,
+                                                offsetY, offsetX, centering, inverse)))
+        all_matrices.append(matrices)
+
+    nlamDYs, nlamDXs = np.asarray(nlamDYs), np.asarray(nlamDXs)
+    norm_coeff = np.sqrt((nlamDYs * nlamDXs) / (npupY * npupX * npixY * npixX))
+    if per_plane:
+        expYV = np.stack([matrices[0] for matrices in all_matrices])
+        expXU = np.stack([matrices[1] for matrices in all_matrices])
+        return expYV, expXU, norm_coeff[:, np.newaxis, np.newaxis]
+    else:
+        expYV, expXU = all_matrices[0]
+        return expYV, expXU, norm_coeff[0]
 
 
+def _compute_dft_matrices(npupY, npupX, npixY, npixX, nlamDY, nlamDX,
+                          offsetY, offsetX, centering, inverse):
+    """ Compute the factor matrices (expYV, expXU) for a matrix DFT. """
+    float = accel_math._float()
+
     # In the following: X and Y are coordinates in the input plane 
     #                   U and V are coordinates in the output plane 
 
@@ -168,16 +179,6 @@ def matrix_dft(plane, nlamD, npix,
         Us = (np.arange(npixX, dtype=float) - npixX / 2) * dU
         Vs = (np.arange(npixY, dtype=float) - npixY / 2) * dV
     elif centering == ADJUSTABLE:
-        if offset is None:
-            offsetY, offsetX = 0.0, 0.0
-        else:
-            try:
-                offsetY, offsetX = tuple(np.asarray(offset, dtype=float))
-            except ValueError:
-                raise ValueError(
-                    "'offset' must be supplied as a 2-tuple with "
-                    "(y_offset, x_offset) as floating point values"
-                )
         Xs = (np.arange(npupX, dtype=float) - float(npupX) / 2.0 - offsetX + 0.5) * dX
         Ys = (np.arange(npupY, dtype=float) - float(npupY) / 2.0 - offsetY + 0.5) * dY
 
@@ -198,22 +199,80 @@ def matrix_dft(plane, nlamD, npix,
     if inverse:
         expYV = np.exp(-2.0 * np.pi * -1j * YV).T
         expXU = np.exp(-2.0 * np.pi * -1j * XU)
-        t1 = np.dot(expYV, plane)
-        t2 = np.dot(t1, expXU)
     else:
         expXU = np.exp(-2.0 * np.pi * 1j * XU)
         expYV = np.exp(-2.0 * np.pi * 1j * YV).T
-        t1 = np.dot(expYV, plane)
-        t2 = np.dot(t1, expXU)
 
-    norm_coeff = np.sqrt((nlamDY * nlamDX) / (npupY * npupX * npixY * npixX))
-    return norm_coeff * t2
+    return expYV, expXU
 
 
-def matrix_dft_numexpr(plane, nlamD, npix,
-               offset=None, inverse=False, centering=FFTSTYLE):
+def _compute_dft_matrices_numexpr(npupY, npupX, npixY, npixX, nlamDY, nlamDX,
+                                  offsetY, offsetX, centering, inverse):
+    """ Compute the factor matrices (expYV, expXU) for a matrix DFT, using numexpr. """
+    float = accel_math._float()
+
+    # In the following: X and Y are coordinates in the input plane 
+    #                   U and V are coordinates in the output plane 
+
+    if inverse:
+        dX = nlamDX / float(npupX)
+        dY = nlamDY / float(npupY)
+        dU = 1.0 / float(npixX)
+        dV = 1.0 / float(npixY)
+    else:
+        dU = nlamDX / float(npixX)
+        dV = nlamDY / float(npixY)
+        dX = 1.0 / float(npupX)
+        dY = 1.0 / float(npupY)
+
+
+    # Setup arrays since numexpr can't call arange directly
+    ar_npupX = np.arange(npupX, dtype=float)
+    ar_npupY = np.arange(npupY, dtype=float)
+    ar_npixX = np.arange(npixX, dtype=float)
+    ar_npixY = np.arange(npixY, dtype=float)
+
+    if centering == FFTSTYLE:
+        Xs = ne.evaluate("(ar_npupX - (npupX / 2)) * dX")
+        Ys = ne.evaluate("(ar_npupY - (npupY / 2)) * dY")
+
+        Us = ne.evaluate("(ar_npixX - npixX / 2) * dU")
+        Vs = ne.evaluate("(ar_npixY - npixY / 2) * dV")
+
+    elif centering == ADJUSTABLE:
+        Xs = ne.evaluate("(ar_npupX - (npupX) / 2.0 - offsetX + 0.5) * dX")
+        Ys = ne.evaluate("(ar_npupY - (npupY) / 2.0 - offsetY + 0.5) * dY")
+
+        Us = ne.evaluate("(ar_npixX - (npixX) / 2.0 - offsetX + 0.5) * dU")
+        Vs = ne.evaluate("(ar_npixY - (npixY) / 2.0 - offsetY + 0.5) * dV")
+
+    elif centering == SYMMETRIC:
+        Xs = ne.evaluate("(ar_npupX - (npupX) / 2.0 + 0.5) * dX")
+        Ys = ne.evaluate("(ar_npupY - (npupY) / 2.0 + 0.5) * dY")
+
+        Us = ne.evaluate("(ar_npixX - (npixX) / 2.0 + 0.5) * dU")
+        Vs = ne.evaluate("(ar_npixY - (npixY) / 2.0 + 0.5) * dV")
+    else:
+        raise ValueError("Invalid centering style")
+
+    XU = np.outer(Xs, Us)
+    YV = np.outer(Ys, Vs)
+
+    pi = np.pi
+    if inverse:
+        expYV = ne.evaluate("exp(-2.0 * pi * -1j * YV)").T
+        expXU = ne.evaluate("exp(-2.0 * pi * -1j * XU)")
+    else:
+        expYV = ne.evaluate("exp(-2.0 * pi * 1j * YV)").T
+        expXU = ne.evaluate("exp(-2.0 * pi * 1j * XU)")
+
+    return expYV, expXU
+
+
+def matrix_dft(plane, nlamD, npix,
+               offset=None, inverse=False, centering=FFTSTYLE, per_plane=False):
     """Perform a matrix discrete Fourier transform with selectable
-    output sampling and centering. This version accelerated with numexpr.
+    output sampling and centering.
 
     Where parameters can be supplied as either scalars or 2-tuples, the first
     element of the 2-tuple is used for the Y dimension and the second for the
@@ -230,13 +289,17 @@ def matrix_dft_numexpr(plane, nlamD, npix,
     ----------
     plane : 2D ndarray
         2D array (either real or complex) representing the input image plane or
-        pupil plane to transform.
+        pupil plane to transform. A 3D array of shape (nplanes, ny, nx) may
+        also be given, in which case all planes in the stack are transformed
+        in a single batched matrix product.
     nlamD : float or 2-tuple of floats (nlamDY, nlamDX)
         Size of desired output region in lambda / D units, assuming that the
         pupil fills the input array (corresponds to 'm' in
         Soummer et al. 2007 4.2). This is in units of the spatial frequency that
         is just Nyquist sampled by the input array.) If given as a tuple,
-        interpreted as (nlamDY, nlamDX).
+        interpreted as (nlamDY, nlamDX). If per_plane is set, an array of
+        shape (nplanes,) or (nplanes, 2) giving a different nlamD for each
+        plane of a 3D stack, e.g. for several wavelengths at once.
     npix : int or 2-tuple of ints (npixY, npixX)
         Number of pixels per side side of destination plane array (corresponds
         to 'N_B' in Soummer et al. 2007 4.2). This will be the # of pixels in
@@ -246,7 +309,7 @@ def matrix_dft_numexpr(plane, nlamD, npix,
         Is this a forward or inverse transformation? (Default is False,
         implying a forward transformation.)
     centering : {'FFTSTYLE', 'SYMMETRIC', 'ADJUSTABLE'}, optional
-        What type of centering convention should be used for this FFT? 
+        What type of centering convention should be used for this FFT?
 
         * ADJUSTABLE (the default) For an output array with ODD size n,
           the PSF center will be at the center of pixel (n-1)/2. For an output
@@ -260,115 +323,93 @@ def matrix_dft_numexpr(plane, nlamD, npix,
         For ADJUSTABLE-style transforms, an offset in pixels by which the PSF
         will be displaced from the central pixel (or cross). Given as
         (offsetY, offsetX).
+    per_plane : bool, optional
+        Whether nlamD gives a separate value for each plane of a 3D stack.
+        Otherwise (the default) the same nlamD is used for all planes.
     """
 
-    npupY, npupX = plane.shape
-    float = accel_math._float() # shadow builtin float with either np.float32 or np.float64, depending
-
-    try:
-        if np.isscalar(npix):
-            npixY, npixX = float(npix), float(npix)
-        else:
-            npixY, npixX = tuple(np.asarray(npix, dtype=float))
-    except ValueError:
-        raise ValueError(
-            "'npix' must be supplied as a scalar (for square arrays) or as "
-            "a 2-tuple of ints (npixY, npixX)"
-        )
-
-    # make sure these are integer values
-    if npixX != int(npixX) or npixY != int(npixY):
-        raise TypeError("'npix' must be supplied as integer value(s)")
-
-    try:
-        if np.isscalar(nlamD):
-            nlamDY, nlamDX = float(nlamD), float(nlamD)
-        else:
-            nlamDY, nlamDX = tuple(np.asarray(nlamD, dtype=float))
-    except ValueError:
-        raise ValueError(
-            "'nlamD' must be supplied as a scalar (for square arrays) or as"
-            " a 2-tuple of floats (nlamDY, nlamDX)"
-        )
+    if accel_math._USE_NUMEXPR:
+        return matrix_dft_numexpr(plane, nlamD, npix,
+               offset=offset, inverse=inverse, centering=centering, per_plane=per_plane)
 
-    centering = centering.upper()
+    expYV, expXU, norm_coeff = _dft_factors(plane, nlamD, npix, offset, inverse, centering,
+                                            _compute_dft_matrices, per_plane)
 
+    t1 = np.matmul(expYV, plane)
+    t2 = np.matmul(t1, expXU)
 
-    # In the following: X and Y are coordinates in the input plane 
-    #                   U and V are coordinates in the output plane 
-
-    if inverse:
-        dX = nlamDX / float(npupX)
-        dY = nlamDY / float(npupY)
-        dU = 1.0 / float(npixX)
-        dV = 1.0 / float(npixY)
-    else:
-        dU = nlamDX / float(npixX)
-        dV = nlamDY / float(npixY)
-        dX = 1.0 / float(npupX)
-        dY = 1.0 / float(npupY)
-
+    return norm_coeff * t2
 
-    # Setup arrays since numexpr can't call arange directly
-    float = accel_math._float()
-    ar_npupX = np.arange(npupX, dtype=float)
-    ar_npupY = np.arange(npupY, dtype=float)
-    ar_npixX = np.arange(npixX, dtype=float)
-    ar_npixY = np.arange(npixY, dtype=float)
 
-    if centering == FFTSTYLE:
-        Xs = ne.evaluate("(ar_npupX - (npupX / 2)) * dX")
-        Ys = ne.evaluate("(ar_npupY - (npupY / 2)) * dY")
+def matrix_dft_numexpr(plane, nlamD, npix,
+               offset=None, inverse=False, centering=FFTSTYLE, per_plane=False):
+    """Perform a matrix discrete Fourier transform with selectable
+    output sampling and centering. This version accelerated with numexpr.
 
-        Us = ne.evaluate("(ar_npixX - npixX / 2) * dU")
-        Vs = ne.evaluate("(ar_npixY - npixY / 2) * dV")
+    Where parameters can be supplied as either scalars or 2-tuples, the first
+    element of the 2-tuple is used for the Y dimension and the second for the
+    X dimension. This ordering matches that of numpy.ndarray.shape attributes
+    and that of Python indexing.
 
-    elif centering == ADJUSTABLE:
-        if offset is None:
-            offsetY, offsetX = 0.0, 0.0
-        else:
-            try:
-                offsetY, offsetX = tuple(np.asarray(offset, dtype=float))
-            except ValueError:
-                raise ValueError(
-                    "'offset' must be supplied as a 2-tuple with "
-                    "(y_offset, x_offset) as floating point values"
-                )
-        Xs = ne.evaluate("(ar_npupX - (npupX) / 2.0 - offsetX + 0.5) * dX")
-        Ys = ne.evaluate("(ar_npupY - (npupY) / 2.0 - offsetY + 0.5) * dY")
+    To achieve exact correspondence to the FFT set nlamD and npix to the size
+    of the input array in pixels and use 'FFTSTYLE' centering. (n.b. When
+    using `numpy.fft.fft2` you must `numpy.fft.fftshift` the input pupil both
+    before and after applying fft2 or else it will introduce a checkerboard
+    pattern in the signs of alternating pixels!)
 
-        Us = ne.evaluate("(ar_npixX - (npixX) / 2.0 - offsetX + 0.5) * dU")
-        Vs = ne.evaluate("(ar_npixY - (npixY) / 2.0 - offsetY + 0.5) * dV")
+    Parameters
+    ----------
+    plane : 2D ndarray
+        2D array (either real or complex) representing the input image plane or
+        pupil plane to transform. A 3D array of shape (nplanes, ny, nx) may
+        also be given, in which case all planes in the stack are transformed
+        in a single batched matrix product.
+    nlamD : float or 2-tuple of floats (nlamDY, nlamDX)
+        Size of desired output region in lambda / D units, assuming that the
+        pupil fills the input array (corresponds to 'm' in
+        Soummer et al. 2007 4.2). This is in units of the spatial frequency that
+        is just Nyquist sampled by the input array.) If given as a tuple,
+        interpreted as (nlamDY, nlamDX). If per_plane is set, an array of
+        shape (nplanes,) or (nplanes, 2) giving a different nlamD for each
+        plane of a 3D stack, e.g. for several wavelengths at once.
+    npix : int or 2-tuple of ints (npixY, npixX)
+        Number of pixels per side side of destination plane array (corresponds
+        to 'N_B' in Soummer et al. 2007 4.2). This will be the # of pixels in
+        the image plane for a forward transformation, in the pupil plane for an
+        inverse. If given as a tuple, interpreted as (npixY, npixX).
+    inverse : bool, optional
+        Is this a forward or inverse transformation? (Default is False,
+        implying a forward transformation.)
+    centering : {'FFTSTYLE', 'SYMMETRIC', 'ADJUSTABLE'}, optional
+        What type of centering convention should be used for this FFT? 
 
-    elif centering == SYMMETRIC:
-        Xs = ne.evaluate("(ar_npupX - (npupX) / 2.0 + 0.5) * dX")
-        Ys = ne.evaluate("(ar_npupY - (npupY) / 2.0 + 0.5) * dY")
+        * ADJUSTABLE (the default) For an output array with ODD size n,
+          the PSF center will be at the center of pixel (n-1)/2. For an output
+          array with EVEN size n, the PSF center will be in the corner between
+          pixel (n/2-1, n/2-1) and (n/2, n/2)
+        * FFTSTYLE puts the zero-order term in a single pixel.
+        * SYMMETRIC spreads the zero-order term evenly between the center
+          four pixels
 
-        Us = ne.evaluate("(ar_npixX - (npixX) / 2.0 + 0.5) * dU")
-        Vs = ne.evaluate("(ar_npixY - (npixY) / 2.0 + 0.5) * dV")
-    else:
-        raise ValueError("Invalid centering style")
+    offset : 2-tuple of floats (offsetY, offsetX)
+        For ADJUSTABLE-style transforms, an offset in pixels by which the PSF
+        will be displaced from the central pixel (or cross). Given as
+        (offsetY, offsetX).
+    per_plane : bool, optional
+        Whether nlamD gives a separate value for each plane of a 3D stack.
+        Otherwise (the default) the same nlamD is used for all planes.
+    """
 
-    XU = np.outer(Xs, Us)
-    YV = np.outer(Ys, Vs)
+    expYV, expXU, norm_coeff = _dft_factors(plane, nlamD, npix, offset, inverse, centering,
+                                            _compute_dft_matrices_numexpr, per_plane)
 
-    pi = np.pi
-    if inverse:
-        expYV = ne.evaluate("exp(-2.0 * pi * -1j * YV)").T
-        expXU = ne.evaluate("exp(-2.0 * pi * -1j * XU)")
-        t1 = np.dot(expYV, plane)
-        t2 = np.dot(t1, expXU)
-    else:
-        expYV = ne.evaluate("exp(-2.0 * pi * 1j * YV)").T
-        expXU = ne.evaluate("exp(-2.0 * pi * 1j * XU)")
-        t1 = np.dot(expYV, plane)
-        t2 = np.dot(t1, expXU)
+    t1 = np.matmul(expYV, plane)
+    t2 = np.matmul(t1, expXU)
 
     if not conf.double_precision:
         # Work around numexpr bug where exp results must be complex128
         t2 = np.asarray(t2, dtype=np.complex64)
 
-    norm_coeff = np.sqrt((nlamDY * nlamDX) / (npupY * npupX * npixY * npixX))
     return norm_coeff * t2
 
 
@@ -430,9 +471,11 @@ class MatrixFourierTransform:
         _log.debug("MatrixFourierTransform initialized using centering "
                    "type = {0}".format(centering))
 
-    def _validate_args(self, nlamD, npix, offset):
+    def _validate_args(self, plane, nlamD, npix, offset, per_plane=False):
         if self.centering == SYMMETRIC:
-            if not np.isscalar(nlamD) or not np.isscalar(npix):
+            # a stack of planes may have a different (square) nlamD for each plane
+            square_nlamD = np.isscalar(nlamD) or (per_plane and np.ndim(nlamD) == 1)
+            if not square_nlamD or not np.isscalar(npix):
                 raise RuntimeError(
                     'The selected centering mode, {}, does not support '
                     'rectangular arrays.'.format(self.centering)
@@ -444,20 +487,21 @@ class MatrixFourierTransform:
                     'position offsets.'.format(self.centering)
                 )
 
-    def perform(self, pupil, nlamD, npix, offset=None):
+    def perform(self, pupil, nlamD, npix, offset=None, per_plane=False):
         """Forward matrix discrete Fourier Transform
 
         Parameters
         ----------
         pupil : 2D ndarray
             2D array (either real or complex) representing the input pupil plane
-            to transform.
+            to transform, or a 3D stack of such arrays to transform together.
         nlamD : float or 2-tuple of floats (nlamDY, nlamDX)
             Size of desired output region in lambda / D units, assuming that the
             pupil fills the input array (corresponds to 'm' in
             Soummer et al. 2007 4.2). This is in units of the spatial frequency
             that is just Nyquist sampled by the input array.) If given as a
-            tuple, interpreted as (nlamDY, nlamDX).
+            tuple, interpreted as (nlamDY, nlamDX). If per_plane is set, one
+            nlamD per array of a stack of arrays; see `matrix_dft`.
         npix : int or 2-tuple of ints (npixY, npixX)
             Number of pixels per side side of destination plane array
             (corresponds to 'N_B' in Soummer et al. 2007 4.2). This will be the
@@ -468,13 +512,15 @@ class MatrixFourierTransform:
             For ADJUSTABLE-style transforms, an offset in pixels by which the
             PSF will be displaced from the central pixel (or cross). Given as
             (offsetY, offsetX).
+        per_plane : bool, optional
+            Whether nlamD gives a separate value for each array of a stack.
 
         Returns
         -------
         complex ndarray
             The Fourier transform of the input
         """
-        self._validate_args(nlamD, npix, offset)
+        self._validate_args(pupil, nlamD, npix, offset, per_plane)
         _log.debug(
             "Forward MatrixFourierTransform: array shape {}, "
             "centering style {}, "
@@ -483,23 +529,24 @@ class MatrixFourierTransform:
             "offset {}".format(pupil.shape, self.centering, nlamD, npix, offset)
         )
         return matrix_dft(pupil, nlamD, npix,
-                          centering=self.centering, offset=offset)
+                          centering=self.centering, offset=offset, per_plane=per_plane)
 
 
-    def inverse(self, image, nlamD, npix, offset=None):
+    def inverse(self, image, nlamD, npix, offset=None, per_plane=False):
         """Inverse matrix discrete Fourier Transform
 
         Parameters
         ----------
         image : 2D ndarray
             2D array (either real or complex) representing the input image plane
-            to transform.
+            to transform, or a 3D stack of such arrays to transform together.
         nlamD : float or 2-tuple of floats (nlamDY, nlamDX)
             Size of desired output region in lambda / D units, assuming that the
             pupil fills the input array (corresponds to 'm' in
             Soummer et al. 2007 4.2). This is in units of the spatial frequency
             that is just Nyquist sampled by the input array.) If given as a
-            tuple, interpreted as (nlamDY, nlamDX).
+            tuple, interpreted as (nlamDY, nlamDX). If per_plane is set, one
+            nlamD per array of a stack of arrays; see `matrix_dft`.
         npix : int or 2-tuple of ints (npixY, npixX)
             Number of pixels per side side of destination plane array
             (corresponds to 'N_B' in Soummer et al. 2007 4.2). This will be the
@@ -510,13 +557,15 @@ class MatrixFourierTransform:
             For ADJUSTABLE-style transforms, an offset in pixels by which the
             PSF will be displaced from the central pixel (or cross). Given as
             (offsetY, offsetX).
+        per_plane : bool, optional
+            Whether nlamD gives a separate value for each array of a stack.
 
         Returns
         -------
         complex ndarray
             The Fourier transform of the input
         """
-        self._validate_args(nlamD, npix, offset)
+        self._validate_args(image, nlamD, npix, offset, per_plane)
         _log.debug(
             "Inverse MatrixFourierTransform: array shape {}, "
             "centering style {}, "
@@ -525,4 +574,4 @@ class MatrixFourierTransform:
             "offset {}".format(image.shape, self.centering, nlamD, npix, offset)
         )
         return matrix_idft(image, nlamD, npix,
-                           centering=self.centering, offset=offset)
+                           centering=self.centering, offset=offset, per_plane=per_plane)
@@ -6,6 +6,8 @@ import astropy.io.fits as fits
 import astropy.units as u
 import warnings
 import logging
+import enum
+import numbers
 
 from . import utils
 from . import conf
@@ -28,6 +30,71 @@ __all__ = ['AnalyticOpticalElement', 'ScalarTransmission', 'InverseTransmission'
            'ThinLens', 'GaussianAperture', 'KnifeEdge', 'CompoundAnalyticOptic', 'fixed_sampling_optic']
 
 
+# ------ Cache of phasors for static analytic optics -----
+
+# Phasors, and the transmission and OPD they are formed from, for reuse
+_PHASOR_CACHE = utils.ArrayCache('phasors', 'phasor_cache_size')
+
+# Attributes which do not affect an optic's phasor, or which hold the results of
+# computing it (if array valued) rather than defining the optic.
+_PHASOR_IGNORED_ATTRIBUTES = ('name', 'verbose', '_suppress_display', '_default_display_size',
+                              'wavefront_display_hint')
+_PHASOR_RESULT_ATTRIBUTES = ('transmission', 'opd', 'amplitude', 'phasor')
+
+
+def _hashable(value):
+    """ Return a hashable representation of an optic parameter value, for use in
+    phasor cache keys. Raises TypeError for values which cannot be represented.
+    """
+    if isinstance(value, u.Quantity):
+        return (_hashable(value.value), str(value.unit))
+    elif isinstance(value, np.ndarray):
+        if value.size > 10000:
+            raise TypeError("Array too large to use as a phasor cache key")
+        return (value.shape, value.dtype.str, value.tobytes())
+    elif isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    elif isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    elif isinstance(value, AnalyticOpticalElement):
+        key = value._phasor_parameters_key()
+        if key is None:
+            raise TypeError("Optic phasor cannot be cached")
+        return key
+    elif value is None or isinstance(value, (str, bytes, numbers.Number, np.generic, enum.Enum)):
+        return value
+    raise TypeError("Cannot make a phasor cache key from {}".format(type(value)))
+
+
+def _phasor_from_samples(samples, wavelength):
+    """ Form a complex phasor from the transmissive samples of an optic (see
+    AnalyticOpticalElement._transmissive_samples). Opaque pixels are left at zero
+    without evaluating the exponential. """
+    shape, indices, trans, opd = samples
+    phasor = np.zeros(shape, dtype=_complex())
+    if opd is None:
+        values = trans
+    elif accel_math._USE_NUMEXPR:
+        scalars = 1.j * 2. * np.pi / wavelength.to(u.meter).value
+        values = ne.evaluate("trans * exp(opd * scalars)")
+    else:
+        values = trans * np.exp(1.j * opd * (2. * np.pi / wavelength.to(u.meter).value))
+    phasor.reshape(-1)[indices] = values
+    return phasor
+
+
+def clear_phasor_cache():
+    """ Discard all cached analytic optic phasors and transmissive samples, to free their memory """
+    _PHASOR_CACHE.clear()
+
+
+def _hexagon_vertices(side):
+    """ X and Y coordinates of the vertices of a hexagon with the given side length,
+    centered at the origin with vertices on the X axis, as for HexagonAperture """
+    angles = np.arange(6) * np.pi / 3
+    return side * np.cos(angles), side * np.sin(angles)
+
+
 # ------ Generic Analytic elements -----
 
 class AnalyticOpticalElement(OpticalElement):
@@ -55,14 +122,36 @@ class AnalyticOpticalElement(OpticalElement):
             counterclockwise.  Note that if you apply both shift and rotation,
             the optic rotates around its own center, rather than the optical
             axis.
+        gray_pixel : bool
+            Return fractional transmission for edge pixels that are only partially
+            within this optic, computed exactly from the pixel area it covers?
+            Supported by apertures with circular or polygonal edges; optics which
+            set the class attribute `_gray_pixel_supported` to True.
+
+        Subclasses whose phasors depend only on their attributes and the wavefront
+        sampling may set the class attribute `_cache_phasor` to True, so that their
+        phasors are cached and reused for later wavefronts with the same sampling and
+        wavelength, up to a total of `poppy.conf.phasor_cache_size` megabytes.
+        Changing any attribute of the optic invalidates its cached phasors.
+        Cached phasors are read-only arrays. Each class must set `_cache_phasor`
+        itself; it is not inherited by subclasses, which may compute their phasors
+        differently.
 
     """
 
+    _cache_phasor = False
+    _gray_pixel_supported = False
+
     def __init__(self, shift_x=None, shift_y=None, rotation=None,
-            inclination_x=None, inclination_y=None,
+            inclination_x=None, inclination_y=None, gray_pixel=False,
             **kwargs):
         OpticalElement.__init__(self, **kwargs)
 
+        self._use_gray_pixel = bool(gray_pixel)
+        if self._use_gray_pixel and not self._gray_pixel_supported:
+            warnings.warn("{} does not support gray pixels; gray_pixel will be ignored.".format(
+                self.__class__.__name__))
+
         if shift_x is not None: self.shift_x = shift_x
         if shift_y is not None: self.shift_y = shift_y
         if rotation is not None: self.rotation = rotation
@@ -100,6 +189,37 @@ class AnalyticOpticalElement(OpticalElement):
         total intensity transmission. """
         return np.ones(wave.shape, dtype=_float())
 
+    def _phasor_parameters_key(self):
+        """ Return a hashable key for all the parameters defining this optic,
+        or None if its phasor should not be cached """
+        if not type(self).__dict__.get('_cache_phasor', False):
+            return None
+        try:
+            return (type(self),) + tuple(
+                (name, _hashable(value)) for name, value in sorted(self.__dict__.items())
+                if name not in _PHASOR_IGNORED_ATTRIBUTES and
+                not (name in _PHASOR_RESULT_ATTRIBUTES and isinstance(value, np.ndarray)))
+        except TypeError:
+            return None
+
+    def _phasor_cache_key(self, wave):
+        """ Return a hashable key for this optic on the given wavefront's sampling,
+        independent of wavelength, or None if its phasor should not be cached """
+        if not isinstance(wave, BaseWavefront) or conf.phasor_cache_size <= 0:
+            return None
+        parameters_key = self._phasor_parameters_key()
+        if parameters_key is None:
+            return None
+        try:
+            # everything which may affect the wavefront coordinates, for any type of wavefront
+            wave_key = (type(wave), wave.shape, wave.planetype,
+                        _hashable(wave.pixelscale), getattr(wave, '_last_transform_type', None),
+                        getattr(wave, '_image_centered', None), getattr(wave, 'angular_coordinates', None),
+                        _hashable(getattr(wave, 'focal_length', None)))
+        except TypeError:
+            return None
+        return parameters_key, wave_key, np.dtype(_float())
+
     # noinspection PyUnusedLocal
     def get_phasor(self, wave):
         """ Compute a complex phasor from an OPD, given a wavelength.
@@ -107,12 +227,46 @@ class AnalyticOpticalElement(OpticalElement):
         The returned value should be the complex phasor array as appropriate for
         multiplying by the wavefront amplitude.
 
+        For optics which support it, the phasor is cached for reuse; see
+        `AnalyticOpticalElement`. The transmission and OPD are then evaluated only
+        once per wavefront sampling and shared between wavelengths, so that just the
+        complex exponential over the transmissive pixels is computed per wavelength.
+
         Parameters
         ----------
         wave : float or obj
             either a scalar wavelength or a Wavefront object
 
         """
+        key = self._phasor_cache_key(wave)
+        if key is None:
+            return self._compute_phasor(wave)
+
+        def compute_phasor():
+            samples = _PHASOR_CACHE.get_or_compute(('samples', key), lambda: self._transmissive_samples(wave))
+            return _phasor_from_samples(samples, wave.wavelength)
+
+        phasor_key = ('phasor', key, _hashable(wave.wavelength), accel_math._USE_NUMEXPR)
+        return _PHASOR_CACHE.get_or_compute(phasor_key, compute_phasor)
+
+    def _transmissive_samples(self, wave):
+        """ Evaluate the transmission and OPD on a wavefront, keeping only their
+        values on the pixels which transmit any light.
+
+        Returns a tuple of the array shape, the flat indices of the transmissive
+        pixels, and the transmission and OPD at those pixels. The OPD is None if
+        it is zero everywhere.
+        """
+        trans = np.broadcast_to(self.get_transmission(wave), wave.shape).ravel()
+        opd = np.broadcast_to(self.get_opd(wave), wave.shape).ravel()
+        indices = np.flatnonzero(trans)
+        opd_values = opd[indices]
+        if not opd_values.any():
+            opd_values = None
+        return wave.shape, indices, trans[indices], opd_values
+
+    def _compute_phasor(self, wave):
+        """ Compute a complex phasor from an OPD, given a wavelength, without caching """
         if isinstance(wave, BaseWavefront):
             wavelength = wave.wavelength
         else:
@@ -308,10 +462,17 @@ class AnalyticOpticalElement(OpticalElement):
         """
 
         y, x = wave.coordinates()
+        return self._transform_coordinates(y, x)
+
+    def _transform_coordinates(self, y, x):
+        """ Apply this optic's shifts, rotation and inclination to wavefront coordinates;
+        see get_coordinates """
+        # the wavefront's coordinate arrays are cached and read-only, so all
+        # transformations create new arrays
         if hasattr(self, "shift_x"):
-            x -= float(self.shift_x)
+            x = x - float(self.shift_x)
         if hasattr(self, "shift_y"):
-            y -= float(self.shift_y)
+            y = y - float(self.shift_y)
         if hasattr(self, "rotation"):
             angle = np.deg2rad(self.rotation)
             xp = np.cos(angle) * x + np.sin(angle) * y
@@ -320,12 +481,131 @@ class AnalyticOpticalElement(OpticalElement):
             y = yp
         # inclination around X axis rescales Y, and vice versa:
         if hasattr(self, "inclination_x"):
-            y /= np.cos(np.deg2rad(self.inclination_x))
+            y = y / np.cos(np.deg2rad(self.inclination_x))
         if hasattr(self, "inclination_y"):
-            x /= np.cos(np.deg2rad(self.inclination_y))
+            x = x / np.cos(np.deg2rad(self.inclination_y))
 
         return y, x
 
+    def _get_coordinates_window(self, wave, radius):
+        """Get coordinates of this optic as for get_coordinates, but only over
+        the rectangular window of the wavefront array which contains all pixels
+        within the given radius of the optic's (shifted) origin.
+
+        Optics whose shape lies within that radius can then evaluate it at a cost
+        proportional to their own area rather than to the whole wavefront. If the
+        wavefront coordinates are not a regular grid, the window is the whole array.
+
+        Returns
+        -------
+        window : tuple of slices
+            The window, for indexing arrays with the wavefront's shape
+        y, x : ndarrays
+            Coordinates of this optic over the window
+        """
+        y, x = wave.coordinates()
+        window = self._coordinates_window(y, x, radius)
+        y, x = self._transform_coordinates(y[window], x[window])
+        return window, y, x
+
+    def _coordinates_window(self, y, x, radius):
+        """ Window of the wavefront coordinate arrays y, x which contains all pixels
+        within the given radius of this optic's origin; see _get_coordinates_window """
+        window = (slice(None),) * y.ndim
+        if y.ndim == 2 and y.shape[0] > 1 and y.shape[1] > 1:
+            yaxis, xaxis = y[:, 0], x[0, :]
+            # rotation preserves distances and inclination only stretches them,
+            # so the window need only cover the radius around the shifted origin
+            cy = float(getattr(self, "shift_y", 0))
+            cx = float(getattr(self, "shift_x", 0))
+            if (np.all(np.diff(yaxis) > 0) and np.all(np.diff(xaxis) > 0) and
+                    np.all(y[0, :] == yaxis[0]) and np.all(x[:, 0] == xaxis[0])):
+                # include a margin of one pixel, for any round off at the window edges
+                window = tuple(slice(max(np.searchsorted(axis, center - radius, side='left') - 1, 0),
+                                     np.searchsorted(axis, center + radius, side='right') + 1)
+                               for axis, center in ((yaxis, cy), (xaxis, cx)))
+        return window
+
+    def _inverse_transform_coordinates(self, y, x):
+        """ Map coordinates of this optic back to wavefront coordinates; the
+        inverse of _transform_coordinates """
+        if hasattr(self, "inclination_x"):
+            y = y * np.cos(np.deg2rad(self.inclination_x))
+        if hasattr(self, "inclination_y"):
+            x = x * np.cos(np.deg2rad(self.inclination_y))
+        if hasattr(self, "rotation"):
+            angle = np.deg2rad(self.rotation)
+            xp = np.cos(angle) * x - np.sin(angle) * y
+            yp = np.sin(angle) * x + np.cos(angle) * y
+            x = xp
+            y = yp
+        if hasattr(self, "shift_x"):
+            x = x + float(self.shift_x)
+        if hasattr(self, "shift_y"):
+            y = y + float(self.shift_y)
+        return y, x
+
+    def _gray_pixel_polygons(self, wave, vertices_x, vertices_y, radius):
+        """ Fraction of the area of each wavefront pixel within one or more
+        polygons, given by their vertices in this optic's coordinates, which lie
+        within the given radius of its origin. See geometry.filled_polygon_aa.
+        """
+        y, x = wave.coordinates()
+        window = self._coordinates_window(y, x, radius)
+        if np.ndim(vertices_x[0]) == 0:
+            vertices_x, vertices_y = [vertices_x], [vertices_y]
+        wave_vertices = [self._inverse_transform_coordinates(np.asarray(vy, dtype=float),
+                                                             np.asarray(vx, dtype=float))
+                         for vx, vy in zip(vertices_x, vertices_y)]
+
+        coverage = np.zeros(wave.shape, dtype=_float())
+        coverage[window] = geometry.filled_polygon_aa(y[window].shape,
+                                                      [vx for vy, vx in wave_vertices],
+                                                      [vy for vy, vx in wave_vertices],
+                                                      xarray=x[window], yarray=y[window])
+        return coverage
+
+    def _gray_pixel_circle(self, wave, radius):
+        """ Fraction of the area of each wavefront pixel within a circle of the
+        given radius around this optic's origin. """
+        y, x = wave.coordinates()
+        window = self._coordinates_window(y, x, radius)
+        pixscale_x, pixscale_y = x[0, 1] - x[0, 0], y[1, 0] - y[0, 0]
+        inclined = getattr(self, 'inclination_x', 0) != 0 or getattr(self, 'inclination_y', 0) != 0
+
+        if inclined or not np.isclose(pixscale_x, pixscale_y):
+            # The circle is an ellipse in pixel coordinates, so draw it as a polygon
+            # with sides within 1/1000 of a pixel of the curve, and the same area.
+            radius_pix = radius / min(pixscale_x, pixscale_y)
+            nsides = max(int(np.ceil(np.pi / np.arccos(max(1 - 1e-3 / radius_pix, -1)))), 8)
+            angles = np.linspace(0, 2 * np.pi, nsides, endpoint=False)
+            vertex_radius = radius * np.sqrt(2 * np.pi / (nsides * np.sin(2 * np.pi / nsides)))
+            return self._gray_pixel_polygons(wave, vertex_radius * np.cos(angles),
+                                             vertex_radius * np.sin(angles), vertex_radius)
+
+        # The exact circle-pixel overlap works in units of pixels
+        coverage = np.zeros(wave.shape, dtype=_float())
+        coverage[window] = geometry.filled_circle_aa(y[window].shape,
+                                                     float(getattr(self, "shift_x", 0)) / pixscale_x,
+                                                     float(getattr(self, "shift_y", 0)) / pixscale_x,
+                                                     radius / pixscale_x,
+                                                     xarray=x[window] / pixscale_x,
+                                                     yarray=y[window] / pixscale_x)
+        return coverage
+
+    def get_polar_coordinates(self, wave):
+        """Get polar coordinates R, Theta of this optic, including any shifts,
+        rotation, or inclination as for `get_coordinates`.
+
+        If there are none of those, the wavefront's cached, read-only polar
+        coordinate arrays are returned rather than computing new ones.
+        """
+        if not any(hasattr(self, attr) for attr in ("shift_x", "shift_y", "rotation",
+                                                   "inclination_x", "inclination_y")):
+            return wave.polar_coordinates()
+        y, x = self.get_coordinates(wave)
+        return _r(x, y), np.arctan2(y, x)
+
 
 class ScalarTransmission(AnalyticOpticalElement):
     """ Uniform transmission between 0 and 1.0 in intensity.
@@ -333,6 +613,8 @@ class ScalarTransmission(AnalyticOpticalElement):
     Either a null optic (empty plane) or some perfect ND filter...
     But most commonly this is just used as a null optic placeholder """
 
+    _cache_phasor = True
+
     def __init__(self, name=None, transmission=1.0, **kwargs):
         if name is None:
             name = ("-empty-" if transmission == 1.0 else
@@ -354,6 +636,8 @@ class InverseTransmission(AnalyticOpticalElement):
     This is a useful ingredient in the SemiAnalyticCoronagraph algorithm.
     """
 
+    _cache_phasor = True
+
     def __init__(self, optic=None):
         super(InverseTransmission, self).__init__()
         if optic is None or not hasattr(optic, 'get_transmission'):
@@ -416,6 +700,9 @@ class BandLimitedCoronagraph(AnalyticImagePlaneElement):
             Wavelength this BLC is optimized for, only for the linear ones.
 
     """
+
+    _cache_phasor = True
+
     allowable_kinds = ['circular', 'linear']
     """ Allowable types of BLC supported by this class"""
 
@@ -590,6 +877,8 @@ class IdealFQPM(AnalyticImagePlaneElement):
 
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(wavelength=u.meter)
     def __init__(self, name="unnamed FQPM ", wavelength=10.65e-6 * u.meter, **kwargs):
         AnalyticImagePlaneElement.__init__(self, **kwargs)
@@ -631,6 +920,8 @@ class CircularPhaseMask(AnalyticImagePlaneElement):
 
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(radius=u.arcsec, wavelength=u.meter)
     def __init__(self, name=None, radius=1*u.arcsec, wavelength=1e-6 * u.meter, retardance=0.5,
             **kwargs):
@@ -681,6 +972,8 @@ class RectangularFieldStop(AnalyticImagePlaneElement):
         Size of the field stop, in arcseconds. Default 0.5 width, height 5.
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(width=u.arcsec, height=u.arcsec)
     def __init__(self, name="unnamed field stop", width=0.5*u.arcsec, height=5.0*u.arcsec, **kwargs):
         AnalyticImagePlaneElement.__init__(self, **kwargs)
@@ -722,6 +1015,8 @@ class SquareFieldStop(RectangularFieldStop):
         Size of the field stop, in arcseconds. Default 20.
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(size=u.arcsec)
     def __init__(self, name="unnamed field stop", size=20.*u.arcsec, **kwargs):
         RectangularFieldStop.__init__(self, width=size, height=size, **kwargs)
@@ -753,6 +1048,8 @@ class HexagonFieldStop(AnalyticImagePlaneElement):
 
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(side=u.arcsec, diameter=u.arcsec, flattoflat=u.arcsec)
     def __init__(self, name=None, side=None, diameter=None, flattoflat=None, **kwargs):
         if flattoflat is None and side is None and diameter is None:
@@ -825,6 +1122,8 @@ class AnnularFieldStop(AnalyticImagePlaneElement):
         Radius of the circular field stop outer edge. Default is 10. Set to 0.0 for no outer edge.
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(radius_inner=u.arcsec, radius_outer=u.arcsec)
     def __init__(self, name="unnamed annular field stop", radius_inner=0.0, radius_outer=1.0, **kwargs):
         AnalyticImagePlaneElement.__init__(self, **kwargs)
@@ -873,6 +1172,8 @@ class CircularOcculter(AnnularFieldStop):
 
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(radius=u.arcsec)
     def __init__(self, name="unnamed occulter", radius=1.0, **kwargs):
         super(CircularOcculter, self).__init__(name=name, radius_inner=radius, radius_outer=0.0, **kwargs)
@@ -893,6 +1194,8 @@ class BarOcculter(AnalyticImagePlaneElement):
 
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(width=u.arcsec, height=u.arcsec)
     def __init__(self, name="bar occulter", width=1.0*u.arcsec, height=10.0*u.arcsec, **kwargs):
         AnalyticImagePlaneElement.__init__(self, **kwargs)
@@ -991,6 +1294,8 @@ class ParityTestAperture(AnalyticOpticalElement):
 
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(radius=u.meter)
     def __init__(self, name=None, radius=1.0 * u.meter, pad_factor=1.0, **kwargs):
         if name is None: name = "Asymmetric Parity Test Aperture, radius={}".format(radius)
@@ -1052,20 +1357,22 @@ class CircularAperture(AnalyticOpticalElement):
 
     """
 
+    _cache_phasor = True
+    _gray_pixel_supported = True
+
     @utils.quantity_input(radius=u.meter)
     def __init__(self, name=None, radius=1.0 * u.meter, pad_factor=1.0, planetype=PlaneType.unspecified,
             gray_pixel=True, **kwargs):
 
         if name is None:
             name = "Circle, radius={}".format(radius)
-        super(CircularAperture, self).__init__(name=name, planetype=planetype, **kwargs)
+        super(CircularAperture, self).__init__(name=name, planetype=planetype, gray_pixel=gray_pixel, **kwargs)
         if radius <= 0*u.meter:
             raise ValueError("radius must be a positive nonzero number.")
         self.radius = radius
         # for creating input wavefronts - let's pad a bit:
         self.pupil_diam = pad_factor * 2 * self.radius
         self._default_display_size = 3 * self.radius
-        self._use_gray_pixel = bool(gray_pixel)
 
     def get_transmission(self, wave):
         """ Compute the transmission inside/outside of the aperture.
@@ -1075,15 +1382,11 @@ class CircularAperture(AnalyticOpticalElement):
                              "to define the spacing")
         assert (wave.planetype != PlaneType.image)
 
-        y, x = self.get_coordinates(wave)
         radius = self.radius.to(u.meter).value
         if self._use_gray_pixel:
-            pixscale = wave.pixelscale.to(u.meter/u.pixel).value
-            self.transmission = geometry.filled_circle_aa(wave.shape, 0, 0, radius/pixscale, x/pixscale, y/pixscale)
+            self.transmission = self._gray_pixel_circle(wave, radius)
         else:
-            r = _r(x, y)
-            del x
-            del y
+            r, _ = self.get_polar_coordinates(wave)
 
             w_outside = np.where(r > radius)
             del r
@@ -1111,6 +1414,9 @@ class HexagonAperture(AnalyticOpticalElement):
 
     """
 
+    _cache_phasor = True
+    _gray_pixel_supported = True
+
     @utils.quantity_input(side=u.meter, diameter=u.meter, flattoflat=u.meter)
     def __init__(self, name=None, side=None, diameter=None, flattoflat=None, **kwargs):
         if flattoflat is None and side is None and diameter is None:
@@ -1145,11 +1451,16 @@ class HexagonAperture(AnalyticOpticalElement):
                              "to define the spacing")
         assert (wave.planetype != PlaneType.image)
 
-        y, x = self.get_coordinates(wave)
         side = self.side.to(u.meter).value
+        if self._use_gray_pixel:
+            self.transmission = self._gray_pixel_polygons(wave, *_hexagon_vertices(side), side)
+            return self.transmission
+
+        window, y, x = self._get_coordinates_window(wave, side)
         absy = np.abs(y)
 
         self.transmission = np.zeros(wave.shape, dtype=_float())
+        transmission = self.transmission[window]
 
         w_rect = np.where(
             (np.abs(x) <= 0.5 * side) &
@@ -1165,9 +1476,9 @@ class HexagonAperture(AnalyticOpticalElement):
             (x <= 1 * side) &
             (absy <= (1 * side - x) * np.sqrt(3))
         )
-        self.transmission[w_rect] = 1
-        self.transmission[w_left_tri] = 1
-        self.transmission[w_right_tri] = 1
+        transmission[w_rect] = 1
+        transmission[w_left_tri] = 1
+        transmission[w_right_tri] = 1
 
         return self.transmission
 
@@ -1198,9 +1509,11 @@ class MultiHexagonAperture(AnalyticOpticalElement):
         For example, segmentlist=[1,3,5] would make an aperture of 3 segments.
 
 
-    Note that this routine becomes a bit slow for nrings >4. For repeated computations on
-    the same aperture, avoid repeated evaluations of this function. It will be faster to create
-    this aperture, evalute it once, and save the result onto a discrete array, via either
+    The aperture is rasterized in a single pass over the array, by assigning each pixel
+    to its nearest segment on the hexagonal lattice, so the cost does not grow with the
+    number of rings. For repeated computations on the same aperture, it may still be
+    faster to create this aperture, evalute it once, and save the result onto a discrete
+    array, via either
        (1) saving it to a FITS file using the to_fits() method, and then use that in a
        FITSOpticalElement, or
        (2) Use the fixed_sampling_optic function to create an ArrayOpticalElement with
@@ -1208,6 +1521,9 @@ class MultiHexagonAperture(AnalyticOpticalElement):
 
     """
 
+    _cache_phasor = True
+    _gray_pixel_supported = True
+
     @utils.quantity_input(side=u.meter, flattoflat=u.meter, gap=u.meter)
     def __init__(self, name="MultiHex", flattoflat=1.0, side=None, gap=0.01, rings=1,
                  segmentlist=None, center=False, **kwargs):
@@ -1319,12 +1635,86 @@ class MultiHexagonAperture(AnalyticOpticalElement):
             raise ValueError("get_transmission must be called with a Wavefront to define the spacing")
         assert (wave.planetype != PlaneType.image)
 
-        self.transmission = np.zeros(wave.shape, dtype=_float())
+        if self._use_gray_pixel:
+            side = self.side.to(u.meter).value
+            hex_x, hex_y = _hexagon_vertices(side)
+            centers = np.asarray([self._hex_center(i) for i in self.segmentlist], dtype=float).reshape(-1, 2)
+            radius = np.hypot(centers[:, 0], centers[:, 1]).max(initial=0) + side
+            self.transmission = self._gray_pixel_polygons(wave, [hex_x + cenx for ceny, cenx in centers],
+                                                          [hex_y + ceny for ceny, cenx in centers], radius)
+            return self.transmission
+
+        self.transmission = np.asarray(self._segment_ids(wave) != 0, dtype=_float())
+        return self.transmission
 
-        for i in self.segmentlist:
-            self._one_hexagon(wave, i)
+    def _segment_lattice_indices(self):
+        """ Integer coordinates of each segment center on the hexagonal lattice
 
-        return self.transmission
+        The lattice basis vectors are one segment pitch (flat-to-flat plus gap) along
+        +Y, and one pitch at 60 degrees clockwise from that. Returns a (nseg, 2) array,
+        or None if any of the segment centers does not lie on that lattice.
+        """
+        pitch = (self.flattoflat + self.gap).to(u.meter).value
+        centers = np.asarray([self._hex_center(i) for i in self.segmentlist], dtype=float).reshape(-1, 2)
+        b = centers[:, 1] / (pitch * np.sqrt(3) / 2)
+        a = centers[:, 0] / pitch - b / 2
+        indices = np.round(np.stack([a, b], axis=-1))
+        if not np.allclose(indices, np.stack([a, b], axis=-1), rtol=0, atol=1e-6):
+            return None
+        return indices.astype(int)
+
+    def _segment_ids(self, wave):
+        """ Array of which segment covers each pixel of the wavefront, as the
+        segment index plus one, or 0 for pixels outside of all segments.
+
+        Each pixel is assigned to its nearest segment center on the hexagonal
+        lattice analytically, and then tested against that segment's edges, so
+        the cost does not depend on the number of segments.
+        """
+        lattice = self._segment_lattice_indices()
+        if lattice is None:
+            # segment centers are not on a regular lattice; draw each one in turn
+            transmission = self.transmission
+            self.transmission = np.zeros(wave.shape, dtype=_float())
+            for i in self.segmentlist:
+                self._one_hexagon(wave, i, value=i + 1)
+            segment_ids = self.transmission.astype(int)
+            self.transmission = transmission
+            return segment_ids
+
+        y, x = self.get_coordinates(wave)
+        side = self.side.to(u.meter).value
+        pitch = (self.flattoflat + self.gap).to(u.meter).value
+
+        # fractional lattice coordinates, rounded to the nearest lattice point
+        # by rounding the equivalent cube coordinates (a, b, -a-b)
+        b = x / (pitch * np.sqrt(3) / 2)
+        a = y / pitch - b / 2
+        c = -a - b
+        ra, rb, rc = np.round(a), np.round(b), np.round(c)
+        da, db, dc = np.abs(ra - a), np.abs(rb - b), np.abs(rc - c)
+        fix_a = (da > db) & (da > dc)
+        fix_b = ~fix_a & (db > dc)
+        ra[fix_a] = -rb[fix_a] - rc[fix_a]
+        rb[fix_b] = -ra[fix_b] - rc[fix_b]
+        del c, rc, da, db, dc, fix_a, fix_b
+
+        # offsets from the nearest segment center, and whether inside its hexagon
+        dy = np.abs(y - pitch * (ra + rb / 2))
+        dx = np.abs(x - pitch * np.sqrt(3) / 2 * rb)
+        inside = (dy <= np.sqrt(3) / 2 * side) & (dy <= (side - dx) * np.sqrt(3))
+        del dx, dy
+
+        # look up which segment, if any, is at each lattice point
+        offset = np.abs(lattice).max()
+        lookup = np.zeros((2 * offset + 1, 2 * offset + 1), dtype=int)
+        lookup[lattice[:, 0] + offset, lattice[:, 1] + offset] = np.asarray(self.segmentlist) + 1
+        ia = ra.astype(int) + offset
+        ib = rb.astype(int) + offset
+        inside &= (ia >= 0) & (ia < lookup.shape[0]) & (ib >= 0) & (ib < lookup.shape[1])
+        segment_ids = np.zeros(wave.shape, dtype=int)
+        segment_ids[inside] = lookup[ia[inside], ib[inside]]
+        return segment_ids
 
     def _one_hexagon(self, wave, index, value=1):
         """ Draw one hexagon into the self.transmission array """
@@ -1334,8 +1724,8 @@ class MultiHexagonAperture(AnalyticOpticalElement):
 
         ceny, cenx = self._hex_center(index)
 
-        y -= ceny
-        x -= cenx
+        y = y - ceny
+        x = x - cenx
         absy = np.abs(y)
 
         w_rect = np.where(
@@ -1373,6 +1763,9 @@ class NgonAperture(AnalyticOpticalElement):
         Rotation angle to first vertex, in degrees counterclockwise from the +X axis. Default is 0.
     """
 
+    _cache_phasor = True
+    _gray_pixel_supported = True
+
     @utils.quantity_input(radius=u.meter)
     def __init__(self, name=None, nsides=6, radius=1 * u.meter, rotation=0., **kwargs):
         self.radius = radius
@@ -1388,20 +1781,26 @@ class NgonAperture(AnalyticOpticalElement):
         if not isinstance(wave, BaseWavefront):  # pragma: no cover
             raise ValueError("get_transmission must be called with a Wavefront to define the spacing")
         assert (wave.planetype != PlaneType.image)
-        y, x = self.get_coordinates(wave)
+        radius = self.radius.to(u.meter).value
+        window, y, x = self._get_coordinates_window(wave, radius)
 
         phase = self.rotation * np.pi / 180
         vertices = np.zeros((self.nsides, 2), dtype=_float())
         for i in range(self.nsides):
             vertices[i] = [np.cos(i * 2 * np.pi / self.nsides + phase),
                            np.sin(i * 2 * np.pi / self.nsides + phase)]
-        vertices *= self.radius.to(u.meter).value
+        vertices *= radius
+
+        if self._use_gray_pixel:
+            self.transmission = self._gray_pixel_polygons(wave, vertices[:, 0], vertices[:, 1], radius)
+            return self.transmission
 
         self.transmission = np.zeros(wave.shape, dtype=_float())
-        for row in range(wave.shape[0]):
+        transmission = self.transmission[window]
+        for row in range(y.shape[0]):
             pts = np.asarray(list(zip(x[row], y[row])))
             ok = matplotlib.path.Path(vertices).contains_points(pts)
-            self.transmission[row][ok] = 1.0
+            transmission[row][ok] = 1.0
 
         return self.transmission
 
@@ -1422,6 +1821,9 @@ class RectangleAperture(AnalyticOpticalElement):
 
     """
 
+    _cache_phasor = True
+    _gray_pixel_supported = True
+
     @utils.quantity_input(width=u.meter, height=u.meter)
     def __init__(self, name=None, width=0.5 * u.meter, height=1.0 * u.meter, rotation=0.0, **kwargs):
         self.width = width
@@ -1439,17 +1841,27 @@ class RectangleAperture(AnalyticOpticalElement):
             raise ValueError("get_transmission must be called with a Wavefront to define the spacing")
         assert (wave.planetype != PlaneType.image)
 
-        y, x = self.get_coordinates(wave)
+        height = self.height.to(u.meter).value
+        width = self.width.to(u.meter).value
+        if self._use_gray_pixel:
+            self.transmission = self._gray_pixel_polygons(wave, np.asarray([-1, 1, 1, -1]) * width / 2,
+                                                          np.asarray([-1, -1, 1, 1]) * height / 2,
+                                                          np.hypot(height, width) / 2)
+            return self.transmission
+
+        window, y, x = self._get_coordinates_window(wave, np.hypot(height, width) / 2)
 
         w_outside = np.where(
-            (abs(y) > (self.height.to(u.meter).value / 2)) |
-            (abs(x) > (self.width.to(u.meter).value / 2))
+            (abs(y) > (height / 2)) |
+            (abs(x) > (width / 2))
         )
         del y
         del x
 
-        self.transmission = np.ones(wave.shape, dtype=_float())
-        self.transmission[w_outside] = 0
+        self.transmission = np.zeros(wave.shape, dtype=_float())
+        transmission = self.transmission[window]
+        transmission[:] = 1
+        transmission[w_outside] = 0
         return self.transmission
 
 
@@ -1467,6 +1879,8 @@ class SquareAperture(RectangleAperture):
 
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(size=u.meter)
     def __init__(self, name=None, size=1.0 * u.meter, **kwargs):
         self._size = size
@@ -1509,6 +1923,9 @@ class SecondaryObscuration(AnalyticOpticalElement):
 
     """
 
+    _cache_phasor = True
+    _gray_pixel_supported = True
+
     @utils.quantity_input(secondary_radius=u.meter, support_width=u.meter)
     def __init__(self, name=None, secondary_radius=0.5 * u.meter, n_supports=4, support_width=0.01 * u.meter,
                  support_angle_offset=0.0, **kwargs):
@@ -1530,13 +1947,20 @@ class SecondaryObscuration(AnalyticOpticalElement):
             raise ValueError("get_transmission must be called with a Wavefront to define the spacing")
         assert (wave.planetype != PlaneType.image)
 
+        if self._use_gray_pixel:
+            self.transmission = 1 - self._gray_pixel_obscuration(wave)
+            return self.transmission
+
         self.transmission = np.ones(wave.shape, dtype=_float())
 
-        y, x = self.get_coordinates(wave)
+        # the central obscuration need only be evaluated near the center, but the
+        # support spiders extend across the whole array
+        secondary_radius = self.secondary_radius.to(u.meter).value
+        window, y, x = self._get_coordinates_window(wave, secondary_radius)
         r = np.sqrt(x ** 2 + y ** 2)  # * wave.pixelscale
+        self.transmission[window][r < secondary_radius] = 0
 
-        self.transmission[r < self.secondary_radius.to(u.meter).value] = 0
-
+        y, x = self.get_coordinates(wave)
         for i in range(self.n_supports):
             angle = 2 * np.pi / self.n_supports * i + np.deg2rad(self.support_angle_offset)
 
@@ -1551,6 +1975,41 @@ class SecondaryObscuration(AnalyticOpticalElement):
 
         return self.transmission
 
+    def _gray_pixel_obscuration(self, wave):
+        """ Fraction of each pixel obscured by the secondary and its supports """
+        secondary_radius = self.secondary_radius.to(u.meter).value
+        half_width = self.support_width.to(u.meter).value / 2
+
+        # make the supports reach beyond the farthest corner of the array
+        y, x = wave.coordinates()
+        corners_y, corners_x = self._transform_coordinates(y[[0, 0, -1, -1], [0, -1, 0, -1]],
+                                                           x[[0, 0, -1, -1], [0, -1, 0, -1]])
+        length = np.hypot(corners_x, corners_y).max() + 2 * np.abs(x[0, 1] - x[0, 0])
+
+        # Each support is a bar from the edge of the secondary outwards, so the shapes do
+        # not overlap; the inner end follows the arc of the secondary's edge.
+        if half_width < secondary_radius:
+            arc_angle = np.arcsin(half_width / secondary_radius)
+            arc = np.linspace(arc_angle, -arc_angle, 17)
+            bar_x = np.concatenate([[length, length], secondary_radius * np.cos(arc)])
+            bar_y = np.concatenate([[-half_width, half_width], secondary_radius * np.sin(arc)])
+        else:
+            # supports wider than the secondary overlap it; clipping the sum to 1 approximates that
+            bar_x = np.asarray([0, length, length, 0])
+            bar_y = np.asarray([-half_width, -half_width, half_width, half_width])
+
+        supports_x, supports_y = [], []
+        for i in range(self.n_supports):
+            angle = 2 * np.pi / self.n_supports * i + np.deg2rad(self.support_angle_offset)
+            supports_x.append(np.cos(angle) * bar_x - np.sin(angle) * bar_y)
+            supports_y.append(np.sin(angle) * bar_x + np.cos(angle) * bar_y)
+
+        obscuration = self._gray_pixel_circle(wave, secondary_radius)
+        if self.n_supports > 0 and half_width > 0:
+            obscuration += self._gray_pixel_polygons(wave, supports_x, supports_y, length)
+        return np.clip(obscuration, 0, 1)
+
+
 
 class AsymmetricSecondaryObscuration(SecondaryObscuration):
     """ Defines a central obscuration with one or more supports which can be oriented at
@@ -1578,6 +2037,10 @@ class AsymmetricSecondaryObscuration(SecondaryObscuration):
         if scalar, applies to all supports; if a list, gives a separate offset for each.
     """
 
+    _cache_phasor = True
+    # the offset supports may overlap, so gray pixels are not computed for them
+    _gray_pixel_supported = False
+
     @utils.quantity_input(support_width=u.meter)
     def __init__(self, support_angle=(0, 90, 240), support_width=0.01 * u.meter,
                  support_offset_x=0.0, support_offset_y=0.0, **kwargs):
@@ -1654,6 +2117,8 @@ class ThinLens(CircularAperture):
         such that rho = 1 at r = `radius`.
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(reference_wavelength=u.meter)
     def __init__(self, name='Thin lens', nwaves=4.0, reference_wavelength=1e-6 * u.meter,
                  radius=1.0*u.meter, **kwargs):
@@ -1664,8 +2129,7 @@ class ThinLens(CircularAperture):
         self.wavefront_display_hint = 'phase'  # preferred display for wavefronts at this plane
 
     def get_opd(self, wave):
-        y, x = self.get_coordinates(wave)
-        r = np.sqrt(x ** 2 + y ** 2)
+        r, _ = self.get_polar_coordinates(wave)
         r_norm = r / self.radius.to(u.meter).value
 
 
@@ -1714,6 +2178,8 @@ class GaussianAperture(AnalyticOpticalElement):
 
     """
 
+    _cache_phasor = True
+
     @utils.quantity_input(fwhm=u.meter, w=u.meter, pupil_diam=u.meter)
     def __init__(self, name=None, fwhm=None, w=None, pupil_diam=None, **kwargs):
         if fwhm is None and w is None:
@@ -1739,9 +2205,7 @@ class GaussianAperture(AnalyticOpticalElement):
         """
         if not isinstance(wave, BaseWavefront):  # pragma: no cover
             raise ValueError("get_transmission must be called with a Wavefront to define the spacing")
-        y, x = self.get_coordinates(wave)
-
-        r = np.sqrt(x ** 2 + y ** 2)
+        r, _ = self.get_polar_coordinates(wave)
 
         transmission = np.exp((- (r / self.w.to(u.meter).value) ** 2))
 
@@ -1761,6 +2225,9 @@ class KnifeEdge(AnalyticOpticalElement):
     with the opaque side to the right.
 
     """
+
+    _cache_phasor = True
+
     def __init__(self, name=None, rotation=0, **kwargs):
         if name is None:
             name = "Knife edge at {} deg".format(rotation)
@@ -1799,6 +2266,8 @@ class CompoundAnalyticOptic(AnalyticOpticalElement):
 
     """
 
+    _cache_phasor = True
+
     def _validate_only_analytic_optics(self, optics_list):
         for optic in optics_list:
             if isinstance(optic, AnalyticOpticalElement):
@@ -1899,6 +2368,8 @@ def fixed_sampling_optic(optic, wavefront, oversample=2):
     results to the desired scale, using the so-called gray-pixel approximation. (i.e. the
     value for each output pixel is computed as the average of N*N finer pixels in an
     intermediate array.)
+    Circular and polygonal apertures can instead compute exact gray pixel values directly,
+    without any oversampling, if created with the `gray_pixel=True` option.
 
     Parameters
     ----------
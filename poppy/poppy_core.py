@@ -1,6 +1,13 @@
 import multiprocessing
+import multiprocessing.connection
 import copy
 import time
+import atexit
+import hashlib
+import pickle
+import threading
+import traceback
+import concurrent.futures
 import enum
 import warnings
 import textwrap
@@ -9,6 +16,10 @@ from abc import ABC, abstractmethod
 import numpy as np
 import matplotlib.pyplot as plt
 import scipy.ndimage.interpolation
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # requires Python >= 3.8
+    shared_memory = None
 import matplotlib
 
 import astropy.io.fits as fits
@@ -28,7 +39,8 @@ import logging
 _log = logging.getLogger('poppy')
 
 __all__ = ['Wavefront', 'OpticalSystem', 'CompoundOpticalSystem',
-           'OpticalElement', 'ArrayOpticalElement', 'FITSOpticalElement', 'Rotation', 'Detector']
+           'OpticalElement', 'ArrayOpticalElement', 'FITSOpticalElement', 'Rotation', 'Detector',
+           'shutdown_worker_pool']
 
 
 # internal constants for types of plane
@@ -50,6 +62,11 @@ _INTERMED = PlaneType.intermediate  # for Fresnel propagation
 
 _RADIANStoARCSEC = 180. * 60 * 60 / np.pi
 
+# Many optics store intermediate results as attributes while computing their phasors,
+# so evaluation of phasors is serialized when propagating multiple wavelengths in threads.
+# (The FFTs and MFTs, which dominate the run time, may still execute concurrently.)
+_phasor_lock = threading.RLock()
+
 
 def _wrap_propagate_for_multiprocessing(args):
     """ This is an internal helper routine for parallelizing computations across multiple processors.
@@ -63,8 +80,12 @@ def _wrap_propagate_for_multiprocessing(args):
     Here, we work around that by pickling the entire object and argument list, packed
     as a tuple, transmitting that to the new process, and then unpickling that,
     unpacking the results, and *then* at last making our instance method call.
+
+    If a shared memory accumulator is given, the weighted PSF is added directly into it
+    rather than being returned; see `_add_to_shared_accumulator`.
     """
-    optical_system, wavelength, retain_intermediates, retain_final, normalize, usefftwflag = args
+    (optical_system, wavelength, retain_intermediates, retain_final, normalize, usefftwflag,
+     weight, accumulator) = args
     conf.use_fftw = usefftwflag  # passed in from parent process
 
     # we're in a different Python interpreter process so we
@@ -73,10 +94,406 @@ def _wrap_propagate_for_multiprocessing(args):
         utils._loaded_fftw_wisdom = False
         utils.fftw_load_wisdom()
 
-    return optical_system.propagate_mono(wavelength,
-                                         retain_intermediates=retain_intermediates,
-                                         retain_final=retain_final,
-                                         normalize=normalize)
+    result = optical_system.propagate_mono(wavelength,
+                                           retain_intermediates=retain_intermediates,
+                                           retain_final=retain_final,
+                                           normalize=normalize)
+    if accumulator is not None:
+        result = _add_to_shared_accumulator(result, weight, accumulator)
+    return result
+
+
+# Lock for worker processes writing to a shared memory accumulator. Set in each worker
+# process by _init_worker_lock when it starts.
+_worker_lock = None
+
+
+def _init_worker_lock(lock):
+    """ Initializer for worker processes, to store the lock shared with the parent process """
+    global _worker_lock
+    _worker_lock = lock
+
+
+def _add_to_shared_accumulator(result, weight, accumulator):
+    """ Add a weighted PSF from a worker process into a shared memory accumulator.
+
+    Parameters
+    ----------
+    result : tuple
+        The (fits.HDUList, intermediate wavefronts) tuple returned by `propagate_mono`
+    weight : float
+        Weight by which to multiply the PSF for this wavelength
+    accumulator : tuple
+        The (name, shape, dtype) of the shared memory array, as given by `_SharedPSFAccumulator.spec`
+
+    Returns
+    -------
+    The result tuple, with the PSF data array removed if it was added to the accumulator.
+    If the PSF does not match the shape of the accumulator, it is returned unchanged instead.
+    """
+    psf, intermediate_wfs = result
+    name, shape, dtype = accumulator
+    if psf[0].data.shape != tuple(shape):
+        return result
+
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        accumulated = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        with _worker_lock:
+            accumulated += psf[0].data * weight
+        del accumulated  # release the view on the shared buffer before closing it
+    finally:
+        shm.close()
+    psf[0].data = None
+    return psf, intermediate_wfs
+
+
+class _SharedPSFAccumulator(object):
+    """ An array in shared memory into which worker processes add their weighted PSFs.
+
+    This avoids pickling every monochromatic PSF back to the parent process and holding
+    them all in memory at once there, which is significant for large detector arrays.
+
+    Parameters
+    ----------
+    shape : tuple of ints
+        Shape of the PSF array
+    """
+
+    def __init__(self, shape):
+        self.shape = tuple(int(n) for n in shape)
+        self.dtype = np.dtype(_float())
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        self.array[:] = 0
+
+    @property
+    def spec(self):
+        """ (name, shape, dtype) tuple identifying the shared array, to be passed to workers """
+        return (self._shm.name, self.shape, self.dtype.str)
+
+    @staticmethod
+    def output_shape(optical_system):
+        """ Return the PSF shape for an optical system if it can be known ahead of calculation,
+        i.e. if the system ends in a Detector; otherwise return None. """
+        if (isinstance(optical_system, OpticalSystem) and len(optical_system.planes) > 0 and
+                isinstance(optical_system.planes[-1], Detector)):
+            return optical_system._propagation_info()['output_shape']
+        return None
+
+    def release(self):
+        """ Return a copy of the accumulated array, and free the shared memory """
+        result = self.array.copy()
+        self.array = None
+        self._shm.close()
+        self._shm.unlink()
+        return result
+
+
+def _persistent_worker_main(conn, lock=None):
+    """ Main loop for a worker process in the persistent worker pool.
+
+    Each worker keeps a cached copy of the most recent optical system it was sent,
+    stored as the system itself plus a separate list of its planes. The parent process
+    sends only the parts of the optical system which have changed since the last
+    calculation, followed by the wavelengths to propagate.
+
+    Messages received over the connection are tuples:
+        ('update', system_bytes or None, {plane_index: plane_bytes}, nplanes)
+        ('propagate', wavelength, retain_intermediates, retain_final, normalize, usefftwflag,
+         weight, accumulator)
+        ('stop',)
+    Each 'propagate' message is answered with either ('ok', result) or ('error', traceback_text).
+    """
+    optical_system = None
+    planes = []
+    update_error = None
+    loaded_wisdom = False
+    _init_worker_lock(lock)
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break  # parent process has gone away
+        command = message[0]
+
+        if command == 'stop':
+            break
+        elif command == 'update':
+            try:
+                _, system_bytes, changed_planes, nplanes = message
+                if system_bytes is not None:
+                    optical_system = pickle.loads(system_bytes)
+                planes = (planes + [None] * nplanes)[:nplanes]
+                for index, plane_bytes in changed_planes.items():
+                    planes[index] = pickle.loads(plane_bytes)
+                if nplanes:
+                    optical_system.planes = list(planes)
+                update_error = None
+            except Exception:
+                update_error = traceback.format_exc()
+        elif command == 'propagate':
+            if update_error is not None:
+                conn.send(('error', update_error))
+                continue
+            try:
+                (_, wavelength, retain_intermediates, retain_final, normalize, usefftwflag,
+                 weight, accumulator) = message
+                conf.use_fftw = usefftwflag  # passed in from parent process
+                if conf.use_fftw and accel_math._FFTW_AVAILABLE and not loaded_wisdom:
+                    utils._loaded_fftw_wisdom = False
+                    utils.fftw_load_wisdom()
+                    loaded_wisdom = True
+                result = optical_system.propagate_mono(wavelength,
+                                                       retain_intermediates=retain_intermediates,
+                                                       retain_final=retain_final,
+                                                       normalize=normalize)
+                if accumulator is not None:
+                    result = _add_to_shared_accumulator(result, weight, accumulator)
+                conn.send(('ok', result))
+            except Exception:
+                conn.send(('error', traceback.format_exc()))
+    conn.close()
+
+
+class _PersistentWorkerPool(object):
+    """ A pool of long-lived worker processes for parallel PSF calculations.
+
+    Unlike a multiprocessing.Pool created for each calculation, the workers here persist
+    between calls to `calc_psf` and cache the optical system they were last sent.
+    The optical system is pickled one plane at a time, and each part is identified by a hash
+    of its pickled bytes, so that only parts which have changed since a worker's previous
+    calculation (for instance a deformable mirror with new actuator settings) need to be
+    transferred to it again.
+
+    Use via `calc_psf` with `poppy.conf.use_persistent_pool = True`; the pool is
+    shut down by `shutdown_worker_pool`, or automatically on exit.
+    """
+
+    def __init__(self):
+        # Use forkserver method for robustness, as for the regular multiprocessing pool.
+        self._ctx = multiprocessing.get_context('forkserver')
+        self._processes = []
+        self._connections = []
+        self._cached_hashes = []  # per worker: (system hash, list of plane hashes) last sent, or None
+        self._lock = self._ctx.Lock()  # for writing to shared memory accumulators
+
+    def __len__(self):
+        return len(self._processes)
+
+    def _start_worker(self, index):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_persistent_worker_main, args=(child_conn, self._lock),
+                                    daemon=True)
+        process.start()
+        child_conn.close()
+        if index < len(self._processes):
+            self._processes[index], self._connections[index] = process, parent_conn
+            self._cached_hashes[index] = None
+        else:
+            self._processes.append(process)
+            self._connections.append(parent_conn)
+            self._cached_hashes.append(None)
+
+    def _ensure_workers(self, nproc):
+        """ Start new workers as needed to have nproc live ones, replacing any which have died """
+        for i in range(nproc):
+            if i >= len(self._processes) or not self._processes[i].is_alive():
+                self._start_worker(i)
+
+    @staticmethod
+    def _serialize(optical_system):
+        """ Pickle an optical system into separate parts for the system and for each of its planes.
+
+        Returns the system bytes, the list of plane bytes, and the hashes of each.
+        Systems whose planes are not a simple attribute (e.g. CompoundOpticalSystem) are
+        pickled as a single part with no separate planes.
+        """
+        if isinstance(vars(optical_system).get('planes'), list):
+            shell = copy.copy(optical_system)
+            shell.planes = []
+            plane_bytes = [pickle.dumps(plane, protocol=pickle.HIGHEST_PROTOCOL)
+                           for plane in optical_system.planes]
+        else:
+            shell = optical_system
+            plane_bytes = []
+        system_bytes = pickle.dumps(shell, protocol=pickle.HIGHEST_PROTOCOL)
+        system_hash = hashlib.sha1(system_bytes).digest()
+        plane_hashes = [hashlib.sha1(b).digest() for b in plane_bytes]
+        return system_bytes, plane_bytes, system_hash, plane_hashes
+
+    def _send_updates(self, index, system_bytes, plane_bytes, system_hash, plane_hashes):
+        """ Send a worker whichever parts of the optical system it does not already have """
+        cached = self._cached_hashes[index]
+        if cached is None:
+            cached_system_hash, cached_plane_hashes = None, []
+        else:
+            cached_system_hash, cached_plane_hashes = cached
+        changed_planes = {i: plane_bytes[i] for i, h in enumerate(plane_hashes)
+                          if i >= len(cached_plane_hashes) or cached_plane_hashes[i] != h}
+        new_system = system_bytes if system_hash != cached_system_hash else None
+        if new_system is not None or changed_planes or len(plane_hashes) != len(cached_plane_hashes):
+            _log.debug("Sending worker {} {} of {} optical planes{}".format(
+                index, len(changed_planes), len(plane_hashes),
+                " and the optical system" if new_system is not None else ""))
+            self._connections[index].send(('update', new_system, changed_planes, len(plane_hashes)))
+        self._cached_hashes[index] = (system_hash, plane_hashes)
+
+    def propagate_mono(self, optical_system, wavelengths, nproc, retain_intermediates=False,
+                       retain_final=False, normalize='first', usefftwflag=False,
+                       weights=None, accumulator=None):
+        """ Propagate through an optical system at each of several wavelengths in parallel,
+        using up to nproc of the pool's workers.
+
+        Returns a list of the results of `optical_system.propagate_mono` for each wavelength.
+        If the spec of a shared memory accumulator is given, the PSFs are instead added into it
+        with the given weights; see `_add_to_shared_accumulator`.
+        """
+        nproc = max(1, min(int(nproc), len(wavelengths)))
+        self._ensure_workers(nproc)
+        serialized = self._serialize(optical_system)
+
+        results = [None] * len(wavelengths)
+        pending = list(enumerate(wavelengths))
+        busy = {}  # connection: (worker index, wavelength index)
+
+        def send_next(index):
+            wave_index, wavelength = pending.pop(0)
+            conn = self._connections[index]
+            weight = weights[wave_index] if weights is not None else None
+            conn.send(('propagate', wavelength, retain_intermediates, retain_final, normalize, usefftwflag,
+                       weight, accumulator))
+            busy[conn] = (index, wave_index)
+
+        try:
+            for index in range(nproc):
+                self._send_updates(index, *serialized)
+                if pending:
+                    send_next(index)
+            while busy:
+                for conn in multiprocessing.connection.wait(list(busy)):
+                    index, wave_index = busy.pop(conn)
+                    status, value = conn.recv()
+                    if status != 'ok':
+                        raise RuntimeError("Error in persistent worker process {} computing wavelength {}:\n{}".format(
+                            index, wavelengths[wave_index], value))
+                    results[wave_index] = value
+                    if pending:
+                        send_next(index)
+        except BaseException:
+            # Worker state is now unknown, so restart the pool on next use
+            self.shutdown()
+            raise
+        return results
+
+    def shutdown(self):
+        """ Stop all worker processes """
+        for process, conn in zip(self._processes, self._connections):
+            try:
+                if process.is_alive():
+                    conn.send(('stop',))
+                conn.close()
+            except (OSError, EOFError, BrokenPipeError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes, self._connections, self._cached_hashes = [], [], []
+
+
+_worker_pool = None
+
+
+def _get_worker_pool():
+    """ Return the persistent worker pool, creating it if necessary """
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = _PersistentWorkerPool()
+    return _worker_pool
+
+
+def shutdown_worker_pool():
+    """ Shut down the persistent pool of worker processes used for parallel calculations,
+    if it has been started. See `poppy.conf.use_persistent_pool`.
+
+    This is done automatically when Python exits, but may also be called at any time to free the
+    memory used by the workers; a new pool will be started if needed by a later calculation.
+    """
+    global _worker_pool
+    if _worker_pool is not None:
+        _log.debug("Shutting down persistent pool of {} worker processes".format(len(_worker_pool)))
+        _worker_pool.shutdown()
+        _worker_pool = None
+
+
+atexit.register(shutdown_worker_pool)
+
+
+_thread_pool = None
+_thread_pool_size = None
+_thread_pool_lock = threading.Lock()
+
+
+def _get_thread_pool(nthreads):
+    """ Return the pool of threads used for parallel calculations when
+    `poppy.conf.parallel_backend` is 'threads', with nthreads threads.
+
+    The same threads are reused by successive calculations, rather than starting new
+    threads for each. The pool is only replaced if a different number of threads is requested.
+    Each thread computes its FFTs using an equal share of the available CPUs.
+    """
+    global _thread_pool, _thread_pool_size
+    with _thread_pool_lock:
+        if _thread_pool is None or _thread_pool_size != nthreads:
+            if _thread_pool is not None:
+                _thread_pool.shutdown(wait=False)
+            fft_threads = max(1, multiprocessing.cpu_count() // nthreads)
+            _thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=nthreads,
+                                                                 thread_name_prefix='poppy',
+                                                                 initializer=accel_math._set_fft_threads,
+                                                                 initargs=(fft_threads,))
+            _thread_pool_size = nthreads
+        return _thread_pool
+
+
+def _stack_wavefront_arrays(wavefronts):
+    """ Return the arrays of several wavefronts stacked into one (nwave, ny, nx) array.
+
+    If the arrays are already the consecutive planes of a single stack, as left behind by
+    a prior batched FFT, that stack is returned directly rather than making a copy.
+    """
+    arrays = [wf.wavefront for wf in wavefronts]
+    base = arrays[0].base
+    if (isinstance(base, np.ndarray) and base.ndim == 3 and base.shape[0] == len(arrays) and
+            all(arr.base is base and arr.shape == base.shape[1:] and arr.strides == base.strides[1:] and
+                arr.ctypes.data == base[i].ctypes.data for i, arr in enumerate(arrays))):
+        return base
+    return np.stack(arrays)
+
+
+# ------ Cache of wavefront coordinate arrays -----
+
+# Coordinate arrays for reuse
+_COORDINATES_CACHE = utils.ArrayCache('coordinates', 'coordinate_cache_size')
+
+
+def _cached_coordinates(key, compute):
+    """ Return a tuple of read-only coordinate arrays for the given key, calling
+    compute() to create them if they are not already cached. """
+    return _COORDINATES_CACHE.get_or_compute(key, lambda: tuple(compute()))
+
+
+def _pixelscale_key(pixelscale):
+    """ Hashable form of a scalar or 2-element pixel scale value, for coordinate cache keys """
+    return tuple(np.ravel(pixelscale).tolist())
+
+
+def clear_coordinate_cache():
+    """ Discard all cached wavefront coordinate arrays, to free their memory """
+    _COORDINATES_CACHE.clear()
 
 
 class BaseWavefront(ABC):
@@ -178,7 +595,8 @@ class BaseWavefront(ABC):
             self.location = 'at ' + optic.name
             return self
 
-        phasor = optic.get_phasor(self)
+        with _phasor_lock:
+            phasor = optic.get_phasor(self)
 
         if not np.isscalar(phasor) and phasor.size > 1:
             assert self.wavefront.shape == phasor.shape, "Phasor shape {} does not match wavefront shape {}".format(
@@ -838,6 +1256,36 @@ class BaseWavefront(ABC):
         """
         pass
 
+    def _coordinates_key(self):
+        """ Return a hashable key identifying the coordinates of this wavefront, for caching,
+        or None if they should not be cached.
+
+        Subclasses may override this to enable caching of their coordinates; by
+        default they are recomputed each time.
+        """
+        return None
+
+    def polar_coordinates(self):
+        """ Return R, Theta polar coordinates for this wavefront, computed from coordinates()
+
+        The returned arrays are cached for reuse by other wavefronts with the same
+        sampling, and so are read-only.
+
+        Returns
+        -------
+        R, Theta : array_like
+            Radial coordinates in the same units as coordinates(), and position angle
+            in radians counterclockwise from the +X axis.
+        """
+        def compute():
+            y, x = self.coordinates()
+            return np.sqrt(x ** 2 + y ** 2), np.arctan2(y, x)
+
+        key = self._coordinates_key()
+        if key is None:
+            return compute()
+        return _cached_coordinates(('polar',) + key, compute)
+
 
 class Wavefront(BaseWavefront):
     """ Wavefront in the Fraunhofer approximation: a monochromatic wavefront that
@@ -914,12 +1362,14 @@ class Wavefront(BaseWavefront):
         optic : OpticalElement
             The optic to propagate to. Used for determining the appropriate optical plane.
         """
-        if self.planetype == optic.planetype:
-            if isinstance(optic, Detector):
-                _log.debug("  Resampling wavefront to match detector pixellation.")
-                self._resample_wavefront_pixelscale(optic)
-            else:
-                _log.debug("  Wavefront and optic %s already at same plane type, no propagation needed." % optic.name)
+        method = self._propagation_method(optic)
+        if method == 'resample':
+            _log.debug("  Resampling wavefront to match detector pixellation.")
+            self._resample_wavefront_pixelscale(optic)
+            self.current_plane_index += 1
+            return
+        elif method is None:
+            _log.debug("  Wavefront and optic %s already at same plane type, no propagation needed." % optic.name)
             self.current_plane_index += 1
             return
         else:
@@ -927,30 +1377,57 @@ class Wavefront(BaseWavefront):
             _log.debug(msg)
             self.history.append(msg)
 
-        if optic.planetype == PlaneType.rotation:  # rotate
+        if method == 'rotation':  # rotate
             self.rotate(optic.angle)
             self.location = 'after ' + optic.name
-        elif optic.planetype == PlaneType.inversion:  # invert coordinates
+        elif method == 'inversion':  # invert coordinates
             self.invert(axis=optic.axis)
             self.location = 'after ' + optic.name
-        elif ((optic.planetype == PlaneType.detector or getattr(optic, 'propagation_hint', None) == 'MFT')
-                and self.planetype == PlaneType.pupil):  # from pupil to detector in image plane: use MFT
+        elif method == 'MFT':  # from pupil to detector in image plane: use MFT
             self._propagate_mft(optic)
             self.location = 'before ' + optic.name
+        elif method == 'inverse MFT':
+            self._propagate_mft_inverse(optic)
+            self.location = 'before ' + optic.name
+        else:
+            self._propagate_fft(optic)  # FFT pupil to image or image to pupil
+            self.location = 'before ' + optic.name
+
+        self.current_plane_index += 1
+
+    def _propagation_method(self, optic):
+        """ Determine which kind of propagation is needed to get from the current plane to a given optic.
+
+        Parameters
+        -----------
+        optic : OpticalElement
+            The optic to propagate to. Used for determining the appropriate optical plane.
+
+        Returns
+        -------
+        method : str or None
+            One of 'resample', 'rotation', 'inversion', 'MFT', 'inverse MFT', or 'FFT';
+            or None if the wavefront is already at the same plane type as the optic.
+        """
+        if self.planetype == optic.planetype:
+            return 'resample' if isinstance(optic, Detector) else None
+        elif optic.planetype == PlaneType.rotation:
+            return 'rotation'
+        elif optic.planetype == PlaneType.inversion:
+            return 'inversion'
+        elif ((optic.planetype == PlaneType.detector or getattr(optic, 'propagation_hint', None) == 'MFT')
+                and self.planetype == PlaneType.pupil):  # from pupil to detector in image plane: use MFT
+            return 'MFT'
         elif (optic.planetype == PlaneType.pupil and self.planetype == PlaneType.image and
                 self._last_transform_type == 'MFT'):
             # inverse MFT detector to pupil
             # n.b. transforming PlaneType.pupil -> PlaneType.detector results in self.planetype == PlaneType.image
             # while setting _last_transform_type to MFT
-            self._propagate_mft_inverse(optic)
-            self.location = 'before ' + optic.name
+            return 'inverse MFT'
         elif self.planetype == PlaneType.image and optic.planetype == PlaneType.detector:
             raise NotImplementedError('image plane directly to detector propagation (resampling!) not implemented yet')
         else:
-            self._propagate_fft(optic)  # FFT pupil to image or image to pupil
-            self.location = 'before ' + optic.name
-
-        self.current_plane_index += 1
+            return 'FFT'  # FFT pupil to image or image to pupil
 
     def _propagate_fft(self, optic):
         """ Propagate from pupil to image or vice versa using a padded FFT
@@ -960,6 +1437,29 @@ class Wavefront(BaseWavefront):
         optic : OpticalElement
             The optic to propagate to. Used for determining the appropriate optical plane.
 
+        """
+        fft_forward = self._prepare_fft(optic)
+
+        # do FFT
+        if conf.enable_flux_tests: _log.debug("\tPre-FFT total intensity: " + str(self.total_intensity))
+        if conf.enable_speed_tests: t0 = time.time()
+
+        self.wavefront = accel_math.fft_2d(self.wavefront, forward=fft_forward)
+
+        self._finish_fft(fft_forward)
+
+        if conf.enable_speed_tests:
+            t1 = time.time()
+            _log.debug("\tTIME %f s\t for the FFT" % (t1 - t0))
+
+        if conf.enable_flux_tests:
+            _log.debug("\tPost-FFT total intensity: " + str(self.total_intensity))
+
+    def _prepare_fft(self, optic):
+        """ Pad the wavefront if needed, and update the plane type and pixel scale metadata
+        ahead of an FFT to the given optic.
+
+        Returns True for a forward (pupil to image) FFT, False for an inverse one.
         """
         if self.oversample > 1 and not self.ispadded:  # add padding for oversampling, if necessary
             assert self.oversample == optic.oversample
@@ -987,12 +1487,10 @@ class Wavefront(BaseWavefront):
             self.pixelscale = self.diam * self.oversample / (self.wavefront.shape[0] * u.pixel)
             self.history.append('   FFT {},  to PUPIL scale={:.4f}'.format(self.wavefront.shape, self.pixelscale))
 
-        # do FFT
-        if conf.enable_flux_tests: _log.debug("\tPre-FFT total intensity: " + str(self.total_intensity))
-        if conf.enable_speed_tests: t0 = time.time()
-
-        self.wavefront = accel_math.fft_2d(self.wavefront, forward=fft_forward)
+        return fft_forward
 
+    def _finish_fft(self, fft_forward):
+        """ Update the centering metadata after an FFT has been applied to the wavefront array """
         if fft_forward:
             # FFT produces pixel-centered images by default, unless the _image_centered param
             # has already been set by an FQPM_FFT_aligner class
@@ -1001,12 +1499,70 @@ class Wavefront(BaseWavefront):
 
         self._last_transform_type = 'FFT'
 
+    @staticmethod
+    def _propagate_fft_batched(wavefronts, optic):
+        """ Propagate several wavefronts from pupil to image or vice versa together,
+        using one batched FFT of their stacked arrays.
+
+        The wavefronts must all be in the same plane, with the same array shape after padding.
+        On return, each wavefront's array is a view into one plane of the transformed stack,
+        so that a following batched FFT can reuse the stack without copying.
+
+        Parameters
+        -----------
+        wavefronts : list of Wavefront instances
+            Wavefronts to propagate, typically one per wavelength.
+        optic : OpticalElement
+            The optic to propagate to. Used for determining the appropriate optical plane.
+        """
+        directions = set(wf._prepare_fft(optic) for wf in wavefronts)
+        if len(directions) != 1:
+            raise ValueError("Wavefronts to propagate together must all be in the same plane.")
+        fft_forward = directions.pop()
+
+        if conf.enable_speed_tests: t0 = time.time()
+
+        stack = accel_math.fft_2d(_stack_wavefront_arrays(wavefronts), forward=fft_forward)
+
+        for i, wf in enumerate(wavefronts):
+            wf.wavefront = stack[i]
+            wf._finish_fft(fft_forward)
+
         if conf.enable_speed_tests:
             t1 = time.time()
-            _log.debug("\tTIME %f s\t for the FFT" % (t1 - t0))
+            _log.debug("\tTIME %f s\t for the batched FFT of %d wavefronts" % (t1 - t0, len(wavefronts)))
 
-        if conf.enable_flux_tests:
-            _log.debug("\tPost-FFT total intensity: " + str(self.total_intensity))
+    @staticmethod
+    def _propagate_mft_batched(wavefronts, det):
+        """ Propagate several wavefronts from a pupil to a detector together, using one
+        batched MFT of their stacked arrays with a different sampling for each wavelength.
+
+        The wavefronts must all be in a pupil plane, with the same array shape.
+
+        Parameters
+        -----------
+        wavefronts : list of Wavefront instances
+            Wavefronts to propagate, typically one per wavelength.
+        det : OpticalElement, must be of type DETECTOR
+            The target optical plane to propagate to.
+        """
+        mft_params = [wf._prepare_mft(det) for wf in wavefronts]
+        det_fov_lam_d = np.asarray([params[0] for params in mft_params])
+        det_calc_size_pixels, det_offset = mft_params[0][1:]
+
+        if conf.enable_speed_tests: t0 = time.time()
+
+        mft = MatrixFourierTransform(centering='ADJUSTABLE', verbose=False)
+        stack = mft.perform(_stack_wavefront_arrays(wavefronts), det_fov_lam_d, det_calc_size_pixels,
+                            offset=det_offset, per_plane=True)
+
+        for i, wf in enumerate(wavefronts):
+            wf.wavefront = stack[i]
+            wf._finish_mft(det, det_calc_size_pixels)
+
+        if conf.enable_speed_tests:
+            t1 = time.time()
+            _log.debug("\tTIME %f s\t for the batched MFT of %d wavefronts" % (t1 - t0, len(wavefronts)))
 
     def _propagate_mft(self, det):
         """ Compute from pupil to an image using the Soummer et al. 2007 MFT algorithm
@@ -1016,6 +1572,27 @@ class Wavefront(BaseWavefront):
         det : OpticalElement, must be of type DETECTOR
             The target optical plane to propagate to."""
 
+        det_fov_lam_d, det_calc_size_pixels, det_offset = self._prepare_mft(det)
+
+        mft = MatrixFourierTransform(centering='ADJUSTABLE', verbose=False)
+        _log.debug('      MFT method = ' + mft.centering)
+
+        # det_offset controls how to shift the PSF.
+        # it gives the coordinates (X, Y) relative to the exact center of the array
+        # for the location of the phase center of a converging perfect spherical wavefront.
+        # This is where a perfect PSF would be centered. Of course any tilts, comas, etc, from the OPD
+        # will probably shift it off elsewhere for an entirely different reason, too.
+        self.wavefront = mft.perform(self.wavefront, det_fov_lam_d, det_calc_size_pixels, offset=det_offset)
+
+        self._finish_mft(det, det_calc_size_pixels)
+
+    def _prepare_mft(self, det):
+        """ Remove any padding from the wavefront, and work out the parameters for an MFT
+        from the pupil to the given detector.
+
+        Returns the detector field of view in lambda/D units, the number of pixels to compute,
+        and the detector offset, as needed for `MatrixFourierTransform.perform`.
+        """
         assert self.planetype == PlaneType.pupil
         assert (det.planetype == PlaneType.detector or
                 getattr(det, 'propagation_hint', None) == 'MFT')
@@ -1038,7 +1615,6 @@ class Wavefront(BaseWavefront):
         det_fov_lam_d = det.fov_arcsec.to(u.arcsec).value / lam_d
         det_calc_size_pixels = det.fov_pixels.to(u.pixel).value * det.oversample
 
-        mft = MatrixFourierTransform(centering='ADJUSTABLE', verbose=False)
         if not np.isscalar(det_fov_lam_d):  # hasattr(det_fov_lam_d,'__len__'):
             msg = '    Propagating w/ MFT: {:.4f}     fov=[{:.3f},{:.3f}] lam/D    npix={} x {}'.format(
                 det.pixelscale / det.oversample, det_fov_lam_d[0], det_fov_lam_d[1],
@@ -1050,14 +1626,11 @@ class Wavefront(BaseWavefront):
         self.history.append(msg)
         det_offset = det.det_offset if hasattr(det, 'det_offset') else (0, 0)
 
-        _log.debug('      MFT method = ' + mft.centering)
+        return det_fov_lam_d, det_calc_size_pixels, det_offset
 
-        # det_offset controls how to shift the PSF.
-        # it gives the coordinates (X, Y) relative to the exact center of the array
-        # for the location of the phase center of a converging perfect spherical wavefront.
-        # This is where a perfect PSF would be centered. Of course any tilts, comas, etc, from the OPD
-        # will probably shift it off elsewhere for an entirely different reason, too.
-        self.wavefront = mft.perform(self.wavefront, det_fov_lam_d, det_calc_size_pixels, offset=det_offset)
+    def _finish_mft(self, det, det_calc_size_pixels):
+        """ Update the plane type and pixel scale metadata after an MFT to the given
+        detector has been applied to the wavefront array """
         _log.debug("     Result wavefront: at={0} shape={1} ".format(
             self.location, str(self.shape)))
         self._last_transform_type = 'MFT'
@@ -1148,9 +1721,18 @@ class Wavefront(BaseWavefront):
         pixelscale : float or 2-tuple of floats
             the pixel scale in meters/pixel, optionally different in
             X and Y
+
+        The returned arrays are cached for reuse, and so are read-only.
         """
-        y, x = np.indices(shape, dtype=_float())
         pixelscale_mpix = pixelscale.to(u.meter / u.pixel).value if isinstance(pixelscale, u.Quantity) else pixelscale
+        key = ('pupil', tuple(shape), _pixelscale_key(pixelscale_mpix), np.dtype(_float()),
+               accel_math._USE_NUMEXPR)
+        return _cached_coordinates(key, lambda: Wavefront._pupil_coordinates(shape, pixelscale_mpix))
+
+    @staticmethod
+    def _pupil_coordinates(shape, pixelscale_mpix):
+        """ Compute new pupil coordinate arrays; see pupil_coordinates """
+        y, x = np.indices(shape, dtype=_float())
         if not np.isscalar(pixelscale_mpix):
             pixel_scale_x, pixel_scale_y = pixelscale_mpix
         else:
@@ -1184,9 +1766,19 @@ class Wavefront(BaseWavefront):
         image_centered : string
             Was POPPY trying to keeping the center of the image on
             a pixel, crosshairs ('array_center'), or corner?
+
+        The returned arrays are cached for reuse, and so are read-only.
         """
-        y, x = np.indices(shape, dtype=_float())
         pixelscale_arcsecperpix = pixelscale.to(u.arcsec / u.pixel).value
+        key = ('image', tuple(shape), _pixelscale_key(pixelscale_arcsecperpix), last_transform_type,
+               image_centered, np.dtype(_float()))
+        return _cached_coordinates(key, lambda: Wavefront._image_coordinates(
+            shape, pixelscale_arcsecperpix, last_transform_type, image_centered))
+
+    @staticmethod
+    def _image_coordinates(shape, pixelscale_arcsecperpix, last_transform_type, image_centered):
+        """ Compute new image coordinate arrays; see image_coordinates """
+        y, x = np.indices(shape, dtype=_float())
         if not np.isscalar(pixelscale_arcsecperpix):
             pixel_scale_x, pixel_scale_y = pixelscale_arcsecperpix
         else:
@@ -1224,6 +1816,8 @@ class Wavefront(BaseWavefront):
         This function knows about the offset resulting from FFTs. Use it whenever computing anything
         measured in wavefront coordinates.
 
+        The returned arrays are cached for reuse, and so are read-only.
+
         Returns
         -------
         Y, X :  array_like
@@ -1238,6 +1832,14 @@ class Wavefront(BaseWavefront):
         else:
             raise RuntimeError("Unknown plane type (should be pupil or image!)")
 
+    def _coordinates_key(self):
+        if type(self).coordinates is not Wavefront.coordinates:
+            return None  # coordinates customized by a subclass
+        unit = u.meter / u.pixel if self.planetype == PlaneType.pupil else u.arcsec / u.pixel
+        pixelscale = self.pixelscale.to(unit).value if isinstance(self.pixelscale, u.Quantity) else self.pixelscale
+        return (type(self), self.planetype, tuple(self.shape), _pixelscale_key(pixelscale),
+                self._last_transform_type, self._image_centered)
+
     @classmethod
     def from_fresnel_wavefront(cls, fresnel_wavefront, verbose=False):
         """Convert a Fresnel type wavefront object to a Fraunhofer one
@@ -1518,10 +2120,12 @@ class BaseOpticalSystem(ABC):
             # Avoid a Mac OS incompatibility that can lead to hard-to-reproduce crashes.
             # see issues #23 and #176
 
-            if _USE_FFTW:
+            use_threads = conf.parallel_backend == 'threads'
+            if _USE_FFTW and not use_threads:
                 _log.warning('IMPORTANT WARNING: Python multiprocessing and fftw3 do not appear to play well together. '
                              'This may crash intermittently')
-                _log.warning('   We suggest you set poppy.conf.use_fftw to False if you want to use multiprocessing().')
+                _log.warning('   We suggest you set poppy.conf.use_fftw to False if you want to use multiprocessing(), '
+                             'or set poppy.conf.parallel_backend to "threads".')
             if display:
                 _log.warning('Display during calculations is not supported for multiprocessing mode. '
                              'Please set poppy.conf.use_multiprocessing = False if you want to use display=True.')
@@ -1542,48 +2146,110 @@ class BaseOpticalSystem(ABC):
             nproc = min(nproc, len(wavelength))  # never try more processes than wavelengths.
             # be sure to cast nproc to int below; will fail if given a float even if of integer value
 
-            # Use forkserver method (requires Python >= 3.4) for more robustness, instead of just Pool
-            # Resolves https://github.com/mperrin/poppy/issues/23
-            ctx = multiprocessing.get_context('forkserver')
-            pool = ctx.Pool(int(nproc))
+            if use_threads:
+                # Run the calculations in threads within this process. The numerically intensive
+                # parts (FFTs, matrix products, numexpr) release the GIL, and nothing needs to be pickled.
+                _log.info("Beginning multithreaded job using {0} threads".format(nproc))
 
-            # build a single iterable containing the required function arguments
-            _log.info("Beginning multiprocessor job using {0} processes".format(nproc))
-            worker_arguments = [(self, wlen, retain_intermediates, return_final, normalize, _USE_FFTW)
-                                for wlen in wavelength]
-            results = pool.map(_wrap_propagate_for_multiprocessing, worker_arguments)
-            _log.info("Finished multiprocessor job")
-            pool.close()
+                def propagate_mono_for_thread(wlen):
+                    return self.propagate_mono(wlen,
+                                               retain_intermediates=retain_intermediates,
+                                               retain_final=return_final,
+                                               normalize=normalize)
+
+                results = list(_get_thread_pool(int(nproc)).map(propagate_mono_for_thread, wavelength))
+                _log.info("Finished multithreaded job")
+                psf_sum = None
+            else:
+                # Optionally have the workers sum their PSFs directly into an array in shared memory.
+                # This is only possible if the output shape is known in advance.
+                accumulator = None
+                if conf.use_shared_memory_accumulation:
+                    output_shape = _SharedPSFAccumulator.output_shape(self)
+                    if shared_memory is None:
+                        _log.warning("Shared memory accumulation requires Python >= 3.8; results will be "
+                                     "returned from each process instead.")
+                    elif output_shape is None:
+                        _log.debug("Output shape not known in advance for shared memory accumulation; results "
+                                   "will be returned from each process instead.")
+                    else:
+                        accumulator = _SharedPSFAccumulator(output_shape)
+                accumulator_spec = accumulator.spec if accumulator is not None else None
+
+                try:
+                    if conf.use_persistent_pool:
+                        # Reuse long-lived worker processes, which cache the optical system between calls
+                        _log.info("Beginning multiprocessor job using {0} persistent worker processes".format(nproc))
+                        results = _get_worker_pool().propagate_mono(self, wavelength, nproc,
+                                                                    retain_intermediates=retain_intermediates,
+                                                                    retain_final=return_final,
+                                                                    normalize=normalize,
+                                                                    usefftwflag=_USE_FFTW,
+                                                                    weights=normwts,
+                                                                    accumulator=accumulator_spec)
+                    else:
+                        # Use forkserver method (requires Python >= 3.4) for more robustness, instead of just Pool
+                        # Resolves https://github.com/mperrin/poppy/issues/23
+                        ctx = multiprocessing.get_context('forkserver')
+                        pool = ctx.Pool(int(nproc), initializer=_init_worker_lock, initargs=(ctx.Lock(),))
+
+                        # build a single iterable containing the required function arguments
+                        _log.info("Beginning multiprocessor job using {0} processes".format(nproc))
+                        worker_arguments = [(self, wlen, retain_intermediates, return_final, normalize, _USE_FFTW,
+                                             wave_weight, accumulator_spec)
+                                            for wlen, wave_weight in zip(wavelength, normwts)]
+                        results = pool.map(_wrap_propagate_for_multiprocessing, worker_arguments)
+                        pool.close()
+                    _log.info("Finished multiprocessor job")
+                finally:
+                    psf_sum = accumulator.release() if accumulator is not None else None
 
             # Sum all the results up into one array, using the weights
-            outfits, intermediate_wfs = results[0]
-            outfits[0].data *= normwts[0]
-            for idx, wavefront in enumerate(intermediate_wfs):
-                intermediate_wfs[idx] *= normwts[0]
-            _log.info("got results for wavelength channel {} / {} ({:g} meters)".format(
-                0, len(tuple(wavelength)), wavelength[0]))
-            for i in range(1, len(normwts)):
-                mono_psf, mono_intermediate_wfs = results[i]
+            if not any(mono_psf[0].data is None for mono_psf, _ in results):
+                psf_sum = None  # nothing was added to the shared memory accumulator
+            for i, (mono_psf, mono_intermediate_wfs) in enumerate(results):
                 wave_weight = normwts[i]
                 _log.info("got results for wavelength channel {} / {} ({:g} meters)".format(
                     i, len(tuple(wavelength)), wavelength[i]))
-                outfits[0].data += mono_psf[0].data * wave_weight
-                for idx, wavefront in enumerate(mono_intermediate_wfs):
-                    intermediate_wfs[idx] += wavefront * wave_weight
-            outfits[0].header.add_history("Multiwavelength PSF calc using {} processes completed.".format(nproc))
+                if mono_psf[0].data is not None:  # if not already summed in shared memory
+                    if psf_sum is None:
+                        psf_sum = mono_psf[0].data * wave_weight
+                    else:
+                        psf_sum += mono_psf[0].data * wave_weight
+                if i == 0:
+                    outfits, intermediate_wfs = mono_psf, mono_intermediate_wfs
+                    for idx, wavefront in enumerate(intermediate_wfs):
+                        intermediate_wfs[idx] *= wave_weight
+                else:
+                    for idx, wavefront in enumerate(mono_intermediate_wfs):
+                        intermediate_wfs[idx] += wavefront * wave_weight
+            outfits[0].data = psf_sum
+            outfits[0].header.add_history("Multiwavelength PSF calc using {} {} completed.".format(
+                nproc, 'threads' if use_threads else 'processes'))
 
         else:  # ######### single-threaded computations (may still use multi cores if FFTW enabled ######
             if display:
                 plt.clf()
-            for wlen, wave_weight in zip(wavelength, normwts):
-                mono_psf, mono_intermediate_wfs = self.propagate_mono(
+            batched = conf.use_batched_propagation and len(wavelength) > 1 and not display_intermediates
+            if batched:
+                # propagate all wavelengths together as one stack of wavefronts
+                results = self.propagate_mono_batched(
+                    wavelength,
+                    retain_intermediates=retain_intermediates,
+                    retain_final=return_final,
+                    normalize=normalize
+                )
+            else:
+                # propagate one wavelength at a time, as each is needed
+                results = (self.propagate_mono(
                     wlen,
                     retain_intermediates=retain_intermediates,
                     retain_final=return_final,
                     display_intermediates=display_intermediates,
                     normalize=normalize
-                )
+                ) for wlen in wavelength)
 
+            for (mono_psf, mono_intermediate_wfs), wave_weight in zip(results, normwts):
                 if outfits is None:
                     # for the first wavelength processed, set up the arrays where we accumulate the output
                     outfits = mono_psf
@@ -1596,6 +2262,8 @@ class BaseOpticalSystem(ABC):
                     outfits[0].data += mono_psf[0].data * wave_weight
                     for idx, wavefront in enumerate(mono_intermediate_wfs):
                         intermediate_wfs[idx] += wavefront * wave_weight
+            if batched:
+                outfits[0].header.add_history("Multiwavelength PSF calc using batched propagation completed.")
 
             # Display WF if requested.
             #  Note - don't need to display here if we are showing all steps already
@@ -1639,8 +2307,13 @@ class BaseOpticalSystem(ABC):
         for i in range(waves.size):
             outfits[0].header['WAVE' + str(i)] = (waves[i], "Wavelength " + str(i))
             outfits[0].header['WGHT' + str(i)] = (wts[i], "Wavelength weight " + str(i))
-        ffttype = "pyFFTW" if _USE_FFTW else "numpy.fft"
-        outfits[0].header['FFTTYPE'] = (ffttype, 'Algorithm for FFTs: numpy or fftw')
+        if _USE_FFTW:
+            ffttype = "pyFFTW"
+        elif accel_math._USE_SCIPY_FFT:
+            ffttype = "scipy.fft"
+        else:
+            ffttype = "numpy.fft"
+        outfits[0].header['FFTTYPE'] = (ffttype, 'Algorithm for FFTs: numpy, scipy or fftw')
         outfits[0].header['NORMALIZ'] = (normalize, 'PSF normalization method')
 
         if self.verbose:
@@ -1723,6 +2396,81 @@ class BaseOpticalSystem(ABC):
 
         return wavefront.as_fits(), intermediate_wfs
 
+    def propagate_batched(self, wavefronts, normalize='none', return_intermediates=False):
+        """Propagate several wavefronts through this optical system.
+
+        This generic implementation simply propagates each wavefront in turn;
+        subclasses may override it to propagate the wavefronts together more efficiently.
+
+        Parameters
+        ----------
+        wavefronts : list of Wavefront instances
+            Wavefronts to propagate through this optical system, typically one per wavelength.
+        normalize : string
+            How to normalize the wavefronts. See the `propagate` method for details.
+        return_intermediates : bool
+            Should intermediate steps in the calculation be returned? Default: False.
+
+        Returns a list of wavefronts, and optionally also a list (with one entry per input wavefront)
+        of the lists of intermediate wavefronts after each step of propagation.
+        """
+        results = [self.propagate(wavefront, normalize=normalize, return_intermediates=return_intermediates)
+                   for wavefront in wavefronts]
+        if return_intermediates:
+            return [r[0] for r in results], [r[1] for r in results]
+        else:
+            return results
+
+    @utils.quantity_input(wavelengths=u.meter)
+    def propagate_mono_batched(self,
+                               wavelengths,
+                               normalize='first',
+                               retain_intermediates=False,
+                               retain_final=False):
+        """Propagate monochromatic wavefronts at several wavelengths through the optical system together.
+        Called from within `calc_psf` if `poppy.conf.use_batched_propagation` is set.
+
+        This gives the same results as calling `propagate_mono` for each wavelength, but lets
+        the wavefronts be carried through the optical system as a single stack, so that
+        the FFTs between planes can be computed for all wavelengths at once.
+        Note that the memory required scales with the number of wavelengths.
+
+        Parameters
+        ----------
+        wavelengths : astropy.Quantity
+            Array of wavelengths
+        normalize, retain_intermediates, retain_final :
+            As for `propagate_mono`.
+
+        Returns
+        -------
+        results : list of tuples
+            One (final_wf, intermediate_wfs) tuple per wavelength, each as returned by `propagate_mono`.
+        """
+        if conf.enable_speed_tests:
+            t_start = time.time()
+        if self.verbose:
+            _log.info(" Propagating {0} wavelengths together, {1:g} to {2:g}".format(
+                len(wavelengths), wavelengths.min(), wavelengths.max()))
+        wavefronts = [self.input_wavefront(wlen) for wlen in wavelengths]
+
+        if retain_intermediates:
+            wavefronts, intermediate_wfs = self.propagate_batched(wavefronts, normalize=normalize,
+                                                                  return_intermediates=True)
+        else:
+            wavefronts = self.propagate_batched(wavefronts, normalize=normalize)
+            if retain_final:  # return the full complex wavefront of the last plane.
+                intermediate_wfs = [[wavefront] for wavefront in wavefronts]
+            else:
+                intermediate_wfs = [[] for wavefront in wavefronts]
+
+        if conf.enable_speed_tests:
+            t_stop = time.time()
+            _log.debug("\tTIME %f s\tfor propagating %d wavelengths" % (t_stop - t_start, len(wavelengths)))
+
+        return [(wavefront.as_fits(), wavefront_intermediates)
+                for wavefront, wavefront_intermediates in zip(wavefronts, intermediate_wfs)]
+
     def display(self, **kwargs):
         """ Display all elements in an optical system on screen.
 
@@ -2047,23 +2795,7 @@ class OpticalSystem(BaseOpticalSystem):
             wavefront *= optic
 
             # Normalize if appropriate:
-            if normalize.lower() == 'first' and wavefront.current_plane_index == 1:  # set entrance plane to 1.
-                wavefront.normalize()
-                _log.debug("normalizing at first plane (entrance pupil) to 1.0 total intensity")
-            elif normalize.lower() == 'first=2' and wavefront.current_plane_index == 1:
-                # this undocumented option is present only for testing/validation purposes
-                wavefront.normalize()
-                wavefront *= np.sqrt(2)
-            elif normalize.lower() == 'exit_pupil':  # normalize the last pupil in the system to 1
-                last_pupil_plane_index = np.where(np.asarray(
-                    [p.planetype is PlaneType.pupil for p in self.planes]))[0].max() + 1
-                if wavefront.current_plane_index == last_pupil_plane_index:
-                    wavefront.normalize()
-                    _log.debug("normalizing at exit pupil (plane {0}) to 1.0 total intensity".format(
-                        wavefront.current_plane_index))
-            elif normalize.lower() == 'last' and wavefront.current_plane_index == len(self.planes):
-                wavefront.normalize()
-                _log.debug("normalizing at last plane to 1.0 total intensity")
+            self._normalize_wavefront(wavefront, normalize)
 
             # Optional outputs:
             if conf.enable_flux_tests:
@@ -2079,6 +2811,103 @@ class OpticalSystem(BaseOpticalSystem):
         else:
             return wavefront
 
+    def propagate_batched(self, wavefronts, normalize='none', return_intermediates=False):
+        """ Propagate several wavefronts through this optical system together
+
+        The wavefronts, typically one per wavelength, are carried through the system in step.
+        Each FFT between pupil and image planes is computed as a single batched transform
+        of the stacked (nwave, ny, nx) wavefront arrays, rather than one transform per wavefront.
+        Likewise each MFT onto a detector is a single batched transform, with its own output
+        sampling for each wavelength. All other steps, including multiplication by each optic,
+        are applied to each wavefront in turn just as in `propagate`, so the results are the same.
+
+        Parameters
+        ----------
+        wavefronts : list of Wavefront instances
+            Wavefronts to propagate through this optical system. These must all have the same
+            array size and oversampling, as is the case for wavefronts created by `input_wavefront`.
+        normalize : string
+            How to normalize the wavefronts. See the `propagate` method for details.
+        return_intermediates : bool
+            Should intermediate steps in the calculation be returned? Default: False.
+
+        Returns a list of wavefronts, and optionally also a list (with one entry per input wavefront)
+        of the lists of intermediate wavefronts after each step of propagation.
+        """
+
+        if type(self).propagate is not OpticalSystem.propagate:
+            # Subclasses which implement their own propagation logic, such as compound systems
+            # or the semi-analytic coronagraphs, propagate each wavefront in turn using it.
+            return super(OpticalSystem, self).propagate_batched(wavefronts, normalize=normalize,
+                                                                return_intermediates=return_intermediates)
+
+        for wavefront in wavefronts:
+            if not isinstance(wavefront, Wavefront):
+                raise ValueError("Wavefronts to propagate must all be Wavefront instances.")
+
+        intermediate_wfs = [[] for wavefront in wavefronts]
+
+        for optic in self.planes:
+            # The actual propagation, batched if every wavefront needs an FFT or MFT to reach this optic:
+            methods = set(wf._propagation_method(optic) for wf in wavefronts)
+            if len(wavefronts) > 1 and methods in ({'FFT'}, {'MFT'}):
+                msg = "  Propagating wavefront to %s. " % str(optic)
+                _log.debug(msg)
+                for wavefront in wavefronts:
+                    wavefront.history.append(msg)
+                if methods == {'FFT'}:
+                    Wavefront._propagate_fft_batched(wavefronts, optic)
+                else:
+                    Wavefront._propagate_mft_batched(wavefronts, optic)
+                for wavefront in wavefronts:
+                    wavefront.location = 'before ' + optic.name
+                    wavefront.current_plane_index += 1
+            else:
+                for wavefront in wavefronts:
+                    wavefront.propagate_to(optic)
+
+            for i, wavefront in enumerate(wavefronts):
+                wavefront *= optic
+                self._normalize_wavefront(wavefront, normalize)
+
+                if conf.enable_flux_tests:
+                    _log.debug("  Flux === " + str(wavefront.total_intensity))
+                if return_intermediates:
+                    intermediate_wfs[i].append(wavefront.copy())
+
+        if return_intermediates:
+            return wavefronts, intermediate_wfs
+        else:
+            return wavefronts
+
+    def _normalize_wavefront(self, wavefront, normalize):
+        """ Normalize a wavefront if appropriate at its current plane, as part of propagation
+
+        Parameters
+        ----------
+        wavefront : Wavefront instance
+            Wavefront being propagated through this optical system
+        normalize : string
+            How to normalize the wavefront. See the `propagate` method for details.
+        """
+        if normalize.lower() == 'first' and wavefront.current_plane_index == 1:  # set entrance plane to 1.
+            wavefront.normalize()
+            _log.debug("normalizing at first plane (entrance pupil) to 1.0 total intensity")
+        elif normalize.lower() == 'first=2' and wavefront.current_plane_index == 1:
+            # this undocumented option is present only for testing/validation purposes
+            wavefront.normalize()
+            wavefront *= np.sqrt(2)
+        elif normalize.lower() == 'exit_pupil':  # normalize the last pupil in the system to 1
+            last_pupil_plane_index = np.where(np.asarray(
+                [p.planetype is PlaneType.pupil for p in self.planes]))[0].max() + 1
+            if wavefront.current_plane_index == last_pupil_plane_index:
+                wavefront.normalize()
+                _log.debug("normalizing at exit pupil (plane {0}) to 1.0 total intensity".format(
+                    wavefront.current_plane_index))
+        elif normalize.lower() == 'last' and wavefront.current_plane_index == len(self.planes):
+            wavefront.normalize()
+            _log.debug("normalizing at last plane to 1.0 total intensity")
+
     def _propagation_info(self):
         """ Provide some summary information on the optical propagation calculations that
         would be done for a given optical system
@@ -82,3 +82,21 @@ def test_exp():
 def test_benchmark_fft():
     # minimalist case for speed, but at least it tests the function:
     accel_math.benchmark_fft(npix=512, iterations=2)
+
+
+def test_fft_2d_and_mft_on_stacks():
+    """ Test that transforming a 3D stack of arrays at once gives the same
+    results as transforming each plane of the stack individually."""
+    stack = np.random.random((3, 32, 32)) + 1j * np.random.random((3, 32, 32))
+
+    for forward in [True, False]:
+        batched = accel_math.fft_2d(stack.copy(), forward=forward)
+        for i in range(stack.shape[0]):
+            single = accel_math.fft_2d(stack[i].copy(), forward=forward)
+            np.testing.assert_allclose(batched[i], single)
+
+    mft = matrixDFT.MatrixFourierTransform()
+    batched = mft.perform(stack, 10, 24)
+    assert batched.shape == (3, 24, 24)
+    for i in range(stack.shape[0]):
+        np.testing.assert_allclose(batched[i], mft.perform(stack[i], 10, 24))
@@ -179,6 +179,45 @@ def test_multiwavelength_opticalsystem():
     return psf
 
 
+def test_batched_propagation():
+    """ Test that propagating several wavelengths together as a batch
+    gives the same results as propagating them one at a time, for a system
+    which uses FFTs to and from an intermediate image plane, and an MFT to the detector.
+    """
+    osys = poppy_core.OpticalSystem("test", oversample=2, npix=64)
+    osys.add_pupil(optics.CircularAperture(radius=1))
+    osys.add_pupil(optics.ThinLens(nwaves=0.5, radius=1))
+    osys.add_image(optics.CircularOcculter(radius=0.1))
+    osys.add_pupil(optics.CircularAperture(radius=0.9))
+    osys.add_detector(pixelscale=0.05, fov_arcsec=2)
+
+    wavelengths = np.linspace(1.0e-6, 1.5e-6, 4) * u.m
+    weights = [0.1, 0.3, 0.4, 0.2]
+
+    default_batched = poppy.conf.use_batched_propagation
+    try:
+        poppy.conf.use_batched_propagation = False
+        psf_serial, final_serial = osys.calc_psf(wavelength=wavelengths, weight=weights, return_final=True)
+        poppy.conf.use_batched_propagation = True
+        psf_batched, final_batched = osys.calc_psf(wavelength=wavelengths, weight=weights, return_final=True)
+    finally:
+        poppy.conf.use_batched_propagation = default_batched
+
+    assert np.allclose(psf_batched[0].data, psf_serial[0].data), \
+        "Batched multi-wavelength PSF does not match PSF computed one wavelength at a time"
+    assert np.allclose(final_batched[0].wavefront, final_serial[0].wavefront)
+
+    # Check intermediate planes match individually for each wavelength
+    results = osys.propagate_mono_batched(wavelengths, retain_intermediates=True)
+    assert len(results) == len(wavelengths)
+    for wavelength, (mono_psf, intermediates) in zip(wavelengths, results):
+        serial_psf, serial_intermediates = osys.propagate_mono(wavelength, retain_intermediates=True)
+        assert np.allclose(mono_psf[0].data, serial_psf[0].data)
+        for wf, serial_wf in zip(intermediates, serial_intermediates):
+            assert wf.planetype == serial_wf.planetype
+            assert np.allclose(wf.wavefront, serial_wf.wavefront)
+
+
 def test_normalization():
     """ Test that we can compute a PSF and get the desired flux,
     depending on the normalization """
@@ -108,3 +108,118 @@ def test_basic_hex_dm():
 
     return psf_aberrated, psf_perf, osys
 
+
+
+def test_cont_dm_gaussian_influence(npix=64):
+    """ Test that the separable Gaussian influence model matches the sum of
+    2D Gaussians centered on each actuator """
+    dm = dms.ContinuousDeformableMirror(dm_shape=(6, 6), actuator_spacing=1*u.cm, radius=3*u.cm,
+                                        inclination_x=20)
+    surface = np.random.RandomState(0).normal(size=(6, 6)) * 1e-8
+    dm.set_surface(surface)
+    w = poppy_core.Wavefront(npix=npix, diam=8*u.cm)
+    opd = dm.get_opd(w)
+
+    y, x = dm.get_coordinates(w)
+    y_act, x_act = dm.get_act_coordinates(one_d=True)
+    sigma = 0.01 / np.sqrt(-np.log(0.15))
+    expected = np.zeros(w.shape)
+    for yi, yc in enumerate(y_act):
+        for xi, xc in enumerate(x_act):
+            expected += surface[yi, xi] * np.exp(-((x - xc) ** 2 + (y - yc) ** 2) / sigma ** 2)
+    assert np.allclose(opd, expected, rtol=0, atol=1e-20), "Separable Gaussian DM surface is incorrect"
+
+
+def test_cont_dm_influence_cache(npix=64):
+    """ Test that actuator indices and rescaled influence functions are reused
+    for repeated calculations with the same sampling, and not otherwise """
+    yy, xx = np.indices((21, 21)) - 10.
+    influence = fits.HDUList([fits.PrimaryHDU(np.exp(-(xx**2 + yy**2) / 20.))])
+    influence[0].header['SAMPLING'] = 5
+    dm = dms.ContinuousDeformableMirror(dm_shape=(8, 8), actuator_spacing=1*u.mm, radius=4*u.mm,
+                                        influence_func=influence)
+    dm.set_actuator(3, 4, 1e-8)
+
+    dms._INFLUENCE_CACHE.clear()
+    w = poppy_core.Wavefront(npix=npix, diam=10*u.mm)
+    opd1 = dm.get_opd(w)
+    assert len(dms._INFLUENCE_CACHE) == 3
+    opd2 = dm.get_opd(w)
+    assert len(dms._INFLUENCE_CACHE) == 3, "Cached DM influence arrays were not reused"
+    assert np.array_equal(opd1, opd2)
+    assert opd1.max() > 0
+
+    dm.get_opd(poppy_core.Wavefront(npix=2*npix, diam=10*u.mm))
+    assert len(dms._INFLUENCE_CACHE) == 6, "Different sampling should not reuse cached DM arrays"
+
+
+def test_convolve_actuator_trace():
+    """ Test that the FFT influence convolution matches scipy.signal.fftconvolve,
+    with and without cropping to the actuator footprint """
+    import scipy.signal
+    trace = np.zeros((60, 50))
+    trace[10:30:3, 22:47:3] = np.random.RandomState(0).normal(size=(7, 9))
+    footprint = (slice(10, 29), slice(22, 47))
+    for kernel_shape in ((9, 9), (12, 7), (81, 64)):
+        kernel = np.random.RandomState(1).uniform(size=kernel_shape)
+        expected = scipy.signal.fftconvolve(trace, kernel, mode='same')
+        for fp in (None, footprint):
+            result = dms._convolve_actuator_trace(trace, kernel, ('test kernel', kernel_shape), footprint=fp)
+            assert result.shape == trace.shape
+            assert np.allclose(result, expected, rtol=0, atol=1e-12), "FFT convolution is incorrect"
+
+
+def test_cont_dm_influence_matrix(npix=64):
+    """ Test that the sparse influence matrix maps actuator commands to the DM OPD,
+    for both Gaussian and convolution influence functions """
+    yy, xx = np.indices((21, 21)) - 10.
+    influence = fits.HDUList([fits.PrimaryHDU(np.exp(-(xx**2 + yy**2) / 20.))])
+    influence[0].header['SAMPLING'] = 5
+
+    surface = np.random.RandomState(0).normal(size=(8, 8)) * 1e-8
+    w = poppy_core.Wavefront(npix=npix, diam=10*u.mm)
+    for influence_func in (None, influence):
+        dm = dms.ContinuousDeformableMirror(dm_shape=(8, 8), actuator_spacing=1*u.mm, radius=4*u.mm,
+                                            influence_func=influence_func, flip_x=True, shift_y=0.5e-3)
+        dm.set_surface(surface)
+        opd = dm.get_opd(w)
+
+        matrix = dm.get_influence_matrix(w, threshold=0)
+        assert matrix.shape == (npix**2, 64)
+        assert np.allclose((matrix @ dm.surface.ravel()).reshape(w.shape), opd, rtol=0, atol=1e-20)
+
+        sparse_matrix = dm.get_influence_matrix(w)
+        assert sparse_matrix.nnz < matrix.nnz
+        assert np.allclose(sparse_matrix @ dm.surface.ravel(), opd.ravel(), rtol=0, atol=1e-6*np.abs(surface).sum())
+
+
+def test_hex_dm_influence_matrix(npix=128):
+    """ Test that the sparse influence matrix maps segment piston, tip and tilt to the DM OPD """
+    dm = dms.HexSegmentedDeformableMirror(rings=1)
+    for segnum in dm.segmentlist:
+        dm.set_actuator(segnum, segnum*1e-8, 1e-7, -2e-7)
+    w = poppy_core.Wavefront(npix=npix, diam=3*u.m)
+    matrix = dm.get_influence_matrix(w)
+    assert matrix.shape == (npix**2, dm.surface.size)
+    assert np.allclose((matrix @ dm.surface.ravel()).reshape(w.shape), dm.get_opd(w), rtol=0, atol=1e-20)
+
+
+def test_hex_dm_opd(npix=128):
+    """ Test the hex DM OPD against piston, tip and tilt evaluated segment by segment,
+    including after changing the surface with the output array reused """
+    dm = dms.HexSegmentedDeformableMirror(rings=2, center=False)
+    w = poppy_core.Wavefront(npix=npix, diam=5*u.m)
+    y, x = w.coordinates()
+    rs = np.random.RandomState(0)
+    for trial in range(2):
+        for segnum in dm.segmentlist:
+            dm.set_actuator(segnum, rs.normal()*1e-7, rs.normal()*1e-6, rs.normal()*1e-6)
+        opd = dm.get_opd(w)
+
+        expected = np.zeros(w.shape)
+        for segnum in dm.segmentlist:
+            wseg = dm._seg_mask == segnum + 1
+            ceny, cenx = dm._hex_center(segnum)
+            piston, tip, tilt = dm.surface[segnum]
+            expected[wseg] = piston + tip * (x[wseg] - cenx) + tilt * (y[wseg] - ceny)
+        assert np.allclose(opd, expected, rtol=0, atol=1e-20), "Hex DM OPD is incorrect"
@@ -232,6 +232,150 @@ def test_pyfftw_vs_numpyfft(verbose=False):
     conf.use_fftw, conf.use_cuda, conf.use_opencl = defaults
 
 
+@pytest.mark.skipif(accel_math._FFTW_AVAILABLE is False, reason="FFTW not available")
+def test_fftw_plan_cache():
+    """ Test the cached FFTW plans give the same results as numpy, transform
+    suitably aligned arrays in place, and are limited in number as configured."""
+    import pyfftw
+
+    defaults = accel_math._USE_FFTW, accel_math._USE_CUDA, accel_math._USE_OPENCL, conf.fftw_plan_cache_size
+    accel_math._USE_FFTW, accel_math._USE_CUDA, accel_math._USE_OPENCL = True, False, False
+    conf.fftw_plan_cache_size = 2
+
+    try:
+        accel_math.clear_fftw_plan_cache()
+        for npix in [32, 64, 128]:
+            wf = pyfftw.empty_aligned((npix, npix), dtype=np.complex128)
+            wf[:] = np.random.random((npix, npix)) + 1j * np.random.random((npix, npix))
+            expected = np.fft.fftshift(np.fft.fft2(wf)) / npix
+            result = accel_math.fft_2d(wf, forward=True)
+            assert np.allclose(result, expected)
+
+            # inverse transform, in place without any shifts
+            expected = np.fft.ifft2(result) * npix
+            result_inverse = accel_math.fft_2d(result, forward=False, fftshift=False)
+            assert result_inverse is result, "FFTW transform of an aligned array was not done in place"
+            assert np.allclose(result_inverse, expected)
+
+            # misaligned arrays are handled by copying into an aligned buffer
+            raw = np.zeros(npix * npix * 16 + 16, dtype=np.uint8)
+            offset = (8 - raw.ctypes.data) % 16
+            misaligned = raw[offset:offset + npix * npix * 16].view(np.complex128).reshape(npix, npix)
+            misaligned[:] = wf
+            assert np.allclose(accel_math.fft_2d(misaligned, forward=True), np.fft.fftshift(np.fft.fft2(wf)) / npix)
+
+        assert len(accel_math._FFTW_PLANS) <= 2, "FFTW plan cache exceeded configured size"
+
+        # plans are shared between threads: repeatedly transforming in new threads needs at most
+        # one plan per concurrent thread, not new plans for each thread
+        import concurrent.futures
+        nthreads = 4
+        plans_created = []
+
+        class CountingPlan(accel_math._FFTWPlan):
+            def __init__(self, *args):
+                plans_created.append(self)
+                super().__init__(*args)
+
+        original_plan_class, accel_math._FFTWPlan = accel_math._FFTWPlan, CountingPlan
+        try:
+            for trial in range(2):
+                with concurrent.futures.ThreadPoolExecutor(max_workers=nthreads) as executor:
+                    results = list(executor.map(lambda i: accel_math.fft_2d(wf.copy(), forward=True),
+                                                range(4 * nthreads)))
+                for result in results:
+                    assert np.allclose(result, np.fft.fftshift(np.fft.fft2(wf)) / wf.shape[0])
+        finally:
+            accel_math._FFTWPlan = original_plan_class
+        assert len(plans_created) <= nthreads, "FFTW plans were not reused by later threads"
+    finally:
+        accel_math._USE_FFTW, accel_math._USE_CUDA, accel_math._USE_OPENCL, conf.fftw_plan_cache_size = defaults
+        accel_math.clear_fftw_plan_cache()
+
+
+def test_fft_shift_free():
+    """ Test that the in-place checkerboard sign flip used in place of fftshifts for even
+    array sizes gives the same results as explicitly shifting, for both directions and
+    for odd and even array sizes."""
+    for shape in [(8, 8), (6, 10), (3, 6, 6), (7, 7)]:
+        wf = np.random.random(shape) + 1j * np.random.random(shape)
+
+        expected = np.fft.fftshift(np.fft.fft2(wf), axes=(-2, -1)) / shape[-2]
+        assert np.allclose(accel_math.fft_2d(wf.copy(), forward=True), expected)
+
+        expected_inverse = np.fft.ifft2(np.fft.ifftshift(wf, axes=(-2, -1))) * shape[-2]
+        assert np.allclose(accel_math.fft_2d(wf.copy(), forward=False), expected_inverse)
+
+
+def test_fft_real_input_unmodified():
+    """ Test that real input arrays are transformed correctly and not modified, with each
+    available CPU FFT backend """
+    backends = [(False, False)]
+    if accel_math._SCIPY_FFT_AVAILABLE:
+        backends.append((False, True))
+    if accel_math._FFTW_AVAILABLE:
+        backends.append((True, False))
+
+    defaults = (accel_math._USE_FFTW, accel_math._USE_SCIPY_FFT,
+                accel_math._USE_CUDA, accel_math._USE_OPENCL)
+    try:
+        accel_math._USE_CUDA, accel_math._USE_OPENCL = False, False
+        for accel_math._USE_FFTW, accel_math._USE_SCIPY_FFT in backends:
+            wf = np.random.random((8, 8))
+            original = wf.copy()
+            expected = np.fft.fftshift(np.fft.fft2(wf)) / 8
+            assert np.allclose(accel_math.fft_2d(wf, forward=True), expected)
+            assert np.array_equal(wf, original), "fft_2d modified its real input array"
+    finally:
+        (accel_math._USE_FFTW, accel_math._USE_SCIPY_FFT,
+         accel_math._USE_CUDA, accel_math._USE_OPENCL) = defaults
+
+
+@pytest.mark.skipif(accel_math._SCIPY_FFT_AVAILABLE is False, reason="scipy.fft not available")
+def test_scipy_fft():
+    """ Test the scipy.fft backend gives the same results as numpy, including
+    for stacks of arrays, and preserves single precision arrays."""
+
+    defaults = (accel_math._USE_FFTW, accel_math._USE_SCIPY_FFT,
+                accel_math._USE_CUDA, accel_math._USE_OPENCL)
+    accel_math._USE_FFTW, accel_math._USE_SCIPY_FFT = False, True
+    accel_math._USE_CUDA, accel_math._USE_OPENCL = False, False
+
+    try:
+        npix = 64
+        wf = np.random.random((3, npix, npix)) + 1j * np.random.random((3, npix, npix))
+
+        expected = np.fft.fftshift(np.fft.fft2(wf), axes=(-2, -1)) / npix
+        result = accel_math.fft_2d(wf.copy(), forward=True)
+        assert np.allclose(result, expected)
+
+        expected_inverse = np.fft.ifft2(np.fft.ifftshift(result, axes=(-2, -1))) * npix
+        assert np.allclose(accel_math.fft_2d(result.copy(), forward=False), expected_inverse)
+
+        result_single = accel_math.fft_2d(wf[0].astype(np.complex64), forward=True)
+        assert result_single.dtype == np.complex64, "scipy.fft did not preserve single precision"
+        assert np.allclose(result_single, expected[0], rtol=1e-4, atol=1e-4)
+
+        # the FFTTYPE header records the backend actually used
+        osys = poppy_core.OpticalSystem(oversample=2)
+        osys.add_pupil(optics.CircularAperture())
+        osys.add_image()
+        osys.add_pupil()
+        osys.add_detector(pixelscale=0.1, fov_pixels=16)
+        conf_defaults = conf.use_fftw, conf.use_scipy_fft
+        try:
+            conf.use_fftw = False
+            for use_scipy_fft, ffttype in ((True, 'scipy.fft'), (False, 'numpy.fft')):
+                conf.use_scipy_fft = use_scipy_fft
+                assert osys.calc_psf()[0].header['FFTTYPE'] == ffttype
+        finally:
+            conf.use_fftw, conf.use_scipy_fft = conf_defaults
+    finally:
+        accel_math.update_math_settings()
+        (accel_math._USE_FFTW, accel_math._USE_SCIPY_FFT,
+         accel_math._USE_CUDA, accel_math._USE_OPENCL) = defaults
+
+
 @pytest.mark.skipif(accel_math._CUDA_AVAILABLE is False, reason="CUDA not available")
 def test_cuda_vs_numpyfft(verbose=False):
     """ Create an optical system with 2 parity test apertures,
@@ -93,3 +93,28 @@ def test_filled_aa_circle(plot=True):
 
     res_2 = geometry.filled_circle_aa( (100,100), 50, 50, 40, 1)
     assert np.max(np.abs(res_1,res_2) < 1e-5)
+
+
+def test_filled_polygon_aa():
+    """ Test exact antialiased polygons against known areas and pixel values """
+    # axis-aligned rectangle; corner pixels are covered by the product of overlaps
+    res = geometry.filled_polygon_aa((6, 6), [1.2, 3.7, 3.7, 1.2], [1.3, 1.3, 2.9, 2.9])
+    assert np.isclose(res.sum(), 2.5 * 1.6)
+    assert np.isclose(res[1, 1], 0.3 * 0.2)
+    assert np.isclose(res[2, 2], 1.0)
+
+    # vertex order does not matter, and nor does the pixel scale
+    y, x = np.indices((40, 50))
+    tri_x, tri_y = np.asarray([3.3, 40.1, 12.7]), np.asarray([2.2, 9.9, 35.5])
+    area = 0.5 * abs((tri_x[1] - tri_x[0]) * (tri_y[2] - tri_y[0]) - (tri_x[2] - tri_x[0]) * (tri_y[1] - tri_y[0]))
+    res = geometry.filled_polygon_aa((40, 50), tri_x, tri_y)
+    assert np.isclose(res.sum(), area)
+    assert np.allclose(geometry.filled_polygon_aa((40, 50), tri_x[::-1], tri_y[::-1]), res)
+    assert np.allclose(geometry.filled_polygon_aa((40, 50), tri_x * 0.01, tri_y * 0.02,
+                                                  xarray=x * 0.01, yarray=y * 0.02), res)
+    assert res.min() >= 0 and res.max() <= 1
+
+    # several non-overlapping polygons, including a non-convex one
+    res = geometry.filled_polygon_aa((10, 10), [[0.6, 2.6, 2.6, 1.6, 1.6, 0.6], [5, 8, 8]],
+                                     [[0.5, 0.5, 1.5, 1.5, 3.5, 3.5], [5, 5, 8.5]])
+    assert np.isclose(res.sum(), 4 + 0.5 * 3 * 3.5)
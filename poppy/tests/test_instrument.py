@@ -11,7 +11,7 @@ except ImportError:
     pysynphot = None
     _HAS_PYSYNPHOT = False
 
-from poppy import poppy_core, instrument, optics, utils
+from poppy import poppy_core, instrument, optics, utils, conf
 
 WEIGHTS_DICT = {'wavelengths': [2.0e-6, 2.1e-6, 2.2e-6], 'weights': [0.3, 0.5, 0.2]}
 WAVELENGTHS_ARRAY = np.array(WEIGHTS_DICT['wavelengths'])
@@ -184,3 +184,26 @@ def test_instrument_calc_datacube():
         "Multi-wavelength PSF does not match weighted sum of individual wavelength PSFs"
 
     return psf
+
+
+def test_instrument_calc_datacube_threads():
+    """ Tests that computing a datacube in parallel threads matches the serial calculation"""
+
+    inst = instrument.Instrument()
+    defaults = conf.use_multiprocessing, conf.parallel_backend
+    try:
+        conf.use_multiprocessing = False
+        cube_serial = inst.calc_datacube(WAVELENGTHS_ARRAY, fov_pixels=FOV_PIXELS,
+                                         detector_oversample=2, fft_oversample=2)
+        conf.use_multiprocessing = True
+        conf.parallel_backend = 'threads'
+        cube_threads = inst.calc_datacube(WAVELENGTHS_ARRAY, fov_pixels=FOV_PIXELS,
+                                          detector_oversample=2, fft_oversample=2)
+    finally:
+        conf.use_multiprocessing, conf.parallel_backend = defaults
+
+    assert cube_threads[0].data.shape == cube_serial[0].data.shape
+    assert np.allclose(cube_threads[0].data, cube_serial[0].data), \
+        "Datacube computed in threads does not match datacube computed serially"
+    for i, wavelength in enumerate(WAVELENGTHS_ARRAY):
+        assert cube_threads[0].header['WAVELN{:02d}'.format(i)] == wavelength
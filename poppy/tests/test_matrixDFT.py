@@ -4,6 +4,7 @@
 #
 
 import numpy as np
+import pytest
 import matplotlib
 import matplotlib.pyplot as plt
 import astropy.io.fits as fits
@@ -684,3 +685,84 @@ def test_MFT_FFT_equivalence_in_OpticalSystem(display=False):
 
     assert( np.all(  np.abs(mftpsf[0].data-fftpsf[0].data) < 1e-10 ))
 
+
+
+def test_DFT_matrix_cache():
+    """ Test that cached DFT factor matrices are reused for transforms with the same
+    geometry, give the same results as computing them afresh, and that the cache
+    stays within its configured memory limit.
+    """
+    from .. import conf
+
+    defaults = conf.matrix_dft_cache_size
+    try:
+        matrixDFT.clear_dft_matrix_cache()
+        pupil = makedisk(s=(64, 64), c=(32, 32), r=20).astype(complex)
+        mft = matrixDFT.MatrixFourierTransform(centering='ADJUSTABLE')
+
+        first = mft.perform(pupil, 10, 100, offset=(0.3, -0.2))
+        assert len(matrixDFT._DFT_MATRICES) == 1
+        second = mft.perform(pupil, 10, 100, offset=(0.3, -0.2))
+        assert len(matrixDFT._DFT_MATRICES) == 1, "Cached DFT matrices were not reused"
+        assert np.array_equal(first, second)
+
+        # Different geometry or direction needs different matrices
+        mft.perform(pupil, 10, 100)
+        mft.inverse(first, 10, 64, offset=(0.3, -0.2))
+        assert len(matrixDFT._DFT_MATRICES) == 3
+
+        # Each set of matrices here is 2*256*400*16 bytes = 3.3 MB, so only one fits in 4 MB
+        matrixDFT.clear_dft_matrix_cache()
+        conf.matrix_dft_cache_size = 4
+        pupil = makedisk(s=(256, 256), c=(128, 128), r=100).astype(complex)
+        for nlamD in [8, 9, 10]:
+            result = mft.perform(pupil, nlamD, 400)
+        assert len(matrixDFT._DFT_MATRICES) == 1
+        matrixDFT.clear_dft_matrix_cache()
+        assert np.allclose(mft.perform(pupil, 10, 400), result)
+    finally:
+        conf.matrix_dft_cache_size = defaults
+        matrixDFT.clear_dft_matrix_cache()
+
+
+def test_MFT_stack_per_plane_nlamD():
+    """ Test that a stack of planes can be transformed together with a different
+    nlamD for each plane, giving the same results as transforming each in turn.
+    """
+    pupils = np.stack([makedisk(s=(64, 64), c=(32, 32), r=r) for r in [28, 30, 32]]).astype(complex)
+    nlamDs = [8.0, 9.5, 11.0]
+
+    for centering in ['ADJUSTABLE', 'SYMMETRIC', 'FFTSTYLE']:
+        mft = matrixDFT.MatrixFourierTransform(centering=centering)
+        stacked = mft.perform(pupils, nlamDs, 100, per_plane=True)
+        assert stacked.shape == (3, 100, 100)
+        for pupil, nlamD, result in zip(pupils, nlamDs, stacked):
+            assert np.allclose(result, mft.perform(pupil, nlamD, 100))
+
+    # Rectangular sampling, with a different (nlamDY, nlamDX) per plane, and the inverse
+    mft = matrixDFT.MatrixFourierTransform(centering='ADJUSTABLE')
+    nlamDs_rect = [(nlamD, 1.5 * nlamD) for nlamD in nlamDs]
+    stacked = mft.perform(pupils, nlamDs_rect, (80, 120), offset=(0.5, -0.25), per_plane=True)
+    inverse = mft.inverse(stacked, nlamDs_rect, 64, per_plane=True)
+    for i in range(3):
+        assert np.allclose(stacked[i], mft.perform(pupils[i], nlamDs_rect[i], (80, 120), offset=(0.5, -0.25)))
+        assert np.allclose(inverse[i], mft.inverse(stacked[i], nlamDs_rect[i], 64))
+
+
+def test_MFT_stack_of_two_planes():
+    """ Test that for a stack of two planes, a 2-tuple nlamD is interpreted as
+    (nlamDY, nlamDX) for every plane, unless per_plane is set.
+    """
+    pupils = np.stack([makedisk(s=(64, 64), c=(32, 32), r=r) for r in [28, 32]]).astype(complex)
+    mft = matrixDFT.MatrixFourierTransform(centering='ADJUSTABLE')
+
+    stacked = mft.perform(pupils, (8.0, 12.0), 40)
+    for i in range(2):
+        assert np.allclose(stacked[i], mft.perform(pupils[i], (8.0, 12.0), 40))
+
+    stacked = mft.perform(pupils, (8.0, 12.0), 40, per_plane=True)
+    for i, nlamD in enumerate([8.0, 12.0]):
+        assert np.allclose(stacked[i], mft.perform(pupils[i], nlamD, 40))
+
+    with pytest.raises(ValueError):
+        mft.perform(pupils, (8.0, 10.0, 12.0), 40, per_plane=True)
@@ -9,6 +9,7 @@ import numpy as np
 import astropy
 import astropy.io.fits as fits
 import sys
+import multiprocessing
 from distutils.version import LooseVersion
 from astropy.tests.helper import remote_data
 
@@ -88,6 +89,151 @@ if _HAVE_PYTEST:
         return psf_single, psf_multi
 
 
+    @pytest.mark.skipif( (sys.version_info < (3,4,0) ),
+            reason="Python 3.4 required for reliable forkserver start method")
+    def test_persistent_pool():
+        """ Test that the persistent worker pool gives the same results as a single process,
+        including after an optic in the system has been changed between calculations."""
+        osys = poppy_core.OpticalSystem("test")
+        osys.add_pupil(optics.CircularAperture(radius=1))
+        osys.add_pupil(optics.ThinLens(nwaves=0.5, radius=1))
+        osys.add_detector(pixelscale=0.1, fov_arcsec=2.0)
+
+        source={'wavelengths': [1.0e-6, 1.1e-6, 1.2e-6, 1.3e-6], 'weights':[0.25, 0.25, 0.25, 0.25]}
+        defaults = conf.use_fftw, conf.use_multiprocessing, conf.use_persistent_pool
+        conf.use_fftw=False
+        conf.use_persistent_pool=True
+
+        try:
+            for nwaves in [0.5, 1.0]:
+                osys.planes[1] = optics.ThinLens(nwaves=nwaves, radius=1, planetype=poppy_core.PlaneType.pupil)
+
+                conf.use_multiprocessing=False
+                psf_single = osys.calc_psf(source=source)
+
+                conf.use_multiprocessing=True
+                psf_multi = osys.calc_psf(source=source)
+
+                assert np.allclose(psf_single[0].data, psf_multi[0].data), \
+                    "PSF from persistent worker pool does not match PSF from single process"
+            assert poppy_core._worker_pool is not None
+        finally:
+            poppy_core.shutdown_worker_pool()
+            conf.use_fftw, conf.use_multiprocessing, conf.use_persistent_pool = defaults
+
+        assert poppy_core._worker_pool is None
+
+
+    @pytest.mark.skipif( (sys.version_info < (3,8,0) ),
+            reason="Python 3.8 required for multiprocessing.shared_memory")
+    def test_shared_memory_accumulation():
+        """ Test that summing the PSFs from each process in shared memory gives the same
+        results as a single process calculation, for both regular and persistent worker pools."""
+        osys = poppy_core.OpticalSystem("test")
+        osys.add_pupil(optics.CircularAperture(radius=1))
+        osys.add_pupil(optics.ThinLens(nwaves=0.5, radius=1))
+        osys.add_detector(pixelscale=0.1, fov_arcsec=2.0, oversample=3)
+
+        source={'wavelengths': [1.0e-6, 1.1e-6, 1.2e-6, 1.3e-6], 'weights':[0.1, 0.2, 0.3, 0.4]}
+        defaults = (conf.use_fftw, conf.use_multiprocessing, conf.use_persistent_pool,
+                    conf.use_shared_memory_accumulation)
+        conf.use_fftw=False
+
+        try:
+            conf.use_multiprocessing=False
+            psf_single, planes_single = osys.calc_psf(source=source, return_intermediates=True)
+
+            conf.use_multiprocessing=True
+            conf.use_shared_memory_accumulation=True
+            for persistent in [False, True]:
+                conf.use_persistent_pool=persistent
+                psf_multi, planes_multi = osys.calc_psf(source=source, return_intermediates=True)
+
+                assert psf_multi[0].data.shape == psf_single[0].data.shape
+                assert np.allclose(psf_single[0].data, psf_multi[0].data), \
+                    "PSF summed in shared memory does not match PSF from single process"
+                for i in range(len(planes_single)):
+                    assert np.allclose(planes_single[i].intensity, planes_multi[i].intensity)
+        finally:
+            poppy_core.shutdown_worker_pool()
+            (conf.use_fftw, conf.use_multiprocessing, conf.use_persistent_pool,
+             conf.use_shared_memory_accumulation) = defaults
+
+
+def test_threads_backend():
+    """ Test that running wavelengths in parallel threads gives the same
+    results as a single thread, including when using FFTW"""
+    osys = poppy_core.OpticalSystem("test")
+    osys.add_pupil(optics.CircularAperture(radius=1))
+    osys.add_pupil(optics.ThinLens(nwaves=0.5, radius=1))
+    osys.add_image(optics.CircularOcculter(radius=0.1))
+    osys.add_pupil(optics.CircularAperture(radius=0.9))
+    osys.add_detector(pixelscale=0.1, fov_arcsec=2.0)
+
+    source={'wavelengths': [1.0e-6, 1.1e-6, 1.2e-6, 1.3e-6], 'weights':[0.1, 0.2, 0.3, 0.4]}
+    defaults = conf.use_multiprocessing, conf.parallel_backend, conf.n_processes, conf.use_fftw
+
+    for use_fftw in [True, False]:
+        try:
+            conf.use_fftw = use_fftw
+            conf.use_multiprocessing=False
+            psf_single, final_single = osys.calc_psf(source=source, return_final=True)
+
+            conf.use_multiprocessing=True
+            conf.parallel_backend='threads'
+            conf.n_processes=4
+            psf_threads, final_threads = osys.calc_psf(source=source, return_final=True)
+        finally:
+            conf.use_multiprocessing, conf.parallel_backend, conf.n_processes, conf.use_fftw = defaults
+
+        assert np.allclose(psf_single[0].data, psf_threads[0].data), \
+            "PSF from threads does not match PSF from single thread, with use_fftw={}".format(use_fftw)
+        assert np.allclose(final_single[0].wavefront, final_threads[0].wavefront)
+
+
+def test_threads_backend_reuses_fftw_plans():
+    """ Test that repeated calculations with the threads backend reuse the same
+    threads and FFTW plans, rather than planning anew for each calculation, and
+    that each thread's FFTs use only its share of the CPUs"""
+    from .. import accel_math
+    if not accel_math._FFTW_AVAILABLE:
+        pytest.skip("FFTW is not available")
+    osys = poppy_core.OpticalSystem("test", oversample=2)
+    osys.add_pupil(optics.CircularAperture(radius=1))
+    osys.add_image()
+    osys.add_pupil(optics.CircularAperture(radius=0.9))
+    osys.add_detector(pixelscale=0.1, fov_arcsec=2.0)
+
+    source = {'wavelengths': [1.0e-6, 1.1e-6, 1.2e-6, 1.3e-6], 'weights': [0.25]*4}
+    defaults = (conf.use_multiprocessing, conf.parallel_backend, conf.n_processes,
+                conf.use_fftw, accel_math._FFTWPlan)
+    plans_created = []
+
+    class CountingPlan(accel_math._FFTWPlan):
+        def __init__(self, shape, dtype, forward, threads):
+            plans_created.append(threads)
+            super().__init__(shape, dtype, forward, threads)
+
+    try:
+        conf.use_multiprocessing, conf.parallel_backend, conf.n_processes = True, 'threads', 4
+        conf.use_fftw, accel_math._FFTWPlan = True, CountingPlan
+        accel_math.clear_fftw_plan_cache()
+
+        psf1 = osys.calc_psf(source=source)
+        psf2 = osys.calc_psf(source=source)
+        # This does one forward and one inverse FFT per wavelength, so needs at most
+        # one plan for each direction for each thread, over both calculations
+        assert 0 < len(plans_created) <= 2 * conf.n_processes, \
+            "FFTW plans were not reused by the second calculation"
+        assert set(plans_created) == {max(1, multiprocessing.cpu_count() // conf.n_processes)}, \
+            "FFTW plans in parallel threads should share the CPUs between them"
+    finally:
+        (conf.use_multiprocessing, conf.parallel_backend, conf.n_processes,
+         conf.use_fftw, accel_math._FFTWPlan) = defaults
+        accel_math.clear_fftw_plan_cache()
+    assert np.allclose(psf1[0].data, psf2[0].data)
+
+
 def test_estimate_nprocesses():
     """ Apply some basic functionality tests to the
     estimate nprocesses function.
@@ -2,6 +2,7 @@
 
 import matplotlib.pyplot as pl
 import numpy as np
+import pytest
 import astropy.io.fits as fits
 import astropy.units as u
 
@@ -343,6 +344,83 @@ def test_MultiHexagonAperture(display=False):
     if display: optic.display()
 
 
+def test_MultiHexagonAperture_segment_ids():
+    """ Test the segment map of a multi-hexagon aperture matches drawing
+    each hexagon in turn, including for partial and rotated apertures """
+    for kwargs in [dict(rings=2), dict(rings=3, center=True, gap=0),
+                   dict(rings=2, segmentlist=[1, 3, 5, 7, 12]), dict(rings=2, rotation=17, shift_x=0.1)]:
+        optic = optics.MultiHexagonAperture(side=1, **kwargs)
+        wave = poppy_core.Wavefront(npix=200, diam=10.0, wavelength=1e-6)
+
+        optic.transmission = np.zeros(wave.shape)
+        for i in optic.segmentlist:
+            optic._one_hexagon(wave, i, value=i + 1)
+        expected = optic.transmission
+
+        assert np.all(optic._segment_ids(wave) == expected), "Segment map mismatch for {}".format(kwargs)
+        assert np.all(optic.get_transmission(wave) == (expected != 0))
+
+
+def test_coordinates_window():
+    """ Test that optics evaluated over a window of the wavefront include every
+    pixel within the requested radius, for shifted, rotated and inclined optics """
+    wave = poppy_core.Wavefront(npix=256, diam=4.0, wavelength=1e-6)
+    for kwargs in [dict(), dict(shift_x=0.5, shift_y=-0.3), dict(rotation=30, inclination_x=45, shift_y=1.5)]:
+        optic = optics.HexagonAperture(side=0.4, **kwargs)
+        window, y, x = optic._get_coordinates_window(wave, 0.4)
+        full_y, full_x = optic.get_coordinates(wave)
+        assert y.shape[0] < wave.shape[0] and x.shape[1] < wave.shape[1]
+        assert np.array_equal(y, full_y[window]) and np.array_equal(x, full_x[window])
+
+        inside = np.hypot(full_x, full_y) <= 0.4
+        inside[window] = False
+        assert not inside.any(), "Pixels within the radius fell outside the window"
+
+        transmission = optic.get_transmission(wave)
+        assert transmission.sum() > 0
+        transmission[window] = 0
+        assert not transmission.any()
+
+
+def test_gray_pixel_apertures():
+    """ Test that gray pixel apertures have exactly the area of the aperture,
+    including when rotated, shifted, or inclined """
+    wave = poppy_core.Wavefront(npix=64, diam=2.0, wavelength=1e-6)
+    pixel_area = wave.pixelscale.to(u.m / u.pixel).value ** 2
+    side = 0.6
+    hexagon_area = 3 * np.sqrt(3) / 2 * side ** 2
+    cases = [(optics.HexagonAperture(side=side, gray_pixel=True), hexagon_area),
+             (optics.HexagonAperture(side=side, gray_pixel=True, rotation=17, shift_x=0.1), hexagon_area),
+             (optics.RectangleAperture(width=0.8, height=0.3, rotation=30, gray_pixel=True), 0.24),
+             (optics.NgonAperture(nsides=5, radius=0.5, gray_pixel=True), 5 / 2 * 0.25 * np.sin(2 * np.pi / 5)),
+             (optics.CircularAperture(radius=0.7, shift_y=0.05), np.pi * 0.49),
+             (optics.CircularAperture(radius=0.7, inclination_x=40), np.pi * 0.49 * np.cos(np.deg2rad(40))),
+             (optics.MultiHexagonAperture(side=0.15, rings=1, center=True, gap=0.02, gray_pixel=True),
+              7 * 3 * np.sqrt(3) / 2 * 0.15 ** 2)]
+    for optic, area in cases:
+        trans = optic.get_transmission(wave)
+        assert trans.min() >= 0 and trans.max() <= 1
+        assert ((trans > 0) & (trans < 1)).any()
+        assert np.isclose(trans.sum() * pixel_area, area, rtol=1e-5), "Wrong area for {}".format(optic.name)
+
+    # secondary obscuration: obscured area is the circle plus the supports outside it
+    obscuration = optics.SecondaryObscuration(secondary_radius=0.3, n_supports=4, support_width=0.04,
+                                              support_angle_offset=10, gray_pixel=True)
+    obscured = (1 - obscuration.get_transmission(wave)).sum() * pixel_area
+    binary = (1 - optics.SecondaryObscuration(secondary_radius=0.3, n_supports=4, support_width=0.04,
+                                              support_angle_offset=10).get_transmission(wave)).sum() * pixel_area
+    assert obscured > np.pi * 0.09
+    assert np.isclose(obscured, binary, rtol=0.05)
+
+    # optics which do not compute gray pixels warn that the option is ignored
+    with pytest.warns(UserWarning, match='does not support gray pixels'):
+        asymmetric = optics.AsymmetricSecondaryObscuration(secondary_radius=0.3, support_width=0.04,
+                                                           gray_pixel=True)
+    assert np.all(asymmetric.get_transmission(wave) ==
+                  optics.AsymmetricSecondaryObscuration(secondary_radius=0.3,
+                                                        support_width=0.04).get_transmission(wave))
+
+
 def test_NgonAperture(display=False):
     """ Test n-gon aperture
 
@@ -665,3 +743,73 @@ def test_fixed_sampling_optic():
     array_optic= optics.fixed_sampling_optic(optic, wave, oversample=1)
 
     assert np.allclose(array_optic.amplitude, optic.get_transmission(wave)), 'mismatch between original and fixed sampling version'
+
+
+def test_phasor_cache():
+    """ Test that phasors of static analytic optics are cached and reused for
+    wavefronts with the same sampling, and recomputed when the optic changes."""
+    from .. import conf
+
+    defaults = conf.phasor_cache_size
+    try:
+        optics.clear_phasor_cache()
+        wave = poppy_core.Wavefront(npix=64, wavelength=wavelength, diam=2.5)
+        aperture = optics.CircularAperture(radius=1)
+
+        phasor = aperture.get_phasor(wave)
+        assert not phasor.flags.writeable, "Cached phasors should be read-only"
+        assert aperture.get_phasor(wave) is phasor, "Phasor was not reused from cache"
+        # an identical optic can reuse the same cached phasor
+        assert optics.CircularAperture(radius=1, name='another').get_phasor(wave) is phasor
+
+        # changing the optic or the wavefront sampling or wavelength requires a new phasor
+        aperture.radius = 0.5 * u.m
+        smaller = aperture.get_phasor(wave)
+        assert smaller is not phasor
+        assert smaller.sum() < phasor.sum()
+        other_wave = poppy_core.Wavefront(npix=64, wavelength=2 * wavelength, diam=2.5)
+        assert aperture.get_phasor(other_wave) is not smaller
+
+        # compound optics are cached if all their component optics can be
+        compound = optics.CompoundAnalyticOptic([optics.CircularAperture(radius=1),
+                                                 optics.ThinLens(nwaves=1, radius=1)])
+        assert compound.get_phasor(wave) is compound.get_phasor(wave)
+        assert np.allclose(compound.get_phasor(wave), compound._compute_phasor(wave))
+
+        # optics without caching enabled, or with caching disabled, are recomputed each time
+        fqpm_aligner = optics.FQPM_FFT_aligner()
+        assert fqpm_aligner._phasor_cache_key(wave) is None
+        # subclasses do not inherit phasor caching from a cached optic class
+        class VaryingAperture(optics.CircularAperture):
+            pass
+        assert VaryingAperture(radius=1)._phasor_cache_key(wave) is None
+        conf.phasor_cache_size = 0
+        assert aperture.get_phasor(wave) is not aperture.get_phasor(wave)
+    finally:
+        conf.phasor_cache_size = defaults
+        optics.clear_phasor_cache()
+
+
+def test_phasor_cache_shared_between_wavelengths():
+    """ Test that cached phasors at different wavelengths are formed from the same
+    transmission and OPD samples, and match the uncached phasors."""
+    try:
+        optics.clear_phasor_cache()
+        compound = optics.CompoundAnalyticOptic([optics.CircularAperture(radius=1),
+                                                 optics.ThinLens(nwaves=1, radius=1)])
+        waves = [poppy_core.Wavefront(npix=64, wavelength=wl, diam=2.5)
+                 for wl in (wavelength, 1.5 * wavelength)]
+
+        phasors = [compound.get_phasor(wave) for wave in waves]
+        kinds = [key[0] for key in optics._PHASOR_CACHE]
+        assert kinds.count('samples') == 1, "Transmission and OPD should be evaluated once for all wavelengths"
+        assert kinds.count('phasor') == 2
+
+        for wave, phasor in zip(waves, phasors):
+            expected = compound._compute_phasor(wave)
+            assert np.allclose(phasor, expected)
+            # opaque pixels are exactly zero
+            assert np.all(phasor[compound.get_transmission(wave) == 0] == 0)
+        assert not np.allclose(phasors[0], phasors[1])
+    finally:
+        optics.clear_phasor_cache()
@@ -244,3 +244,36 @@ def test_load_corrupt_fftw_wisdom(tmpdir):
             assert len(w) == 1
             assert issubclass(w[-1].category, utils.FFTWWisdomWarning)
     assert utils._loaded_fftw_wisdom is False
+
+
+def test_array_cache():
+    """ Test the memory accounting, eviction and statistics of ArrayCache """
+    megabyte = np.zeros(1024**2 // 8)
+    cache_a = utils.ArrayCache('test a', 'zernike_cache_size')
+    cache_b = utils.ArrayCache('test b')
+    try:
+        with poppy.conf.set_temp('zernike_cache_size', 2), poppy.conf.set_temp('total_cache_size', 3):
+            for i in range(3):
+                cache_a.put(i, megabyte.copy())
+            # limited by the cache's own conf item
+            assert len(cache_a) == 2 and 0 not in cache_a
+            assert cache_a.nbytes == 2 * megabyte.nbytes
+            assert not cache_a.get(1).flags.writeable, "Cached arrays should be read-only"
+            assert cache_a.get(0) is None
+
+            # limited by the global total, evicting the least recently used array of any cache
+            cache_b.put('x', (megabyte.copy(), 'not an array'))
+            cache_b.put('y', megabyte.copy())
+            assert 2 not in cache_a and 1 in cache_a
+            assert len(cache_b) == 2
+
+            value = cache_b.get_or_compute('z', lambda: megabyte.copy())
+            assert cache_b.get('z') is value
+
+            statistics = utils.cache_statistics()['test a']
+            assert statistics['hits'] == 1 and statistics['misses'] == 1
+            cache_b.clear()
+            assert len(cache_b) == 0 and cache_b.nbytes == 0
+    finally:
+        utils._ARRAY_CACHES.remove(cache_a)
+        utils._ARRAY_CACHES.remove(cache_b)
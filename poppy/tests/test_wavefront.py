@@ -37,6 +37,47 @@ def test_wavefront_coordinates():
     assert np.abs(wave.coordinates()[0][-13,-33] -2.5) < np.finfo(float).eps*5
 
 
+def test_wavefront_coordinates_cache():
+    """ Coordinate arrays are cached and shared between wavefronts with the same sampling,
+    and optics with shifts do not modify the cached arrays """
+    from .. import fresnel
+    poppy_core.clear_coordinate_cache()
+    wave = poppy_core.Wavefront(npix=64, diam=2.0, wavelength=wavelength)
+    y, x = wave.coordinates()
+    assert not y.flags.writeable and not x.flags.writeable
+    other_wave = poppy_core.Wavefront(npix=64, diam=2.0, wavelength=2 * wavelength)
+    assert other_wave.coordinates()[0] is y
+    assert poppy_core.Wavefront(npix=64, diam=4.0, wavelength=wavelength).coordinates()[0] is not y
+
+    r, theta = wave.polar_coordinates()
+    assert wave.polar_coordinates()[0] is r
+    assert np.allclose(r, np.sqrt(x ** 2 + y ** 2))
+    assert np.allclose(theta, np.arctan2(y, x))
+
+    expected_x = x.copy()
+    shifted = optics.CircularAperture(radius=0.5, shift_x=0.3)
+    assert np.allclose(shifted.get_coordinates(wave)[1], expected_x - 0.3)
+    assert np.allclose(shifted.get_polar_coordinates(wave)[0], np.sqrt((x - 0.3) ** 2 + y ** 2))
+    assert np.all(wave.coordinates()[1] == expected_x), "Cached coordinates were modified"
+
+    fresnel_wave = fresnel.FresnelWavefront(beam_radius=1 * u.m, npix=32, oversample=2)
+    fy, fx = fresnel_wave.coordinates()
+    assert fresnel_wave.coordinates()[1] is fx
+    assert fx[0, 32] == 0 and not fx.flags.writeable
+
+    # Wavefront classes that only implement the abstract methods are not cached
+    class PixelWavefront(poppy_core.BaseWavefront):
+        def propagate_to(self, optic):
+            pass
+
+        def coordinates(self):
+            return np.indices(self.shape, dtype=float)
+
+    pixel_wave = PixelWavefront(npix=16, wavelength=wavelength)
+    assert pixel_wave.polar_coordinates()[0] is not pixel_wave.polar_coordinates()[0]
+    assert pixel_wave.polar_coordinates()[0][3, 4] == 5
+
+
 def test_wavefront_str():
     # test __str__
     wave = poppy_core.Wavefront(npix=100, wavelength=1e-6)
@@ -24,6 +24,24 @@ def test_ones_zernikes(nterms=10):
         assert rs[0] == rs[1] == rs[2], "Radial polynomial is not radially symmetric"
 
 
+def test_radial_polynomials(nmax=40):
+    """Verify the recurrence for the radial polynomials against explicit expressions"""
+    rho = np.linspace(0, 1, 101)
+    explicit = {(4, 0): 6 * rho ** 4 - 6 * rho ** 2 + 1,
+                (5, 1): 10 * rho ** 5 - 12 * rho ** 3 + 3 * rho,
+                (6, 2): 15 * rho ** 6 - 20 * rho ** 4 + 6 * rho ** 2}
+
+    orders = []
+    for n, m, radial in zernike.radial_polynomials(nmax, rho):
+        orders.append((n, m))
+        assert np.allclose(radial, zernike.R(n, m, rho)), "Recurrence doesn't match R({}, {})".format(n, m)
+        # R[n, m](1) == 1 for all orders, even where the explicit series loses precision
+        assert np.isclose(radial[-1], 1.0), "R({}, {}) is not normalized at high order".format(n, m)
+        if (n, m) in explicit:
+            assert np.allclose(radial, explicit[(n, m)]), "Unexpected R({}, {})".format(n, m)
+    assert len(orders) == sum(n // 2 + 1 for n in range(nmax + 1))
+
+
 def test_cached_zernike1(nterms=10):
     radius = 1.1
 
@@ -350,3 +368,85 @@ def test_ptt_basis(verbose=False, plot=False,
     assert np.allclose(random_ptt[wz], results[wz], atol=1e-6)
 
     return random_ptt, results, ptted_opd, ptted_v2
+
+
+def test_masked_basis(npix=128, nterms=12):
+    """Verify compact bases match the dense basis cubes, and can be used
+    directly for OPD expansion and synthesis"""
+    dense = zernike.zernike_basis(nterms, npix=npix)
+    compact = zernike.zernike_basis(nterms, npix=npix, compact=True)
+    assert isinstance(compact, zernike.MaskedBasis)
+    assert compact.vectors.shape == (nterms, np.isfinite(dense[0]).sum())
+    assert np.array_equal(compact.to_cube(), dense, equal_nan=True)
+    assert np.array_equal(zernike.MaskedBasis.from_cube(dense).to_cube(), dense, equal_nan=True)
+
+    coeffs = np.arange(1, nterms + 1) * 1e-8
+    opd = zernike.opd_from_zernikes(coeffs, basis=compact, outside=0)
+    assert np.allclose(opd, zernike.opd_from_zernikes(coeffs, basis=zernike.zernike_basis,
+                                                      npix=npix, outside=0), rtol=0, atol=1e-20)
+    aperture = np.isfinite(dense[0])
+    assert np.allclose(zernike.opd_expand(opd, aperture=aperture, nterms=nterms, basis=compact),
+                       zernike.opd_expand(opd, aperture=aperture, nterms=nterms), rtol=0, atol=1e-20)
+    assert np.allclose(zernike.opd_expand_nonorthonormal(opd, aperture=aperture, nterms=nterms,
+                                                         basis=compact.astype(np.float32)),
+                       coeffs, rtol=1e-3)
+
+    # segment bases, whose terms are defined over different pixels
+    ptt_basis = zernike.Segment_PTT_Basis(rings=1)
+    compact = ptt_basis(npix=npix, compact=True)
+    assert np.array_equal(compact.to_cube(), ptt_basis(npix=npix), equal_nan=True)
+    coeffs = np.arange(len(compact)) * 1e-8
+    opd = zernike.opd_from_zernikes(coeffs, basis=compact, outside=0)
+    results = zernike.opd_expand_segments(opd, aperture=ptt_basis.aperture(npix=npix),
+                                          nterms=len(compact), basis=compact)
+    assert np.allclose(results, coeffs, rtol=0, atol=1e-12)
+
+
+def test_opd_expand_lstsq(npix=128, nterms=15):
+    """Verify least squares fitting of OPD stacks on an obscured aperture,
+    where the Zernikes are not orthonormal, and reuse of the cached factorization"""
+    zernike.clear_basis_cache()
+    aperture = optics.CompoundAnalyticOptic([optics.CircularAperture(radius=1),
+                                             optics.SecondaryObscuration(secondary_radius=0.3)]
+                                            ).sample(npix=npix, grid_size=2)
+    coeffs = np.random.RandomState(0).normal(size=(4, nterms)) * 1e-8
+    basis = zernike.zernike_basis(nterms, npix=npix, outside=0)
+    opds = np.einsum('fj,jyx->fyx', coeffs, basis)
+
+    results = zernike.opd_expand_lstsq(opds, aperture=aperture, nterms=nterms)
+    assert results.shape == coeffs.shape
+    assert np.allclose(results, coeffs, rtol=0, atol=1e-18)
+    assert len(zernike._BASIS_CACHE) == 1
+
+    single = zernike.opd_expand_lstsq(opds[1], aperture=aperture, nterms=nterms)
+    assert np.allclose(single, coeffs[1], rtol=0, atol=1e-18)
+    assert len(zernike._BASIS_CACHE) == 1, "Factorization was not reused"
+
+    # also works for segment bases with disjoint support
+    ptt_basis = zernike.Segment_Piston_Basis(rings=1)
+    coeffs = np.arange(1, 7) * 1e-8
+    opd = zernike.opd_from_zernikes(coeffs, basis=ptt_basis, npix=npix, outside=0)
+    results = zernike.opd_expand_lstsq(opd, aperture=ptt_basis.aperture(npix=npix), nterms=6,
+                                       basis=ptt_basis)
+    assert np.allclose(results, coeffs, rtol=0, atol=1e-18)
+
+    # a segment entirely outside the aperture is unconstrained, and gets a coefficient of zero
+    aperture = ptt_basis.aperture(npix=npix)
+    aperture[ptt_basis(nterms=6, npix=npix, outside=0)[2] != 0] = 0
+    results = zernike.opd_expand_lstsq(opd, aperture=aperture, nterms=6, basis=ptt_basis)
+    assert results[2] == 0
+    assert np.allclose(np.delete(results, 2), np.delete(coeffs, 2), rtol=0, atol=1e-18)
+
+
+def test_arbitrary_basis_orthonormal(nterms=60, npix=256):
+    """Verify orthonormality is preserved at higher orders, and that
+    the basis is cached per aperture"""
+    zernike.clear_basis_cache()
+    aperture = optics.SquareAperture(size=1.).sample(npix=npix, grid_size=1.1)
+    basis = zernike.arbitrary_basis(aperture, nterms=nterms, compact=True)
+    gram = basis.vectors.dot(basis.vectors.T) / basis.vectors.shape[1]
+    assert np.allclose(gram, np.eye(nterms), rtol=0, atol=1e-10), "Basis is not orthonormal"
+
+    again = zernike.arbitrary_basis(aperture, nterms=nterms, compact=True)
+    assert again.vectors is basis.vectors, "Basis was not cached"
+    assert np.array_equal(zernike.arbitrary_basis(aperture, nterms=nterms), basis.to_cube(), equal_nan=True)
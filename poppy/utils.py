@@ -4,10 +4,13 @@
 # These provide various utilities to measure the PSF's properties in certain ways, display it on screen etc.
 #
 
+import collections
+import itertools
 import json
 import logging
 import os.path
 import pickle
+import threading
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -1605,6 +1608,155 @@ def specFromSpectralType(sptype, return_list=False, catalog=None):
             raise LookupError(errmsg)
 
 
+# ##################################################################
+#
+#     Memory-bounded caches of arrays
+
+# All ArrayCache instances, which share the conf.total_cache_size memory budget
+_ARRAY_CACHES = []
+_ARRAY_CACHES_LOCK = threading.RLock()
+_array_cache_clock = itertools.count()
+
+
+def _cache_value_nbytes(value):
+    """ Memory used by a cached value, which is an array or a tuple containing arrays """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return sum(item.nbytes for item in value if isinstance(item, np.ndarray))
+
+
+class ArrayCache(object):
+    """ Thread-safe least-recently-used cache of arrays, bounded by memory use
+
+    Each cached value is an array or a tuple of arrays and other items,
+    and only the arrays count towards the memory used. Cached arrays are
+    shared between callers, so they are made read-only.
+
+    Each cache is limited by its own `poppy.conf` item, and all caches combined
+    are limited by ``poppy.conf.total_cache_size``; when that is exceeded the least
+    recently used arrays across all caches are discarded first. Caches keep
+    counts of hits and misses; see `cache_statistics`.
+
+    Parameters
+    ----------
+    name : str
+        Name of this cache, for statistics
+    size_option : str, optional
+        Name of the `poppy.conf` item giving the maximum memory, in megabytes,
+        for this cache. If None, only the global limit applies.
+    """
+
+    def __init__(self, name, size_option=None):
+        self.name = name
+        self.size_option = size_option
+        self._entries = collections.OrderedDict()  # key: (value, nbytes, last used time)
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        with _ARRAY_CACHES_LOCK:
+            _ARRAY_CACHES.append(self)
+
+    @property
+    def max_bytes(self):
+        """ Maximum memory, in bytes, for this cache """
+        limit = poppy.conf.total_cache_size
+        if self.size_option is not None:
+            limit = min(limit, getattr(poppy.conf, self.size_option))
+        return limit * 1024**2
+
+    @property
+    def nbytes(self):
+        """ Memory, in bytes, used by the arrays in this cache """
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        with _ARRAY_CACHES_LOCK:
+            return iter(list(self._entries))
+
+    def get(self, key):
+        """ Return the cached value for key, or None """
+        with _ARRAY_CACHES_LOCK:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries[key] = (entry[0], entry[1], next(_array_cache_clock))
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        """ Make the arrays of value read-only, and store it if it fits
+        within the memory limits. Returns value. """
+        for item in (value if isinstance(value, tuple) else (value,)):
+            if isinstance(item, np.ndarray):
+                item.flags.writeable = False
+        nbytes = _cache_value_nbytes(value)
+        if nbytes > self.max_bytes:
+            return value
+
+        with _ARRAY_CACHES_LOCK:
+            self._discard(key)
+            self._entries[key] = (value, nbytes, next(_array_cache_clock))
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+            max_total = poppy.conf.total_cache_size * 1024**2
+            while sum(cache._nbytes for cache in _ARRAY_CACHES) > max_total:
+                # discard the least recently used entry over all caches
+                oldest = min((cache for cache in _ARRAY_CACHES if cache._entries),
+                             key=lambda cache: next(iter(cache._entries.values()))[2])
+                oldest._discard(next(iter(oldest._entries)))
+        return value
+
+    def get_or_compute(self, key, compute):
+        """ Return the cached value for key, calling compute() to create and
+        cache it if needed. A key of None disables caching. """
+        if key is not None:
+            value = self.get(key)
+            if value is not None:
+                return value
+        value = compute()
+        return value if key is None else self.put(key, value)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry[1]
+
+    def clear(self):
+        """ Discard all cached values, to free their memory """
+        with _ARRAY_CACHES_LOCK:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def statistics(self):
+        """ Return a dict of the number of entries, memory used in bytes,
+        and numbers of hits and misses of this cache """
+        return {'entries': len(self), 'nbytes': self.nbytes, 'hits': self.hits, 'misses': self.misses}
+
+
+def cache_statistics():
+    """ Return a dict of statistics for each of POPPY's array caches, by name.
+    See `ArrayCache.statistics`. """
+    with _ARRAY_CACHES_LOCK:
+        return {cache.name: cache.statistics() for cache in _ARRAY_CACHES}
+
+
+def clear_caches():
+    """ Discard the contents of all of POPPY's array caches, to free their memory """
+    with _ARRAY_CACHES_LOCK:
+        for cache in _ARRAY_CACHES:
+            cache.clear()
+
+
 # ##################################################################
 #
 #     Multiprocessing and FFT helper functions
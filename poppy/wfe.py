@@ -229,18 +229,14 @@ class ZernikeWFE(WavefrontError):
             rho, theta = _wave_y_x_to_rho_theta(y, x, self.radius.to(u.meter).value)
 
         combined_zernikes = np.zeros(wave.shape, dtype=np.float64)
-        for j, k in enumerate(self.coefficients, start=1):
-            k_in_m = k.to(u.meter).value
-
-            if has_offset_coords:
-                combined_zernikes += k_in_m * zernike.zernike1(
-                    j,
-                    rho=rho,
-                    theta=theta,
-                    outside=0.0,
-                    noll_normalize=True
-                )
-            else:
+        if has_offset_coords:
+            # compute all the radial polynomials in a single pass
+            for j, zern in zernike._zernike_terms(len(self.coefficients), rho, theta,
+                                                  outside=0.0, noll_normalize=True):
+                combined_zernikes += self.coefficients[j - 1].to(u.meter).value * zern
+        else:
+            for j, k in enumerate(self.coefficients, start=1):
+                k_in_m = k.to(u.meter).value
                 combined_zernikes += k_in_m * zernike.cached_zernike1(
                     j,
                     wave.shape,
@@ -28,24 +28,49 @@ import numpy as np
 
 import sys
 import logging
+import hashlib
 
 import astropy.units as u
 
+from poppy import utils
 from poppy.poppy_core import Wavefront
 
-from functools import lru_cache
-
 __all__ = [
-    'R', 'cached_zernike1', 'hex_aperture', 'hexike_basis', 'noll_indices',
-    'opd_expand', 'opd_expand_nonorthonormal', 'opd_expand_segments', 'opd_from_zernikes',
+    'R', 'radial_polynomials', 'cached_zernike1', 'hex_aperture', 'hexike_basis', 'noll_indices',
+    'opd_expand', 'opd_expand_lstsq', 'opd_expand_nonorthonormal', 'opd_expand_segments',
+    'opd_from_zernikes',
     'str_zernike', 'zern_name', 'zernike', 'zernike1', 'zernike_basis',
-    'Segment_Piston_Basis','Segment_PTT_Basis', 'arbitrary_basis'
+    'Segment_Piston_Basis','Segment_PTT_Basis', 'arbitrary_basis', 'MaskedBasis'
 ]
 
 _log = logging.getLogger(__name__)
 _log.setLevel(logging.INFO)
 _log.addHandler(logging.NullHandler())
 
+# Zernike polynomials computed by cached_zernike1 and zernike_basis_faster, for reuse
+_ZERNIKE_CACHE = utils.ArrayCache('zernike', 'zernike_cache_size')
+
+# Orthonormalized bases and basis factorizations, for reuse
+_BASIS_CACHE = utils.ArrayCache('basis', 'basis_cache_size')
+
+
+def _cached_basis(key, compute):
+    """ Return a tuple of read-only arrays for the given basis cache key, calling
+    compute() to create them if they are not already cached. A key of None
+    disables caching. """
+    return _BASIS_CACHE.get_or_compute(key, lambda: tuple(compute()))
+
+
+def _aperture_key(apmask):
+    """ Hashable digest of a boolean aperture mask, for basis cache keys """
+    return apmask.shape, hashlib.sha1(np.packbits(apmask)).hexdigest()
+
+
+def clear_basis_cache():
+    """ Discard all cached Zernike polynomials and basis factorizations, to free their memory """
+    _ZERNIKE_CACHE.clear()
+    _BASIS_CACHE.clear()
+
 
 def _is_odd(integer):
     """Helper for testing if an integer is odd by bitwise & with 1."""
@@ -80,9 +105,9 @@ def str_zernike(n, m):
     n = int(np.abs(n))
 
     terms = []
-    for k in range(int((n - m) / 2) + 1):
-        coef = ((-1) ** k * factorial(n - k) /
-                (factorial(k) * factorial((n + m) / 2. - k) * factorial((n - m) / 2. - k)))
+    for k in range((n - m) // 2 + 1):
+        coef = ((-1) ** k * factorial(n - k) //
+                (factorial(k) * factorial((n + m) // 2 - k) * factorial((n - m) // 2 - k)))
         if coef != 0:
             formatcode = "{0:d}" if k == 0 else "{0:+d}"
             terms.append((formatcode + " r^{1:d} ").format(int(coef), n - 2 * k))
@@ -152,6 +177,10 @@ def noll_indices(j):
 def R(n, m, rho):
     """Compute R[n, m], the Zernike radial polynomial
 
+    This is evaluated by recurrence in n from R[m, m] = rho**m, which is faster
+    and more accurate at high orders than summing the explicit series of powers.
+    To compute many radial polynomials, use `radial_polynomials`.
+
     Parameters
     ----------
     n, m : int
@@ -163,15 +192,68 @@ def R(n, m, rho):
 
     m = int(np.abs(m))
     n = int(np.abs(n))
-    output = np.zeros(rho.shape)
     if _is_odd(n - m):
         return 0
-    else:
-        for k in range(int((n - m) / 2) + 1):
-            coef = ((-1) ** k * factorial(n - k) /
-                    (factorial(k) * factorial((n + m) / 2. - k) * factorial((n - m) / 2. - k)))
-            output += coef * rho ** (n - 2 * k)
-        return output
+    rho = np.asarray(rho, dtype=float)
+    rho2 = rho ** 2
+    output, previous = rho ** m, None
+    for order in range(m + 2, n + 1, 2):
+        output, previous = _radial_recurrence(order, m, rho2, output, previous), output
+    return output
+
+
+def _radial_recurrence(n, m, rho2, r_n2, r_n4):
+    """ Compute R[n, m] from R[n-2, m] and R[n-4, m] (None if n - 4 < m), by the
+    recurrence relation of Kintner (1976), as given by Chong et al. (2003),
+    Pattern Recognition 36, 731 """
+    if r_n4 is None:
+        # R[m+2, m] = ((m + 2) rho**2 - (m + 1)) rho**m
+        return ((m + 2) * rho2 - (m + 1)) * r_n2
+    k1 = (n + m) * (n - m) * (n - 2) / 2
+    k2 = 2 * n * (n - 1) * (n - 2)
+    k3 = -m ** 2 * (n - 1) - n * (n - 1) * (n - 2)
+    k4 = -n * (n + m - 2) * (n - m - 2) / 2
+    return ((k2 * rho2 + k3) * r_n2 + k4 * r_n4) / k1
+
+
+def radial_polynomials(nmax, rho):
+    """Generate all the Zernike radial polynomials R[n, m] up to order `nmax`
+    in a single pass over `rho`.
+
+    Each polynomial is computed from two lower orders by recurrence, so this
+    is much faster than evaluating each one separately with `R`, for instance
+    when computing a basis set of many Zernike terms.
+
+    Parameters
+    ----------
+    nmax : int
+        Maximum radial order n
+    rho : array
+        Image plane radial coordinates. `rho` should be 1 at the desired pixel radius of the
+        unit circle
+
+    Yields
+    ------
+    n, m, radial : int, int, array
+        The radial polynomial R[n, m] for each n from 0 to `nmax`, and each
+        m >= 0 with n - m even, in order of increasing n and then m. The yielded
+        arrays are used to compute higher orders, so do not modify them in place.
+    """
+    rho = np.asarray(rho, dtype=float)
+    rho2 = rho ** 2
+    power = np.ones(rho.shape)
+    previous = {}  # (R[n-2, m], R[n-4, m]) for each m
+    for n in range(nmax + 1):
+        if n > 0:
+            power = power * rho
+        for m in range(n % 2, n + 1, 2):
+            if m == n:
+                radial = power
+            else:
+                r_n2, r_n4 = previous[m]
+                radial = _radial_recurrence(n, m, rho2, r_n2, r_n4)
+            previous[m] = (radial, previous[m][0] if m in previous else None)
+            yield n, m, radial
 
 
 def zernike(n, m, npix=100, rho=None, theta=None, outside=np.nan,
@@ -231,12 +313,7 @@ def zernike(n, m, npix=100, rho=None, theta=None, outside=np.nan,
     _log.debug("Zernike(n=%d, m=%d)" % (n, m))
 
     if theta is None and rho is None:
-        x = (np.arange(npix, dtype=np.float64) - (npix - 1) / 2.) / ((npix - 1) / 2.)
-        y = x
-        xx, yy = np.meshgrid(x, y)
-
-        rho = np.sqrt(xx ** 2 + yy ** 2)
-        theta = np.arctan2(yy, xx)
+        rho, theta = _unit_disk_coordinates(npix)
     elif (theta is None and rho is not None) or (theta is not None and rho is None):
         raise ValueError("If you provide either the `theta` or `rho` input array, you must "
                          "provide both of them.")
@@ -244,26 +321,62 @@ def zernike(n, m, npix=100, rho=None, theta=None, outside=np.nan,
     if not np.all(rho.shape == theta.shape):
         raise ValueError('The rho and theta arrays do not have consistent shape.')
 
-    aperture = np.ones(rho.shape)
-    aperture[np.where(rho > 1)] = 0.0  # this is the aperture mask
+    return _zernike_from_radial(n, m, R(n, m, rho), rho, theta,
+                                outside=outside, noll_normalize=noll_normalize)
+
+
+def _unit_disk_coordinates(npix):
+    """ Polar coordinates (rho, theta) on an npix*npix array, with rho = 1
+    at the edge of the inscribed circle """
+    x = (np.arange(npix, dtype=np.float64) - (npix - 1) / 2.) / ((npix - 1) / 2.)
+    y = x
+    xx, yy = np.meshgrid(x, y)
+
+    rho = np.sqrt(xx ** 2 + yy ** 2)
+    theta = np.arctan2(yy, xx)
+    return rho, theta
+
 
+def _zernike_from_radial(n, m, radial, rho, theta, outside=np.nan, noll_normalize=True):
+    """ Compute Z[n, m] given its radial polynomial R[n, |m|] evaluated at rho """
     if m == 0:
-        if n == 0:
-            zernike_result = aperture
-        else:
-            norm_coeff = np.sqrt(n + 1) if noll_normalize else 1
-            zernike_result = norm_coeff * R(n, m, rho) * aperture
+        norm_coeff = np.sqrt(n + 1) if noll_normalize else 1
+        angular = 1
     elif m > 0:
         norm_coeff = np.sqrt(2) * np.sqrt(n + 1) if noll_normalize else 1
-        zernike_result = norm_coeff * R(n, m, rho) * np.cos(np.abs(m) * theta) * aperture
+        angular = np.cos(np.abs(m) * theta)
     else:
         norm_coeff = np.sqrt(2) * np.sqrt(n + 1) if noll_normalize else 1
-        zernike_result = norm_coeff * R(n, m, rho) * np.sin(np.abs(m) * theta) * aperture
+        angular = np.sin(np.abs(m) * theta)
 
-    zernike_result[np.where(rho > 1)] = outside
+    zernike_result = np.empty(rho.shape)
+    zernike_result[...] = norm_coeff * radial * angular
+    zernike_result[rho > 1] = outside  # this is the aperture mask
     return zernike_result
 
 
+def _zernike_terms(nterms, rho, theta, outside=np.nan, noll_normalize=True):
+    """ Generate (j, Z_j) for the first `nterms` Zernikes in Noll ordering.
+
+    The radial polynomials are computed in a single pass using
+    `radial_polynomials`, so this is faster than calling `zernike1`
+    for each term. Terms are generated in order of increasing radial order n,
+    which is not always the order of increasing j.
+    """
+    terms = {}
+    for j in range(1, nterms + 1):
+        n, m = noll_indices(j)
+        terms.setdefault((n, np.abs(m)), []).append((j, m))
+    if not terms:
+        return
+    nmax = max(n for n, _ in terms)
+
+    for n, m, radial in radial_polynomials(nmax, rho):
+        for j, signed_m in terms.get((n, m), ()):
+            yield j, _zernike_from_radial(n, signed_m, radial, rho, theta,
+                                          outside=outside, noll_normalize=noll_normalize)
+
+
 def zernike1(j, **kwargs):
     """ Return the Zernike polynomial Z_j for pupil points {r,theta}.
 
@@ -291,27 +404,31 @@ def zernike1(j, **kwargs):
     return zernike(n, m, **kwargs)
 
 
-@lru_cache()
 def cached_zernike1(j, shape, pixelscale, pupil_radius, outside=np.nan, noll_normalize=True):
     """Compute Zernike based on Noll index *j*, using an LRU cache
     for efficiency. Refer to the `zernike1` docstring for details.
 
+    The cache is limited to ``poppy.conf.zernike_cache_size`` megabytes,
+    and the returned array is read-only.
+
     Note: all arguents should be plain ints, tuples, floats etc rather than
     Astropy Quantities.
     """
-    y, x = Wavefront.pupil_coordinates(shape, pixelscale)
-    r = np.sqrt(x ** 2 + y ** 2)
+    def compute():
+        y, x = Wavefront.pupil_coordinates(shape, pixelscale)
+        r = np.sqrt(x ** 2 + y ** 2)
 
-    rho = r / pupil_radius
-    theta = np.arctan2(y / pupil_radius, x / pupil_radius)
+        rho = r / pupil_radius
+        theta = np.arctan2(y / pupil_radius, x / pupil_radius)
 
-    n, m = noll_indices(j)
-    result = zernike(n, m, rho=rho, theta=theta, outside=outside, noll_normalize=noll_normalize)
-    result.flags.writeable = False  # don't let caller modify cached copy in-place
-    return result
+        n, m = noll_indices(j)
+        return zernike(n, m, rho=rho, theta=theta, outside=outside, noll_normalize=noll_normalize)
+
+    key = ('zernike1', j, tuple(shape), pixelscale, pupil_radius, outside, noll_normalize)
+    return _ZERNIKE_CACHE.get_or_compute(key, compute)
 
 
-def zernike_basis(nterms=15, npix=512, rho=None, theta=None, **kwargs):
+def zernike_basis(nterms=15, npix=512, rho=None, theta=None, compact=False, **kwargs):
     """
     Return a cube of Zernike terms from 1 to N each as a 2D array
     showing the value at each point. (Regions outside the unit circle on which
@@ -330,34 +447,41 @@ def zernike_basis(nterms=15, npix=512, rho=None, theta=None, **kwargs):
         Image plane coordinates. `rho` should be 0 at the origin
         and 1.0 at the edge of the circular pupil. `theta` should be
         the angle in radians.
+    compact : bool
+        Return a `MaskedBasis` holding only the pixels within the unit
+        circle, instead of a dense cube. Default is False.
 
     Other parameters are passed through to `poppy.zernike.zernike`
     and are documented there.
     """
     if rho is not None and theta is not None:
-        # both are required, but validated in zernike1
-        shape = rho.shape
-        use_polar = True
+        if not np.all(rho.shape == theta.shape):
+            raise ValueError('The rho and theta arrays do not have consistent shape.')
     elif (theta is None and rho is not None) or (theta is not None and rho is None):
         raise ValueError("If you provide either the `theta` or `rho` input array, you must "
                          "provide both of them.")
-
     else:
-        shape = (npix, npix)
-        use_polar = False
+        rho, theta = _unit_disk_coordinates(npix)
 
-    zern_output = np.zeros((nterms,) + shape)
+    outside = kwargs.get('outside', np.nan)
+    noll_normalize = kwargs.get('noll_normalize', True)
 
-    if use_polar:
-        for j in range(nterms):
-            zern_output[j] = zernike1(j + 1, rho=rho, theta=theta, **kwargs)
-    else:
-        for j in range(nterms):
-            zern_output[j] = zernike1(j + 1, npix=npix, **kwargs)
+    if compact:
+        indices = np.flatnonzero(rho <= 1)
+        vectors = np.zeros((nterms, indices.size))
+        for j, zern in _zernike_terms(nterms, rho.ravel()[indices], theta.ravel()[indices],
+                                      noll_normalize=noll_normalize):
+            vectors[j - 1] = zern
+        return MaskedBasis(vectors, indices, rho.shape, outside=outside)
+
+    zern_output = np.zeros((nterms,) + rho.shape)
+
+    for j, zern in _zernike_terms(nterms, rho, theta,
+                                  outside=outside, noll_normalize=noll_normalize):
+        zern_output[j - 1] = zern
     return zern_output
 
 
-@lru_cache()
 def zernike_basis_faster(nterms=15, npix=512, outside=np.nan):
     """
     Return a cube of Zernike terms from 1 to N each as a 2D array
@@ -365,7 +489,8 @@ def zernike_basis_faster(nterms=15, npix=512, outside=np.nan):
     the Zernike is defined are initialized to np.nan.)
 
     Same as the original zernike_basis, but optimized to run about 2x faster,
-    at a cost of somewhat less flexibility.
+    at a cost of somewhat less flexibility. Results are cached, up to
+    ``poppy.conf.zernike_cache_size`` megabytes, and are read-only.
 
     Does not support providing polar coordinates directly - use regular
     zernike_basis for that. Does not support specifying the aperture
@@ -383,66 +508,215 @@ def zernike_basis_faster(nterms=15, npix=512, outside=np.nan):
 
 
     """
-    shape = (npix, npix)
+    def compute():
+        rho, theta = _unit_disk_coordinates(npix)
 
-    zern_output = np.zeros((nterms,) + shape)
+        zern_output = np.zeros((nterms, npix, npix))
+        for j, zern in _zernike_terms(nterms, rho, theta, outside=outside):
+            zern_output[j - 1] = zern
+        return zern_output
 
-    x = (np.arange(npix, dtype=np.float64) - (npix - 1) / 2.) / ((npix - 1) / 2.)
-    y = x
-    xx, yy = np.meshgrid(x, y)
+    return _ZERNIKE_CACHE.get_or_compute(('zernike_basis_faster', nterms, npix, outside), compute)
 
-    rho = np.sqrt(xx ** 2 + yy ** 2)
-    theta = np.arctan2(yy, xx)
 
-    aperture = np.ones_like(rho)
-    aperture[rho > 1] = 0.0  # this is the aperture mask
-    noll_normalize = True
+class MaskedBasis(object):
+    """ Compact storage of a basis set, holding only the pixels within its aperture
+
+    Dense basis cubes of shape (nterms, npix, npix) are mostly filled with
+    the `outside` value; for many terms on large arrays they can take up
+    gigabytes of memory. This class instead stores the basis as an
+    (nterms, npix_in_aperture) matrix, plus the flat indices of those
+    pixels within the 2D array. Use the ``compact=True`` option of the
+    basis functions to create one, and pass it (or a basis callable that
+    returns one) to `opd_expand`, `opd_expand_nonorthonormal`,
+    `opd_expand_segments` or `opd_from_zernikes`.
 
-    @lru_cache()
-    def cached_R(n, m):
-        """Compute R[n, m], the Zernike radial polynomial
+    Indexing or iterating over a MaskedBasis returns dense 2D arrays,
+    for compatibility with code written for basis cubes.
+
+    Parameters
+    ----------
+    vectors : 2D array_like
+        Basis values at the pixels within the aperture, with shape
+        (nterms, npix_in_aperture).
+    indices : 1D array_like of int
+        Flat indices of the aperture pixels, into an array of the given shape.
+    shape : tuple of int
+        Shape of the 2D arrays over which the basis is defined.
+    support : 2D array_like of bool, optional
+        For bases whose terms are defined over different parts of the aperture,
+        such as segment bases, which pixels each term is defined over. This has
+        the same shape as `vectors`, which must be zero outside each term's support.
+        By default all terms are defined over the whole aperture.
+    outside : float
+        Value for pixels outside the aperture when converting to dense arrays.
+        Default is `np.nan`.
+    dtype : numpy dtype, optional
+        Data type for storing the vectors, e.g. np.float32 to halve memory use.
+        By default the type of `vectors` is kept.
+    """
+
+    def __init__(self, vectors, indices, shape, support=None, outside=np.nan, dtype=None):
+        self.vectors = np.asarray(vectors, dtype=dtype)
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.shape = tuple(shape)
+        self.support = None if support is None else np.asarray(support, dtype=bool)
+        self.outside = outside
+        if self.vectors.ndim != 2 or self.vectors.shape[1] != self.indices.size:
+            raise ValueError("Basis vectors must have shape (nterms, number of aperture pixels).")
+        if self.support is not None and self.support.shape != self.vectors.shape:
+            raise ValueError("Basis support must have the same shape as the basis vectors.")
+
+    @classmethod
+    def from_cube(cls, basis, outside=np.nan, dtype=None):
+        """ Create a MaskedBasis from a dense (nterms, ny, nx) basis cube,
+        with pixels that are not finite in any term considered outside of the aperture """
+        basis = np.asarray(basis)
+        finite = np.isfinite(basis)
+        indices = np.flatnonzero(finite.any(axis=0))
+        vectors = basis.reshape(basis.shape[0], -1)[:, indices]
+        support = finite.reshape(basis.shape[0], -1)[:, indices]
+        if support.all():
+            support = None
+        else:
+            vectors = np.where(support, vectors, 0)
+        return cls(vectors, indices, basis.shape[1:], support=support, outside=outside, dtype=dtype)
+
+    @property
+    def nterms(self):
+        """ Number of basis terms """
+        return self.vectors.shape[0]
+
+    @property
+    def aperture(self):
+        """ Boolean 2D aperture mask """
+        aperture = np.zeros(self.shape, dtype=bool)
+        aperture.flat[self.indices] = True
+        return aperture
+
+    def __len__(self):
+        return self.nterms
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MaskedBasis(self.vectors[index], self.indices, self.shape,
+                               support=None if self.support is None else self.support[index],
+                               outside=self.outside)
+        term = np.full(self.shape, self.outside, dtype=np.result_type(self.vectors.dtype, float))
+        if self.support is None:
+            term.flat[self.indices] = self.vectors[index]
+        else:
+            support = self.support[index]
+            term.flat[self.indices[support]] = self.vectors[index][support]
+        return term
+
+    def __iter__(self):
+        for index in range(self.nterms):
+            yield self[index]
+
+    def to_cube(self):
+        """ Return the basis as a dense (nterms, ny, nx) array """
+        return np.asarray(list(self))
+
+    def term_support(self, index):
+        """ Boolean mask of the aperture pixels over which a basis term is defined """
+        if self.support is None:
+            return np.ones(self.indices.size, dtype=bool)
+        return self.support[index]
+
+    def sample(self, array):
+        """ Return the values of a 2D array at the aperture pixels """
+        return np.asarray(array).ravel()[self.indices]
+
+    def expand(self, opd, aperture=None):
+        """ Project an OPD map onto the basis.
+
+        As for `opd_expand`, this treats the basis as orthonormal, and returns
+        the mean over the aperture of the product of the OPD with each term.
 
         Parameters
         ----------
-        n, m : int
-            Zernike function degree
-        rho : array
-            Image plane radial coordinates. `rho` should be 1 at the desired pixel radius of the
-            unit circle  (this is found implicitly in the scope of the calling fn)
+        opd : 2D ndarray
+            OPD map to expand, of the same shape as the basis arrays.
+        aperture : 2D ndarray, optional
+            Aperture mask restricting which pixels are used. All positive nonzero
+            values are considered within the aperture.
         """
+        values = self.sample(opd)
+        if aperture is not None:
+            aperture = self.sample(aperture)
+            good = np.isfinite(aperture) & (aperture > 0)
+            return self.vectors[:, good].dot(values[good]) / good.sum()
+        return self.vectors.dot(values) / self.indices.size
 
-        m = int(np.abs(m))
-        n = int(np.abs(n))
-        output = np.zeros(rho.shape)
-        if _is_odd(n - m):
-            return 0
-        else:
-            for k in range(int((n - m) / 2) + 1):
-                coef = ((-1) ** k * factorial(n - k) /
-                        (factorial(k) * factorial((n + m) / 2. - k) * factorial((n - m) / 2. - k)))
-                output += coef * rho ** (n - 2 * k)
-            return output
-
-    for j in range(nterms):
-        n, m = noll_indices(j + 1)
-
-        if m == 0:
-            if n == 0:
-                zernike_result = aperture
-            else:
-                norm_coeff = np.sqrt(n + 1) if noll_normalize else 1
-                zernike_result = norm_coeff * cached_R(n, m) * aperture
-        elif m > 0:
-            norm_coeff = np.sqrt(2) * np.sqrt(n + 1) if noll_normalize else 1
-            zernike_result = norm_coeff * cached_R(n, np.abs(m)) * np.cos(np.abs(m) * theta) * aperture
-        else:
-            norm_coeff = np.sqrt(2) * np.sqrt(n + 1) if noll_normalize else 1
-            zernike_result = norm_coeff * cached_R(n, np.abs(m)) * np.sin(np.abs(m) * theta) * aperture
+    def reconstruct(self, coeffs, outside=None):
+        """ Synthesize a 2D OPD map from coefficients for the basis terms
+
+        Parameters
+        ----------
+        coeffs : list or ndarray
+            Coefficients for the first len(coeffs) basis terms.
+        outside : float, optional
+            Value for pixels outside the aperture. Defaults to the basis's `outside` value.
+        """
+        coeffs = np.asarray(coeffs, dtype=float)
+        output = np.full(self.shape, self.outside if outside is None else outside, dtype=float)
+        output.flat[self.indices] = coeffs.dot(self.vectors[:coeffs.size])
+        return output
 
-        zernike_result[rho > 1] = outside
-        zern_output[j] = zernike_result
+    def astype(self, dtype):
+        """ Return a copy of this basis with vectors stored as the given type """
+        return MaskedBasis(self.vectors, self.indices, self.shape, support=self.support,
+                           outside=self.outside, dtype=dtype)
 
-    return zern_output
+
+def _orthonormalize(zernikes):
+    """ Orthonormalize Zernikes over an aperture, starting from piston
+
+    This is equivalent to Gram-Schmidt orthonormalization, but computed via
+    a Householder QR factorization, which is both much faster for many terms
+    and numerically stable.
+
+    Parameters
+    ----------
+    zernikes : 2D ndarray
+        Zernike terms 1 to N sampled at each pixel within the aperture,
+        with shape (nterms, npix_in_aperture).
+
+    Returns
+    -------
+    basis : 2D ndarray
+        Orthonormal terms of the same shape, each with unit RMS over the aperture.
+    """
+    npix_in_aperture = zernikes.shape[1]
+    vectors = np.array(zernikes, dtype=float)
+    vectors[0] = 1  # piston over the whole aperture, which may extend beyond the unit circle
+
+    q, r = np.linalg.qr(vectors.T)
+    # keep the sign of each term as Gram-Schmidt would, i.e. positive
+    # overlap with the Zernike it was derived from
+    signs = np.sign(np.diag(r))
+    signs[signs == 0] = 1
+    basis = (q * (signs * np.sqrt(npix_in_aperture))).T
+    basis[0] = 1  # exactly, rather than to within rounding error
+    return basis
+
+
+def _aperture_basis(vectors, apmask, outside=np.nan, compact=False):
+    """ Return basis vectors sampled at the pixels within apmask, either
+    as a MaskedBasis or as a dense cube filled with `outside` elsewhere """
+    if compact:
+        return MaskedBasis(vectors, np.flatnonzero(apmask), apmask.shape, outside=outside)
+    basis = np.full((len(vectors),) + apmask.shape, outside, dtype=float)
+    basis[:, apmask] = vectors
+    return basis
+
+
+def _evaluate_basis(basis, **kwargs):
+    """ Return the basis set from a basis callable, or a MaskedBasis as is """
+    if isinstance(basis, MaskedBasis):
+        return basis
+    return basis(**kwargs)
 
 
 def hex_aperture(npix=1024, rho=None, theta=None, vertical=False, outside=0):
@@ -503,7 +777,7 @@ def hex_aperture(npix=1024, rho=None, theta=None, vertical=False, outside=0):
 
 def hexike_basis(nterms=15, npix=512, rho=None, theta=None,
                  aperture=None,
-                 vertical=False, outside=np.nan):
+                 vertical=False, outside=np.nan, compact=False):
     """Return a list of hexike polynomials 1-N following the
     method of Mahajan and Dai 2006 for numerical orthonormalization
 
@@ -539,52 +813,37 @@ def hexike_basis(nterms=15, npix=512, rho=None, theta=None,
         outside the aperture, and set equal to the 'outside' parameter value.
         If this parameter is not set, the aperture will be inferred from
         the provided rho and theta arrays.
+    compact : bool
+        Return a `MaskedBasis` holding only the pixels within the aperture,
+        instead of a dense cube. Default is False.
         """
 
     if rho is not None:
         shape = rho.shape
         assert len(shape) == 2 and shape[0] == shape[1], \
             "only square rho and theta arrays supported"
-    else:
-        shape = (npix, npix)
 
     if aperture is None:
         aperture = hex_aperture(npix=npix, rho=rho, theta=theta, vertical=vertical, outside=0)
 
     # any pixels with zero or NaN in the aperture are outside the area
     apmask = (np.isfinite(aperture) & (aperture > 0))
-    apmask_float = np.asarray(apmask, float)
-    A = apmask.sum()
-
-    # precompute zernikes
-    Z = np.full((nterms + 1,) + shape, outside, dtype=float)
-    Z[1:] = zernike_basis(nterms=nterms, npix=npix, rho=rho, theta=theta, outside=0.0)
-
-    G = [np.zeros(shape), np.ones(shape)]  # array of G_i etc. intermediate fn
-    H = [np.zeros(shape), apmask_float.copy()]  # array of hexikes
-    c = {}  # coefficients hash
 
-    for j in np.arange(nterms - 1) + 1:  # can do one less since we already have the piston term
-        _log.debug("  j = " + str(j))
-        # Compute the j'th G, then H
-        nextG = Z[j + 1] * apmask_float
-        for k in np.arange(j) + 1:
-            c[(j + 1, k)] = -1 / A * (Z[j + 1] * H[k] * apmask_float).sum()
-            if c[(j + 1, k)] != 0:
-                nextG += c[(j + 1, k)] * H[k]
-            _log.debug("    c[%s] = %f", str((j + 1, k)), c[(j + 1, k)])
-
-        nextH = nextG / np.sqrt((nextG ** 2).sum() / A)
-
-        G.append(nextG)
-        H.append(nextH)
-
-        # TODO - contemplate whether the above algorithm is numerically stable
-        # cf. modified gram-schmidt algorithm discussion on wikipedia.
+    def compute():
+        # precompute zernikes, only within the aperture
+        if rho is None:
+            rho_, theta_ = _unit_disk_coordinates(npix)
+        else:
+            rho_, theta_ = rho, theta
+        Z = np.zeros((nterms, apmask.sum()))
+        for j, zern in _zernike_terms(nterms, rho_[apmask], theta_[apmask], outside=0.0):
+            Z[j - 1] = zern
+        return _orthonormalize(Z),
 
-    basis = np.asarray(H[1:])  # drop the 0th null element
-    basis[:, ~apmask] = outside
-    return basis
+    # the basis depends only on the aperture, unless coordinates are supplied
+    key = ('hexike_basis', _aperture_key(apmask), nterms) if rho is None else None
+    hexikes, = _cached_basis(key, compute)
+    return _aperture_basis(hexikes, apmask, outside=outside, compact=compact)
 
 
 def hexike_basis_wss(nterms=9, npix=512, rho=None, theta=None,
@@ -718,7 +977,7 @@ hexike_basis_wss.label_strings = ['Piston', 'X tilt', 'Y tilt',
                                   'Spherical', 'Trefoil-0', 'Trefoil-30']
 
 
-def arbitrary_basis(aperture, nterms=15, rho=None, theta=None, outside=np.nan):
+def arbitrary_basis(aperture, nterms=15, rho=None, theta=None, outside=np.nan, compact=False):
     """ Orthonormal basis on arbitrary aperture, via Gram-Schmidt
 
     Return a cube of Zernike-like terms from 1 to N, calculated on an
@@ -728,7 +987,10 @@ def arbitrary_basis(aperture, nterms=15, rho=None, theta=None, outside=np.nan):
 
     This implements Gram-Schmidt orthonormalization numerically,
     starting from the regular Zernikes, to generate an orthonormal basis
-    on some other aperture
+    on some other aperture. (It is computed via a QR factorization over
+    the pixels within the aperture, for speed and numerical stability.)
+    Results are cached per aperture and number of terms, up to
+    ``poppy.conf.basis_cache_size`` megabytes, unless `rho` and `theta` are given.
 
     Parameters
     -----------
@@ -749,6 +1011,9 @@ def arbitrary_basis(aperture, nterms=15, rho=None, theta=None, outside=np.nan):
         Value for pixels outside the specified aperture.
         Default is `np.nan`, but you may also find it useful for this to
         be 0.0 sometimes.
+    compact : bool
+        Return a `MaskedBasis` holding only the pixels within the aperture,
+        instead of a dense cube. Default is False.
     """
     # code submitted by Arthur Vigan - see https://github.com/mperrin/poppy/issues/166
 
@@ -758,64 +1023,46 @@ def arbitrary_basis(aperture, nterms=15, rho=None, theta=None, outside=np.nan):
 
     # any pixels with zero or NaN in the aperture are outside the area
     apmask = (np.isfinite(aperture) & (aperture > 0))
-    apmask_float = np.asarray(apmask, float)
-    A = apmask.sum()
-
-    if theta is None and rho is None:
-        # To avoid clipping the aperture, we precompute the zernike modes
-        # on an array oversized s.t. the zernike disk circumscribes the
-        # entire aperture. We then slice the zernike array down to the
-        # requested array size and cut the aperture out of it.
-
-        # get max extent of aperture from array center
-        yind, xind = np.where(apmask)
-        distance = np.sqrt((yind - (shape[0] - 1) / 2.) ** 2 + (xind - (shape[1] - 1) / 2.) ** 2)
-        max_extent = distance.max()
-
-        # calculate padding for oversizing zernike_basis
-        ceil = lambda x: np.ceil(x) if x > 0 else 0  # avoid negative values
-        padding = (int(ceil((max_extent - (shape[0] - 1) / 2.))),
-                   int(ceil((max_extent - (shape[1] - 1) / 2.))))
-        padded_shape = (shape[0] + padding[0] * 2, shape[1] + padding[1] * 2)
-        npix = padded_shape[0]
-
-        # precompute zernikes on oversized array
-        Z = np.zeros((nterms + 1,) + padded_shape)
-        Z[1:] = zernike_basis(nterms=nterms, npix=npix, rho=rho, theta=theta, outside=0.0)
-        # slice down to original aperture array size
-        Z = Z[:, padding[0]:padded_shape[0] - padding[0],
-              padding[1]:padded_shape[1] - padding[1]]
-    else:
-        # precompute zernikes on user-defined rho, theta
-        Z = np.zeros((nterms + 1,) + shape)
-        Z[1:] = zernike_basis(nterms=nterms, rho=rho, theta=theta, outside=0.0)
-
-    G = [np.zeros(shape), np.ones(shape)]  # array of G_i etc. intermediate fn
-    H = [np.zeros(shape), apmask_float.copy()]  # array of zernikes on arbitrary basis
-    c = {}  # coefficients hash
-
-    for j in np.arange(nterms - 1) + 1:  # can do one less since we already have the piston term
-        _log.debug("  j = " + str(j))
-        # Compute the j'th G, then H
-        nextG = Z[j + 1] * apmask_float
-        for k in np.arange(j) + 1:
-            c[(j + 1, k)] = -1 / A * (Z[j + 1] * H[k] * apmask_float).sum()
-            if c[(j + 1, k)] != 0:
-                nextG += c[(j + 1, k)] * H[k]
-            _log.debug("    c[%s] = %f", str((j + 1, k)), c[(j + 1, k)])
 
-        nextH = nextG / np.sqrt((nextG ** 2).sum() / A)
-
-        G.append(nextG)
-        H.append(nextH)
+    def compute():
+        if theta is None and rho is None:
+            # To avoid clipping the aperture, we precompute the zernike modes
+            # on an array oversized s.t. the zernike disk circumscribes the
+            # entire aperture. We then slice the zernike array down to the
+            # requested array size and cut the aperture out of it.
+
+            # get max extent of aperture from array center
+            yind, xind = np.where(apmask)
+            distance = np.sqrt((yind - (shape[0] - 1) / 2.) ** 2 + (xind - (shape[1] - 1) / 2.) ** 2)
+            max_extent = distance.max()
+
+            # calculate padding for oversizing zernike_basis
+            ceil = lambda x: np.ceil(x) if x > 0 else 0  # avoid negative values
+            padding = (int(ceil((max_extent - (shape[0] - 1) / 2.))),
+                       int(ceil((max_extent - (shape[1] - 1) / 2.))))
+            padded_shape = (shape[0] + padding[0] * 2, shape[1] + padding[1] * 2)
+            npix = padded_shape[0]
+
+            # coordinates on oversized array, sliced down to original aperture array size
+            rho_, theta_ = _unit_disk_coordinates(npix)
+            rho_ = rho_[padding[0]:padded_shape[0] - padding[0],
+                        padding[1]:padded_shape[1] - padding[1]]
+            theta_ = theta_[padding[0]:padded_shape[0] - padding[0],
+                            padding[1]:padded_shape[1] - padding[1]]
+        else:
+            rho_, theta_ = rho, theta
 
-        # TODO - contemplate whether the above algorithm is numerically stable
-        # cf. modified gram-schmidt algorithm discussion on wikipedia.
+        # precompute zernikes, only within the aperture
+        Z = np.zeros((nterms, apmask.sum()))
+        for j, zern in _zernike_terms(nterms, rho_[apmask], theta_[apmask], outside=0.0):
+            Z[j - 1] = zern
+        return _orthonormalize(Z),
 
-    basis = np.asarray(H[1:])  # drop the 0th null element
-    basis[:, ~apmask] = outside
+    # the basis depends only on the aperture, unless coordinates are supplied
+    key = ('arbitrary_basis', _aperture_key(apmask), nterms) if rho is None and theta is None else None
+    basis, = _cached_basis(key, compute)
+    return _aperture_basis(basis, apmask, outside=outside, compact=compact)
 
-    return basis
 
 class Segment_PTT_Basis(object):
     def __init__(self, rings=2, flattoflat=1*u.m, gap=1*u.cm, center=False,
@@ -865,7 +1112,29 @@ class Segment_PTT_Basis(object):
         """ Return the overall aperture across all segments """
         return self.hexdm.sample(npix=npix)
 
-    def __call__(self, nterms=None, npix=512, outside=np.nan):
+    def _masked_basis(self, nterms, npix, outside, terms_per_segment):
+        """ Generate the basis as a MaskedBasis over the segment pixels only """
+        segment_indices = [np.ravel_multi_index(self.hexdm._seg_indices[segi], (npix, npix))
+                           for segi in self.hexdm.segmentlist]
+        indices = np.concatenate(segment_indices)
+        vectors = np.zeros((self.nsegments * terms_per_segment, indices.size))
+        support = np.zeros(vectors.shape, dtype=bool)
+
+        start = 0
+        for i, wseg in enumerate(segment_indices):
+            pix = slice(start, start + wseg.size)
+            terms = slice(i * terms_per_segment, (i + 1) * terms_per_segment)
+            support[terms, pix] = True
+            vectors[i * terms_per_segment, pix] = 1  # Piston
+            if terms_per_segment == 3:
+                vectors[i * 3 + 1, pix] = self.hexdm._seg_x.flat[wseg]  # Tip
+                vectors[i * 3 + 2, pix] = self.hexdm._seg_y.flat[wseg]  # Tilt
+            start += wseg.size
+
+        return MaskedBasis(vectors[0:nterms], indices, (npix, npix),
+                           support=support[0:nterms], outside=outside)
+
+    def __call__(self, nterms=None, npix=512, outside=np.nan, compact=False):
         """ Generate PTT basis ndarray for the specified aperture
 
         Parameters
@@ -878,6 +1147,9 @@ class Segment_PTT_Basis(object):
             Value for pixels outside the specified aperture.
             Default is `np.nan`, but you may also find it useful for this to
             be 0.0 sometimes.
+        compact : bool
+            Return a `MaskedBasis` holding only the pixels within the segments,
+            instead of a dense cube. Default is False.
 
         """
 
@@ -889,6 +1161,8 @@ class Segment_PTT_Basis(object):
         # Re-use the machinery inside the HexSegmentedDM class to set up the
         # arrays defining the segment and zernike geometry.
         self.hexdm.sample(npix=npix)
+        if compact:
+            return self._masked_basis(nterms, npix, outside, terms_per_segment=3)
 
         # For simplicity we always generate the basis for all the segments
         # even if for some reason the user has set a smaller nterms.
@@ -903,7 +1177,7 @@ class Segment_PTT_Basis(object):
         return basis[0:nterms]
 
 class Segment_Piston_Basis(Segment_PTT_Basis):
-    def __call__(self, nterms=None, npix=512, outside=np.nan):
+    def __call__(self, nterms=None, npix=512, outside=np.nan, compact=False):
         """ Generate piston-only basis ndarray for the specified aperture
 
         Parameters
@@ -916,6 +1190,9 @@ class Segment_Piston_Basis(Segment_PTT_Basis):
             Value for pixels outside the specified aperture.
             Default is `np.nan`, but you may also find it useful for this to
             be 0.0 sometimes.
+        compact : bool
+            Return a `MaskedBasis` holding only the pixels within the segments,
+            instead of a dense cube. Default is False.
 
         """
 
@@ -925,6 +1202,8 @@ class Segment_Piston_Basis(Segment_PTT_Basis):
             raise ValueError("nterms must be <= {} for the specified segment aperture.".format(self.nsegments))
 
         aperture = self.hexdm.sample(npix=npix)
+        if compact:
+            return self._masked_basis(nterms, npix, outside, terms_per_segment=1)
 
         # For simplicity we always generate the basis for all the segments
         # even if for some reason the user has set a smaller nterms.
@@ -964,10 +1243,11 @@ def opd_expand(opd, aperture=None, nterms=15, basis=zernike_basis,
         the finite (i.e. non-NaN) pixels in the OPD array.
     nterms : int
         Number of terms to use. (Default: 15)
-    basis : callable, optional
+    basis : callable or MaskedBasis, optional
         Callable (e.g. a function) that generates a sequence
         of basis arrays given arguments `nterms`, `npix`, and `outside`.
-        Default is `poppy.zernike.zernike_basis`.
+        Default is `poppy.zernike.zernike_basis`. Alternatively, a
+        precomputed `MaskedBasis`.
 
     Additional keyword arguments to this function are passed
     through to the `basis` callable.
@@ -996,7 +1276,8 @@ def opd_expand(opd, aperture=None, nterms=15, basis=zernike_basis,
     # any pixels with zero or NaN in the aperture are outside the area
     apmask = (np.isfinite(aperture) & (aperture > 0))
 
-    basis_set = basis(
+    basis_set = _evaluate_basis(
+        basis,
         nterms=nterms,
         npix=opd.shape[0],
         outside=np.nan,
@@ -1004,6 +1285,9 @@ def opd_expand(opd, aperture=None, nterms=15, basis=zernike_basis,
         **kwargs
     )
 
+    if isinstance(basis_set, MaskedBasis):
+        return list(basis_set[0:nterms].expand(opd, aperture=apmask))
+
     wgood = np.where(apmask)
     ngood = apmask.sum()
 
@@ -1049,7 +1333,7 @@ def opd_expand_nonorthonormal(opd, aperture=None, nterms=15, basis=zernike_basis
         the finite (i.e. non-NaN) pixels in the OPD array.
     nterms : int
         number of terms to fit
-    basis : function
+    basis : function or MaskedBasis
         which basis function to use. Defaults to Zernike
     iterations : int
         Number of iterations for convergence. Default is 5
@@ -1068,20 +1352,34 @@ def opd_expand_nonorthonormal(opd, aperture=None, nterms=15, basis=zernike_basis
     # If so, append that into the function's kwargs. This check is needed to
     # handle e.g. both the zernike_basis function (which doesn't accept aperture)
     # and hexike_basis or arbitrary_basis (which do).
-    if 'aperture' in inspect.signature(basis).parameters:
+    if not isinstance(basis, MaskedBasis) and 'aperture' in inspect.signature(basis).parameters:
         kwargs['aperture'] = aperture
 
-    basis_set = basis(
+    basis_set = _evaluate_basis(
+        basis,
         nterms=nterms,
         npix=opd.shape[0],
         outside=np.nan,
         **kwargs
     )
 
-    wgood = np.where(apmask & np.isfinite(basis_set[1]))
     ngood = apmask.sum()
-
     coeffs = np.zeros(nterms)
+
+    if isinstance(basis_set, MaskedBasis):
+        good = basis_set.sample(apmask) & basis_set.term_support(1)
+        vectors = basis_set.vectors[0:nterms, good]
+        residual = basis_set.sample(opd)[good].astype(float)
+        for count in range(iterations):
+            for i, b in enumerate(vectors):
+                this_coeff = b.dot(residual) / ngood
+                residual -= this_coeff * b
+                coeffs[i] += this_coeff
+            if verbose:
+                print("Iteration {}/{}: {}".format(count, iterations, coeffs))
+        return coeffs
+
+    wgood = np.where(apmask & np.isfinite(basis_set[1]))
     opd_copy = np.copy(opd)
 
     for count in range(iterations):
@@ -1095,6 +1393,114 @@ def opd_expand_nonorthonormal(opd, aperture=None, nterms=15, basis=zernike_basis
     return coeffs
 
 
+def _lstsq_solver(basis, apmask, nterms, **kwargs):
+    """ Compute the least squares solution operator for fitting a basis set over an aperture.
+
+    Returns the flat indices of the pixels used in the fit, and the pseudo-inverse
+    matrix of shape (nterms, npixels) which maps the OPD values at those pixels
+    to coefficients. This is computed via a singular value decomposition of the
+    masked basis matrix, so that if the basis is rank deficient over the aperture
+    (e.g. for a segment which is entirely vignetted), the minimum norm solution
+    is found rather than raising an error.
+    """
+    if not isinstance(basis, MaskedBasis) and 'aperture' in inspect.signature(basis).parameters:
+        kwargs['aperture'] = apmask
+
+    basis_set = _evaluate_basis(
+        basis,
+        nterms=nterms,
+        npix=apmask.shape[0],
+        outside=np.nan,
+        **kwargs
+    )
+
+    if isinstance(basis_set, MaskedBasis):
+        in_aperture = basis_set.sample(apmask)
+        indices = basis_set.indices[in_aperture]
+        matrix = basis_set.vectors[0:nterms, in_aperture].astype(float)
+    else:
+        basis_set = np.asarray(basis_set).reshape(len(basis_set), -1)[0:nterms]
+        # terms may be undefined outside their own support, e.g. for segments;
+        # they contribute nothing there.
+        indices = np.flatnonzero(apmask.ravel() & np.isfinite(basis_set).any(axis=0))
+        matrix = np.nan_to_num(basis_set[:, indices])
+
+    unconstrained = np.flatnonzero(~matrix.any(axis=1))
+    if len(unconstrained):
+        _log.warning("Basis terms {} are zero everywhere within the aperture; "
+                     "their fitted coefficients will be zero.".format(list(unconstrained + 1)))
+
+    rcond = np.finfo(float).eps * max(matrix.shape)
+    return indices, np.linalg.pinv(matrix.T, rcond=rcond)
+
+
+def opd_expand_lstsq(opd, aperture=None, nterms=15, basis=zernike_basis, **kwargs):
+    """ Fit OPD maps with a basis set by linear least squares.
+
+    Unlike `opd_expand`, this does not assume that the basis is orthonormal
+    over the aperture, so it gives the best-fitting coefficients for
+    any basis, for instance Zernikes on an obscured aperture. The fit is computed
+    from the pseudo-inverse of the basis sampled within the aperture, which
+    is cached for reuse (up to ``poppy.conf.basis_cache_size`` megabytes) so that
+    fitting further OPD maps with the same basis, aperture and number of terms
+    takes only a single matrix multiplication. For the same reason it is much
+    faster to pass a stack of many OPD maps in one call than to fit them one at a time.
+    Terms which are not constrained within the aperture, for instance segments which
+    fall entirely outside it, are given coefficients of zero.
+
+    Parameters
+    ----------
+    opd : 2D or 3D numpy.ndarray
+        The wavefront OPD map to expand in terms of the requested basis,
+        or a stack of such maps with shape (nframes, npix, npix).
+        Must be square, and finite at all pixels within the aperture.
+    aperture : 2D numpy.ndarray, optional
+        Aperture mask for which pixels are included within the aperture.
+        All positive nonzero values are considered within the aperture;
+        any pixels with zero, negative, or NaN values will be considered
+        outside the aperture. If this parameter is not set, the aperture will
+        be inferred from the pixels which are finite in all OPD maps.
+    nterms : int
+        Number of terms to use. (Default: 15)
+    basis : callable or MaskedBasis, optional
+        Callable (e.g. a function) that generates a sequence
+        of basis arrays given arguments `nterms`, `npix`, and `outside`.
+        Default is `poppy.zernike.zernike_basis`. Alternatively, a
+        precomputed `MaskedBasis`. Callables and MaskedBasis objects are
+        identified by the object itself in the cache, so changing one in place
+        after use is not supported; create a new one instead.
+
+    Additional keyword arguments to this function are passed
+    through to the `basis` callable.
+
+    Returns
+    -------
+    coeffs : ndarray
+        Coefficients, of length `nterms` for a single OPD map, or of shape
+        (nframes, nterms) for a stack of maps.
+    """
+    opd = np.asarray(opd)
+    frames = opd.reshape((-1,) + opd.shape[-2:])
+
+    if aperture is None:
+        _log.warning("No aperture supplied - "
+                  "using the finite (non-NaN) part of the OPD map as a guess.")
+        aperture = np.isfinite(frames).all(axis=0)
+
+    # any pixels with zero or NaN in the aperture are outside the area
+    apmask = (np.isfinite(aperture) & (aperture > 0))
+
+    key = ('lstsq', basis, _aperture_key(apmask), nterms, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        key = None  # e.g. arrays passed through to the basis; don't cache
+    indices, solver = _cached_basis(key, lambda: _lstsq_solver(basis, apmask, nterms, **kwargs))
+
+    coeffs = frames.reshape(len(frames), -1)[:, indices].dot(solver.T)
+    return coeffs[0] if opd.ndim == 2 else coeffs
+
+
 def opd_from_zernikes(coeffs, basis=zernike_basis_faster, aperture=None, outside=np.nan,
                       **kwargs):
     """ Synthesize an OPD from a set of coefficients
@@ -1103,7 +1509,7 @@ def opd_from_zernikes(coeffs, basis=zernike_basis_faster, aperture=None, outside
     -----------
     coeffs : list or ndarray
         Coefficients for the Zernike terms
-    basis : callable
+    basis : callable or MaskedBasis
         Which basis set. Defaults to Zernike
     aperture : 2D ndarray, optional
         Aperture mask for which pixels are included within the aperture.
@@ -1130,15 +1536,23 @@ def opd_from_zernikes(coeffs, basis=zernike_basis_faster, aperture=None, outside
     # If so, append that into the function's kwargs. This check is needed to
     # handle e.g. both the zernike_basis function (which doesn't accept aperture)
     # and hexike_basis or arbitrary_basis (which do).
-    if 'aperture' in inspect.signature(basis).parameters:
+    if not isinstance(basis, MaskedBasis) and 'aperture' in inspect.signature(basis).parameters:
         kwargs['aperture'] = aperture
 
-    basis_set = basis(
+    basis_set = _evaluate_basis(
+        basis,
         nterms=len(coeffs),
         outside=outside,
         **kwargs
     )
 
+    if isinstance(basis_set, MaskedBasis):
+        output = basis_set.reconstruct(coeffs, outside=outside)
+        if aperture is not None:
+            apmask = (np.isfinite(aperture) & (aperture > 0))
+            output[~apmask] = outside
+        return output
+
     output = np.zeros_like(basis_set[0])
 
     # Check if basis area is the same for all elements (like zernike)
@@ -1202,11 +1616,11 @@ def opd_expand_segments(opd, aperture=None, nterms=15, basis=None,
         the finite (i.e. non-NaN) pixels in the OPD array.
     nterms : int
         Number of terms to use. (Default: 15)
-    basis : callable, optional
+    basis : callable or MaskedBasis, optional
         Callable (e.g. a function) that generates a sequence
         of basis arrays given arguments `nterms`, `npix`, and `outside`.
         This should be an instance of Segment_Piston_Basis() or
-        Segment_PTT_Basis(), or an equivalent.
+        Segment_PTT_Basis(), or an equivalent, or a precomputed `MaskedBasis`.
 
     """
     if basis is None:
@@ -1224,10 +1638,11 @@ def opd_expand_segments(opd, aperture=None, nterms=15, basis=None,
     # If so, append that into the function's kwargs. This check is needed to
     # handle e.g. both the zernike_basis function (which doesn't accept aperture)
     # and hexike_basis or arbitrary_basis (which do).
-    if 'aperture' in inspect.signature(basis).parameters:
+    if not isinstance(basis, MaskedBasis) and 'aperture' in inspect.signature(basis).parameters:
         kwargs['aperture'] = aperture
 
-    basis_set = basis(
+    basis_set = _evaluate_basis(
+        basis,
         nterms=nterms,
         npix=opd.shape[0],
         outside=np.nan,
@@ -1235,6 +1650,23 @@ def opd_expand_segments(opd, aperture=None, nterms=15, basis=None,
     )
 
     coeffs = np.zeros(nterms)
+
+    if isinstance(basis_set, MaskedBasis):
+        in_aperture = basis_set.sample(apmask)
+        residual = basis_set.sample(opd).astype(float)
+        for count in range(iterations):
+            for i in range(nterms):
+                good = in_aperture & basis_set.term_support(i)
+                b = basis_set.vectors[i, good]
+                ngood = good.sum()
+                normcoeff = (b ** 2).sum() / ngood
+                this_coeff = b.dot(residual[good]) / ngood / normcoeff
+                residual[good] -= this_coeff * b
+                coeffs[i] += this_coeff
+            if verbose:
+                print("Iteration {}/{}: {}".format(count, iterations, coeffs))
+        return coeffs
+
     opd_copy = np.copy(opd)
 
     for count in range(iterations):
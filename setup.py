@@ -119,7 +119,7 @@ package_info['package_data'][PACKAGENAME].extend(c_files)
 
 install_requires_packages = [
       'numpy>=1.13.0',
-      'scipy>=1.0.0',
+      'scipy>=1.4.0',
       'matplotlib>=2.0.0',
       'astropy>=3.0.0',
 ]